@@ -7,7 +7,8 @@ from sqlalchemy.future import select
 
 from app.core.config import settings
 from app.core.security import verify_access_token
-from app.core.session import async_session
+from app.core.replica import PRIMARY_PIN_COOKIE
+from app.core.session import async_session, async_read_session
 from app.models.user import UserModel
 from fastapi.security.utils import get_authorization_scheme_param
 
@@ -19,6 +20,12 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_factory = async_session if request.cookies.get(PRIMARY_PIN_COOKIE) else async_read_session
+    async with session_factory() as session:
+        yield session
+
+
 async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db),):
 
     auth_header = request.headers.get("Authorization")
@@ -0,0 +1,70 @@
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_active_admin
+from app.core import instrumentation
+from app.core.cache import response_cache
+from app.core.pool import get_pool_stats
+from app.core.session import engine, read_engine
+from app.crud import invoice_exports
+from app.crud.cart_store import move_open_carts
+from app.models.user import UserModel
+
+router = APIRouter()
+
+
+@router.get("/sql-stats")
+async def read_sql_stats(current_user: UserModel = Depends(get_current_active_admin),):
+
+    return instrumentation.get_route_stats()
+
+
+@router.delete("/sql-stats", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_sql_stats(current_user: UserModel = Depends(get_current_active_admin),):
+
+    instrumentation.reset_route_stats()
+
+
+@router.get("/pool-stats")
+async def read_pool_stats(current_user: UserModel = Depends(get_current_active_admin),):
+
+    stats = {"primary": get_pool_stats(engine)}
+    if read_engine is not engine:
+        stats["replica"] = get_pool_stats(read_engine)
+    return stats
+
+
+@router.get("/cache-stats")
+async def read_cache_stats(current_user: UserModel = Depends(get_current_active_admin),):
+
+    return response_cache.stats()
+
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_cache(current_user: UserModel = Depends(get_current_active_admin),):
+
+    await response_cache.clear()
+
+
+@router.post("/carts/migrate")
+async def migrate_carts(db: AsyncSession = Depends(get_async_db),
+                        current_user: UserModel = Depends(get_current_active_admin),):
+
+    return {"moved": await move_open_carts(db)}
+
+
+@router.get("/invoices/export")
+async def export_invoices(start: Optional[date] = None, end: Optional[date] = None,
+                          order_ids: Optional[List[int]] = Query(None),
+                          export_format: invoice_exports.InvoiceExportFormat = Query(
+                              invoice_exports.InvoiceExportFormat.ZIP, alias="format"),
+                          current_user: UserModel = Depends(get_current_active_admin),):
+
+    filters = invoice_exports.invoice_export_filters(start=start, end=end, order_ids=order_ids)
+    invoice_exports.ensure_invoice_export_supported(export_format)
+    return StreamingResponse(invoice_exports.iter_invoice_export(export_format, filters),
+                             media_type=invoice_exports.INVOICE_EXPORT_MEDIA_TYPES[export_format],
+                             headers={"Content-Disposition":
+                                      f"attachment; filename=invoices.{export_format.value}"})
@@ -1,8 +1,10 @@
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import Depends, APIRouter, status
-from app.api.deps import get_async_db, get_current_active_admin
+from fastapi import Depends, APIRouter, Query, Request, Response, status
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin
+from app.core.etag import etag_matches, make_etag, not_modified
 from app.models import UserModel
-from app.schemas.car import CarCreate
+from app.schemas.car import CarCreate, CarEngineOption
 from app.crud import car
 
 router = APIRouter()
@@ -13,3 +15,44 @@ async def car_create(car_in: CarCreate, db: AsyncSession = Depends(get_async_db)
                      current_user: UserModel = Depends(get_current_active_admin),):
 
     return await car.create_car(car_in=car_in, db=db, current_user=current_user)
+
+
+def _selector_response(request: Request, response: Response, values, *key):
+    etag = make_etag("cars", car.car_selector_cache.version, *key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return values
+
+
+@router.get("/selector/brands", response_model=List[str])
+async def read_selector_brands(request: Request, response: Response, db: AsyncSession = Depends(get_read_db),):
+
+    brands = await car.get_selector_brands(db=db)
+    return _selector_response(request, response, brands)
+
+
+@router.get("/selector/models", response_model=List[str])
+async def read_selector_models(request: Request, response: Response, brand: str = Query(max_length=50),
+                               db: AsyncSession = Depends(get_read_db),):
+
+    models = await car.get_selector_models(brand=brand, db=db)
+    return _selector_response(request, response, models, brand)
+
+
+@router.get("/selector/years", response_model=List[int])
+async def read_selector_years(request: Request, response: Response, brand: str = Query(max_length=50),
+                              model: str = Query(max_length=50), db: AsyncSession = Depends(get_read_db),):
+
+    years = await car.get_selector_years(brand=brand, model=model, db=db)
+    return _selector_response(request, response, years, brand, model)
+
+
+@router.get("/selector/engines", response_model=List[CarEngineOption])
+async def read_selector_engines(request: Request, response: Response, brand: str = Query(max_length=50),
+                                model: str = Query(max_length=50), year: int = Query(ge=1900, le=2100),
+                                db: AsyncSession = Depends(get_read_db),):
+
+    engines = await car.get_selector_engines(brand=brand, model=model, year=year, db=db)
+    return _selector_response(request, response, engines, brand, model, year)
@@ -1,10 +1,13 @@
 from typing import List
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin
+from app.core.etag import etag_matches, make_etag, not_modified
 from app.models.user import UserModel
 from app.schemas.category import Category, CategoryCreate, CategoryUpdate, CategoryWithChildren
-from app.crud import categories
+from app.schemas.pagination import Paginate, pagination_param
+from app.schemas.part import Part
+from app.crud import categories, part
 
 router = APIRouter()
 
@@ -17,13 +20,47 @@ async def create_category(category_in: CategoryCreate, db: AsyncSession = Depend
 
 
 @router.get("/tree", response_model=List[CategoryWithChildren])
-async def read_category_tree(db: AsyncSession = Depends(get_async_db),):
+async def read_category_tree(request: Request, response: Response, db: AsyncSession = Depends(get_read_db),):
 
-    return await categories.get_category_tree(db=db)
+    tree = await categories.get_category_tree(db=db)
+    etag = make_etag("categories", categories.category_cache.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return tree
+
+
+@router.get("/cache-stats")
+async def read_category_cache_stats(current_user: UserModel = Depends(get_current_active_admin),):
+
+    return categories.get_category_cache_stats(current_user=current_user)
+
+
+@router.post("/closure/rebuild")
+async def rebuild_category_closure(db: AsyncSession = Depends(get_async_db),
+                                   current_user: UserModel = Depends(get_current_active_admin),):
+
+    return await categories.rebuild_category_closure(db=db, current_user=current_user)
+
+
+@router.get("/{category_id}/breadcrumbs", response_model=List[Category])
+async def read_category_breadcrumbs(category_id: int, db: AsyncSession = Depends(get_read_db),):
+
+    return await categories.get_category_ancestors(category_id=category_id, db=db)
+
+
+@router.get("/{category_id}/parts", response_model=List[Part])
+async def read_category_parts(category_id: int, response: Response, paginate: Paginate = Depends(pagination_param),
+                              db: AsyncSession = Depends(get_read_db),):
+
+    result = await part.get_part_by_category(category_id=category_id, paginate=paginate, db=db)
+    if result["next_cursor"]:
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
+    return result["items"]
 
 
 @router.get("/{category_id}", response_model=CategoryWithChildren)
-async def read_category(category_id: int, db: AsyncSession = Depends(get_async_db),):
+async def read_category(category_id: int, db: AsyncSession = Depends(get_read_db),):
     return await categories.get_category_by_id(category_id=category_id, db=db)
 
 
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_user
+from app.crud import jobs
+from app.models.user import UserModel
+from app.schemas.job import Job
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=Job)
+async def read_job(job_id: int, db: AsyncSession = Depends(get_async_db),
+                   current_user: UserModel = Depends(get_current_user),):
+    return await jobs.get_job(job_id=job_id, db=db, current_user=current_user)
@@ -1,7 +1,8 @@
 from typing import List
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin
+from app.core.etag import collection_etag, etag_matches, not_modified
 from app.models.user import UserModel
 from app.schemas.manufacturer import Manufacturer, ManufacturerCreate, ManufacturerUpdate
 from app.crud import manufacturer
@@ -11,8 +12,16 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[Manufacturer])
-async def manufacturers_read(paginate: Paginate = Depends(pagination_param), db: AsyncSession = Depends(get_async_db),):
-    return await manufacturer.read_manufacturers(paginate=paginate, db=db)
+async def manufacturers_read(request: Request, response: Response, paginate: Paginate = Depends(pagination_param),
+                             db: AsyncSession = Depends(get_read_db),):
+    result = await manufacturer.get_manufacturers(paginate=paginate, db=db)
+    etag = collection_etag(result["manufacturers"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    if result["next_cursor"]:
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
+    return result["manufacturers"]
 
 
 @router.post("/", response_model=Manufacturer, status_code=status.HTTP_201_CREATED)
@@ -23,7 +32,7 @@ async def manufacturer_create(manufacturer_in: ManufacturerCreate, db: AsyncSess
 
 
 @router.get("/{manufacturer_id}", response_model=Manufacturer)
-async def manufacturer_read(manufacturer_id: int, db: AsyncSession = Depends(get_async_db),):
+async def manufacturer_read(manufacturer_id: int, db: AsyncSession = Depends(get_read_db),):
 
     pass
 
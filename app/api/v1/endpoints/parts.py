@@ -1,12 +1,20 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, status, Request, Form, HTTPException
+from fastapi import (APIRouter, BackgroundTasks, Depends, status, Request, Response, Form, HTTPException, Query,
+                     UploadFile, File)
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
+from app.core.etag import collection_etag, etag_matches, make_etag, not_modified
+from app.core.instrumentation import query_budget
 from app.models.user import UserModel
-from app.schemas.part import Part, PartCreate, PartUpdate, PartWithRelations
+from app.schemas.part import (Part, PartCreate, PartUpdate, PartWithRelations, PartSearchPage, PartFilter,
+                              PartFacets, PartPage, part_filter_param)
+from app.schemas.car import FitmentQuery, fitment_param
+from app.schemas.part_import import PartImport
 from app.schemas.pagination import Paginate, pagination_param
-from app.crud import part
+from app.crud import part, part_imports, part_exports
+from app.crud.part_exports import ExportFormat
 
 
 router = APIRouter()
@@ -15,19 +23,38 @@ templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/", response_model=List[Part])
-async def read_parts(paginate: Paginate = Depends(pagination_param), db: AsyncSession = Depends(get_async_db),
-                     name: Optional[str] = None,
-                     part_number: Optional[str] = None, manufacturer_part_number: Optional[str] = None):
+@query_budget(1)
+async def read_parts(request: Request, response: Response, paginate: Paginate = Depends(pagination_param),
+                     filters: PartFilter = Depends(part_filter_param), db: AsyncSession = Depends(get_read_db)):
 
-    if name:
-        parts = await part.get_part_by_name(paginate=paginate, name=name, db=db)
-        return parts
-    if part_number:
-        parts = await part.get_part_by_pn(paginate=paginate, part_pn=part_number,  db=db)
-        return parts
-    if manufacturer_part_number:
-        parts = await part.get_part_by_m_pn(m_part_n=manufacturer_part_number, db=db)
-        return parts
+    result = await part.filter_parts(filters=filters, paginate=paginate, db=db)
+    etag = collection_etag(result["items"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    if result["next_cursor"]:
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
+    return result["items"]
+
+
+@router.get("/facets", response_model=PartFacets)
+@query_budget(1)
+async def read_part_facets(filters: PartFilter = Depends(part_filter_param), db: AsyncSession = Depends(get_read_db)):
+    return await part.get_part_facets(filters=filters, db=db)
+
+
+@router.get("/search", response_model=PartSearchPage)
+@query_budget(2)
+async def search_parts(q: str = Query(min_length=2, max_length=100),
+                       paginate: Paginate = Depends(pagination_param), db: AsyncSession = Depends(get_read_db)):
+    return await part.search_parts(query=q, paginate=paginate, db=db)
+
+
+@router.get("/fitment", response_model=PartPage)
+@query_budget(1)
+async def read_fitment_parts(fitment: FitmentQuery = Depends(fitment_param),
+                             paginate: Paginate = Depends(pagination_param), db: AsyncSession = Depends(get_read_db)):
+    return await part.get_fitment_parts(fitment=fitment, paginate=paginate, db=db)
 
 
 @router.post("/", response_model=Part, status_code=status.HTTP_201_CREATED)
@@ -36,9 +63,52 @@ async def part_crate(part_in: PartCreate, db: AsyncSession = Depends(get_async_d
     return await part.create_part(part_in=part_in, db=db, current_user=current_user)
 
 
+@router.get("/export")
+async def export_parts(request: Request, export_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+                       include_stock: bool = False, include_fitments: bool = False,
+                       current_user: UserModel = Depends(get_current_user), ):
+    part_exports.ensure_export_supported(export_format)
+    # parquet is compressed internally, so only the text formats are gzipped
+    compress = export_format != ExportFormat.PARQUET and "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f"attachment; filename=parts.{export_format.value}", "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(part_exports.iter_part_export(export_format, include_stock=include_stock,
+                                                           include_fitments=include_fitments, compress=compress),
+                             media_type=part_exports.EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+
+@router.post("/import", response_model=PartImport, status_code=status.HTTP_202_ACCEPTED)
+async def import_parts(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user: UserModel = Depends(get_current_active_admin), ):
+    part_import = await part_imports.stage_part_import(upload=file, db=db, current_user=current_user)
+    background_tasks.add_task(part_imports.process_part_import, part_import.id)
+    return part_import
+
+
+@router.get("/imports/{import_id}", response_model=PartImport)
+async def read_part_import(import_id: int, db: AsyncSession = Depends(get_async_db),
+                           current_user: UserModel = Depends(get_current_active_admin), ):
+    return await part_imports.get_part_import(import_id=import_id, db=db, current_user=current_user)
+
+
+@router.get("/imports/{import_id}/errors")
+async def read_part_import_errors(import_id: int, db: AsyncSession = Depends(get_async_db),
+                                  current_user: UserModel = Depends(get_current_active_admin), ):
+    await part_imports.get_part_import(import_id=import_id, db=db, current_user=current_user)
+    return StreamingResponse(part_imports.iter_import_errors(import_id), media_type="text/csv",
+                             headers={"Content-Disposition": f"attachment; filename=import_{import_id}_errors.csv"})
+
+
 @router.get("/{part_id}", response_model=PartWithRelations)
-async def read_part(part_id: int, db: AsyncSession = Depends(get_async_db), ):
-    return await part.get_part_by_id(part_id=part_id, db=db)
+@query_budget(5)
+async def read_part(part_id: int, request: Request, db: AsyncSession = Depends(get_read_db), ):
+    etag = await part.get_part_etag(part_id=part_id, db=db)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=await part.get_part_json(part_id=part_id, etag=etag), media_type="application/json",
+                    headers={"ETag": etag})
 
 
 @router.put("/{part_id}", response_model=Part)
@@ -53,6 +123,10 @@ async def part_delete(part_id: int, db: AsyncSession = Depends(get_async_db),
     return await part.delete_part(part_id=part_id, db=db, current_user=current_user)
 
 
-@router.get("/compatible-with/{car_id}", response_model=List[Part])
-async def get_compatible_parts(car_id: int, db: AsyncSession = Depends(get_async_db),):
-    return await part.get_compatible_parts(car_id=car_id, db=db)
+@router.get("/compatible-with/{car_id}", response_model=PartPage)
+async def get_compatible_parts(car_id: int, request: Request, paginate: Paginate = Depends(pagination_param),):
+    content = await part.get_compatible_parts_json(car_id=car_id, paginate=paginate)
+    etag = make_etag(content)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
@@ -1,11 +1,14 @@
 from typing import List
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin
+from app.core.etag import collection_etag, etag_matches, not_modified
 from app.models.user import UserModel
-from app.schemas.warehouse import Warehouse, WarehouseCreate, WarehouseUpdate, WarehousePartCreate
-from app.crud import warehouses
+from app.schemas.job import Job
+from app.schemas.warehouse import (Warehouse, WarehouseCreate, WarehouseUpdate, WarehousePartCreate, StockTransfer,
+                                   StockBatch, StockBatchLineResult)
+from app.crud import jobs, warehouses
 from app.schemas.pagination import Paginate, pagination_param
 router = APIRouter()
 html_router = APIRouter()
@@ -13,9 +16,17 @@ templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/", response_model=List[Warehouse])
-async def read_warehouses(paginate: Paginate = Depends(pagination_param), db: AsyncSession = Depends(get_async_db),):
+async def read_warehouses(request: Request, response: Response, paginate: Paginate = Depends(pagination_param),
+                          db: AsyncSession = Depends(get_read_db),):
 
-    return await warehouses.get_warehouses(paginate=paginate, db=db)
+    result = await warehouses.get_warehouses(paginate=paginate, db=db)
+    etag = collection_etag(result["items"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    if result["next_cursor"]:
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
+    return result["items"]
 
 
 @router.post("/", response_model=Warehouse, status_code=status.HTTP_201_CREATED)
@@ -25,9 +36,31 @@ async def warehouse_create(warehouse_in: WarehouseCreate, db: AsyncSession = Dep
     return await warehouses.create_warehouse(warehouse_in=warehouse_in, db=db, current_user=current_user)
 
 
+@router.post("/stock/transfer")
+async def transfer_stock(transfer: StockTransfer, db: AsyncSession = Depends(get_async_db),
+                         current_user: UserModel = Depends(get_current_active_admin),):
+    return await warehouses.transfer_stock(transfer=transfer, db=db, current_user=current_user)
+
+
+@router.post("/stock/batch", response_model=List[StockBatchLineResult])
+async def apply_stock_batch(batch: StockBatch, db: AsyncSession = Depends(get_async_db),
+                            current_user: UserModel = Depends(get_current_active_admin),):
+    return await warehouses.apply_stock_batch(batch=batch, db=db, current_user=current_user)
+
+
+@router.post("/stock/reconcile", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def reconcile_stock(response: Response, batch_size: int = Query(1000, ge=1, le=10000), fix: bool = False,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: UserModel = Depends(get_current_active_admin),):
+    job = await jobs.submit_job("reconcile_stock", {"user_id": current_user.id, "batch_size": batch_size, "fix": fix},
+                                db=db, current_user=current_user)
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job
+
+
 @router.get("/{warehouse_id}", response_model=Warehouse)
 async def read_warehouse(warehouse_id: int, paginate: Paginate = Depends(pagination_param),
-                         db: AsyncSession = Depends(get_async_db),):
+                         db: AsyncSession = Depends(get_read_db),):
 
     return await warehouses.get_warehouse_parts(warehouse_id=warehouse_id, paginate=paginate, db=db)
 
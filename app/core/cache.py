@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.cache_version import CacheVersionModel
+
+logger = logging.getLogger(__name__)
+
+
+async def get_version(name: str, db: AsyncSession) -> int:
+    version = await db.scalar(select(CacheVersionModel.version).where(CacheVersionModel.name == name))
+    return version or 0
+
+
+async def bump_version(name: str, db: AsyncSession) -> int:
+    stmt = insert(CacheVersionModel).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[CacheVersionModel.name],
+                                      set_={"version": CacheVersionModel.version + 1})
+    return await db.scalar(stmt.returning(CacheVersionModel.version))
+
+
+class VersionedCache:
+    """Process-local snapshot of a small, rarely changing dataset.
+
+    Writers call ``bump`` inside their transaction and ``reload`` after commit. Readers trust the
+    snapshot for ``CACHE_VERSION_CHECK_SECONDS`` and then compare it with the shared version row,
+    so other workers notice the change without reloading on every request.
+    """
+
+    def __init__(self, name: str, loader: Callable[[AsyncSession], Awaitable[Any]]):
+        self.name = name
+        self._loader = loader
+        self._snapshot: Optional[Any] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession):
+        if self._snapshot is not None and time.monotonic() - self._checked_at < settings.CACHE_VERSION_CHECK_SECONDS:
+            self.hits += 1
+            return self._snapshot
+
+        version = await get_version(self.name, db)
+        if self._snapshot is not None and version == self._version:
+            self._checked_at = time.monotonic()
+            self.hits += 1
+            return self._snapshot
+
+        return await self.reload(db, version=version)
+
+    async def reload(self, db: AsyncSession, version: Optional[int] = None):
+        async with self._lock:
+            if version is None:
+                version = await get_version(self.name, db)
+            if self._snapshot is not None and version == self._version:
+                self.hits += 1
+                return self._snapshot
+
+            self.misses += 1
+            snapshot = await self._loader(db)
+            self._snapshot, self._version, self._checked_at = snapshot, version, time.monotonic()
+            return snapshot
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    async def bump(self, db: AsyncSession) -> int:
+        return await bump_version(self.name, db)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"name": self.name,
+                "version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, }
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry TTL and tag sets; the default backend and the one used in tests.
+
+    Entries and invalidations stay inside one process, so with several workers use the Redis backend.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._tags: dict = {}
+        self._key_tags: dict = {}
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str]):
+        self._drop(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._key_tags[key] = tags = set(tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+
+
+class RedisCacheBackend:
+    """Shares entries between workers; each tag is a Redis set of the keys it covers."""
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self._prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._prefix + key, value, ex=ttl)
+            for tag in tags:
+                pipe.sadd(f"{self._prefix}tag:{tag}", self._prefix + key)
+                pipe.expire(f"{self._prefix}tag:{tag}", ttl)
+            await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        for tag in tags:
+            tag_key = f"{self._prefix}tag:{tag}"
+            keys = await self._redis.smembers(tag_key)
+            await self._redis.delete(tag_key, *keys)
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self._prefix + "*"):
+            await self._redis.delete(key)
+
+
+class ResponseCache:
+    """Caches serialized responses by key and drops them by entity tag (``part:1``, ``car:7``, ...).
+
+    Concurrent misses for the same key share one load, so an expired hot entry is rebuilt once
+    rather than by every request that noticed it.
+    Loaders should read from the primary, since an entry filled from a lagging replica outlives the lag.
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: dict = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Tuple[bytes, Iterable[str]]]]) -> bytes:
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        epoch = self._epoch
+        try:
+            value, tags = await loader()
+            # an invalidation that landed while loading may already cover this value, so don't store it
+            if epoch == self._epoch:
+                await self.backend.set(key, value, self.ttl, tags)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, *tags: str):
+        self._epoch += 1
+        await self.backend.invalidate_tags(tags)
+
+    async def clear(self):
+        self._epoch += 1
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {"backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0, }
+
+
+def _create_backend():
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    if settings.WEB_CONCURRENCY > 1:
+        logger.warning("CACHE_BACKEND=memory with WEB_CONCURRENCY=%s: each worker keeps its own cache and only "
+                       "sees its own invalidations, so others can serve stale responses for up to %ss; "
+                       "set CACHE_BACKEND=redis", settings.WEB_CONCURRENCY, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return MemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+response_cache = ResponseCache(_create_backend(), ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
@@ -1,6 +1,7 @@
 import os
 import secrets
-from typing import List
+import tempfile
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from pydantic import AnyHttpUrl
@@ -26,8 +27,56 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str = (f"postgresql+asyncpg://{DATABASE_USER}:{DATABASE_PASS}@{DATABASE_HOST}:"
                          f"{DATABASE_PORT}/{DATABASE_NAME}")
+    DATABASE_REPLICA_URL: Optional[str] = os.getenv("DATABASE_REPLICA_URL")
+    READ_YOUR_WRITES_SECONDS: int = 5
     ALGORITHM: str = "HS256"
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+
+    CACHE_VERSION_CHECK_SECONDS: float = 5.0
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    # uvicorn and gunicorn both read their worker count from this variable
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+
+    CART_BACKEND: str = os.getenv("CART_BACKEND", "sql")
+    CART_REDIS_TTL_SECONDS: int = 30 * 86400
+
+    RESERVATION_TTL_SECONDS: int = 900
+    RESERVATION_SWEEP_SECONDS: float = 30.0
+    RESERVATION_SWEEP_BATCH_SIZE: int = 1000
+
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LEASE_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_PURGE_SECONDS: float = 300.0
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 1000
+
+    INVOICE_CACHE_DIR: str = os.getenv("INVOICE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "autostock-invoices"))
+    # uploads wait here for background processing; must not be publicly served, and must be shared with workers
+    UPLOAD_STAGING_DIR: str = os.getenv("UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "autostock-uploads"))
+    INVOICE_RENDER_WORKERS: int = 2
+    INVOICE_EXPORT_BATCH_SIZE: int = 100
+
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_SECONDS: float = 1.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_RETRY_BASE_SECONDS: float = 5.0
+    JOB_RETRY_MAX_SECONDS: float = 3600.0
+
+    SQL_ECHO: bool = False
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    SQL_DEFAULT_QUERY_BUDGET: Optional[int] = None
+    SQL_QUERY_BUDGET_ENFORCE: bool = False
+
     class Config:
         case_sensitive = True
 
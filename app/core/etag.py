@@ -0,0 +1,32 @@
+import hashlib
+from typing import Iterable, Optional
+from fastapi import Request, Response, status
+
+
+def make_etag(*values) -> str:
+    return '"{}"'.format(hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest())
+
+
+def collection_etag(rows: Iterable, *extra) -> str:
+    """ETag of a list page built from the ``(id, version)`` of each row, so any row change or reorder changes it."""
+    versions = []
+    for row in rows:
+        if isinstance(row, dict):
+            versions.append((row["id"], row["version"]))
+        else:
+            versions.append((row.id, row.version))
+    return make_etag(*extra, *versions)
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
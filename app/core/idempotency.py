@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import parse_qs
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from fastapi.security.utils import get_authorization_scheme_param
+
+from app.core.config import settings
+from app.core.security import verify_access_token
+from app.core.session import async_session
+from app.models.idempotency_key import IdempotencyKeyModel, IdempotencyStatus
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_FORM_FIELD = "idempotency_key"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# the request did not (fully) happen and may succeed when sent again, so the key is released instead of kept
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+_POLL_SECONDS = 0.1
+
+
+def _owner(request: Request) -> str:
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer" or not token:
+        token = request.cookies.get("access_token", "").replace("Bearer ", "")
+    try:
+        return f"user:{verify_access_token(token).sub}" if token else "anonymous"
+    except Exception:
+        return "anonymous"
+
+
+def _request_hash(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def _claim(owner: str, key: str, request_hash: str) -> bool:
+    """Insert the key as in progress, or take over one whose lease or TTL has run out."""
+    now = datetime.utcnow()
+    stmt = insert(IdempotencyKeyModel).values(owner=owner, key=key, request_hash=request_hash,
+                                              status=IdempotencyStatus.IN_PROGRESS, created_at=now,
+                                              expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS))
+    stmt = stmt.on_conflict_do_update(index_elements=[IdempotencyKeyModel.owner, IdempotencyKeyModel.key],
+                                      set_={"request_hash": stmt.excluded.request_hash,
+                                            "status": stmt.excluded.status,
+                                            "response_status": None,
+                                            "response_headers": None,
+                                            "response_body": None,
+                                            "created_at": stmt.excluded.created_at,
+                                            "expires_at": stmt.excluded.expires_at},
+                                      where=IdempotencyKeyModel.expires_at < now)
+    async with async_session() as db:
+        claimed = await db.scalar(stmt.returning(IdempotencyKeyModel.key))
+        await db.commit()
+    return claimed is not None
+
+
+async def _store(owner: str, key: str, status: int, headers: list, body: bytes):
+    async with async_session() as db:
+        record = await db.get(IdempotencyKeyModel, (owner, key))
+        record.status = IdempotencyStatus.COMPLETED
+        record.response_status = status
+        record.response_headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers]
+        record.response_body = body
+        record.expires_at = datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        await db.commit()
+
+
+async def _release(owner: str, key: str):
+    async with async_session() as db:
+        await db.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.owner == owner,
+                                                           IdempotencyKeyModel.key == key))
+        await db.commit()
+
+
+async def _load(owner: str, key: str) -> Optional[IdempotencyKeyModel]:
+    async with async_session() as db:
+        return await db.get(IdempotencyKeyModel, (owner, key))
+
+
+def _replay(record: IdempotencyKeyModel) -> Response:
+    response = Response(content=record.response_body, status_code=record.response_status)
+    response.raw_headers = [(name.encode("latin-1"), value.encode("latin-1"))
+                            for name, value in record.response_headers if name.lower() != "content-length"]
+    response.raw_headers += [(b"content-length", str(len(record.response_body)).encode()),
+                             (b"idempotent-replayed", b"true")]
+    return response
+
+
+def _body_receive(body: bytes):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    return receive
+
+
+class IdempotencyMiddleware:
+    """Executes a mutating request at most once per ``Idempotency-Key`` and replays the stored response.
+
+    The key comes from the header, or from an ``idempotency_key`` form field for HTML forms. It is scoped
+    to the authenticated user and bound to a hash of method, path, query and body. A duplicate that arrives
+    while the first is still running waits for it; retryable responses (5xx, 408, 409, 425, 429) are not
+    stored, so those can be retried for real.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._running: dict = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        is_form = request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded")
+        if key is None and not is_form:
+            # uploads without a key stream straight through instead of being buffered here
+            await self.app(scope, receive, send)
+            return
+
+        body = await request.body()
+        if key is None:
+            key = next(iter(parse_qs(body.decode("latin-1")).get(IDEMPOTENCY_FORM_FIELD, [])), None)
+        if not key:
+            await self.app(scope, _body_receive(body), send)
+            return
+        if len(key) > 255:
+            await JSONResponse({"detail": "Idempotency-Key must be at most 255 characters"},
+                               status_code=400)(scope, receive, send)
+            return
+
+        owner, request_hash = _owner(request), _request_hash(request, body)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while not await _claim(owner, key, request_hash):
+            record = await _load(owner, key)
+            if record is None:
+                continue
+            if record.request_hash != request_hash:
+                response = JSONResponse({"detail": "Idempotency-Key was already used for a different request"},
+                                        status_code=422)
+            elif record.status == IdempotencyStatus.COMPLETED:
+                response = _replay(record)
+            elif time.monotonic() >= deadline:
+                response = JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"},
+                                        status_code=409, headers={"Retry-After": "1"})
+            else:
+                done = self._running.get((owner, key))
+                try:
+                    if done is not None:
+                        await asyncio.wait_for(done.wait(), timeout=max(deadline - time.monotonic(), 0))
+                    else:
+                        await asyncio.sleep(_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await response(scope, receive, send)
+            return
+
+        done = self._running[(owner, key)] = asyncio.Event()
+        status, headers, chunks = 500, [], []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _body_receive(body), capture)
+        except BaseException:
+            await _release(owner, key)
+            raise
+        else:
+            if status < 500 and status not in RETRYABLE_STATUSES:
+                await _store(owner, key, status, headers, b"".join(chunks))
+            else:
+                await _release(owner, key)
+        finally:
+            self._running.pop((owner, key), None)
+            done.set()
+
+
+async def purge_idempotency_keys(batch_size: Optional[int] = None) -> int:
+    """Delete expired keys in batches along the ``expires_at`` index."""
+    batch_size = batch_size or settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+    purged = 0
+    async with async_session() as db:
+        while True:
+            expired = (select(IdempotencyKeyModel.owner, IdempotencyKeyModel.key).
+                       where(IdempotencyKeyModel.expires_at < datetime.utcnow()).
+                       order_by(IdempotencyKeyModel.expires_at).limit(batch_size))
+            result = await db.execute(delete(IdempotencyKeyModel).
+                                      where(tuple_(IdempotencyKeyModel.owner, IdempotencyKeyModel.key).in_(expired)))
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestQueryStats:
+    __slots__ = ("queries", "rows", "db_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold: int) -> dict:
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+_route_stats: dict = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _request_stats.get()
+    if stats is None:
+        return
+
+    stats.queries += 1
+    stats.db_time += time.perf_counter() - started
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    stats.statements[statement] += 1
+
+
+def instrument_engine(engine: AsyncEngine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_budget(limit: int):
+    """Declare the maximum number of SQL statements an endpoint may issue per request."""
+    def decorator(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorator
+
+
+def _record(route_key: str, stats: RequestQueryStats, repeated: dict):
+    route = _route_stats.setdefault(route_key, {"requests": 0, "queries": 0, "rows": 0, "db_time_ms": 0.0,
+                                                "max_queries": 0, "n_plus_one_requests": 0,
+                                                "repeated_statements": {}})
+    route["requests"] += 1
+    route["queries"] += stats.queries
+    route["rows"] += stats.rows
+    route["db_time_ms"] += stats.db_time * 1000
+    route["max_queries"] = max(route["max_queries"], stats.queries)
+    if repeated:
+        route["n_plus_one_requests"] += 1
+        for statement, count in repeated.items():
+            route["repeated_statements"][statement] = max(route["repeated_statements"].get(statement, 0), count)
+
+
+def get_route_stats() -> dict:
+    return {key: {**value,
+                  "avg_queries": value["queries"] / value["requests"],
+                  "avg_db_time_ms": value["db_time_ms"] / value["requests"]}
+            for key, value in _route_stats.items()}
+
+
+def reset_route_stats():
+    _route_stats.clear()
+
+
+class SQLInstrumentationMiddleware(BaseHTTPMiddleware):
+    """Attributes statement count, rows and DB time to the matched route and reports them via ``Server-Timing``."""
+
+    async def dispatch(self, request: Request, call_next):
+        stats = RequestQueryStats()
+        token = _request_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _request_stats.reset(token)
+
+        route = request.scope.get("route")
+        route_key = f"{request.method} {getattr(route, 'path', request.url.path)}"
+        repeated = stats.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD)
+        _record(route_key, stats, repeated)
+
+        response.headers["Server-Timing"] = f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"'
+        response.headers["X-DB-Queries"] = str(stats.queries)
+
+        if repeated:
+            logger.warning("Possible N+1 on %s: %s", route_key,
+                           "; ".join(f"{count}x {statement[:120]}" for statement, count in repeated.items()))
+
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", settings.SQL_DEFAULT_QUERY_BUDGET)
+        if budget is not None and stats.queries > budget:
+            message = f"{route_key} issued {stats.queries} queries, budget is {budget}"
+            if settings.SQL_QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
@@ -0,0 +1,116 @@
+import asyncio
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from app.core.config import settings
+
+# built once per worker process instead of once per invoice
+_STYLES = getSampleStyleSheet()
+_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("GRID", (0, 0), (-1, -1), 1, colors.black),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+])
+
+_executor: Optional[ProcessPoolExecutor] = None
+_rendering: dict = {}
+
+
+def render_invoice(order: dict) -> bytes:
+    """Build the invoice PDF for ``order``, a plain dict so it can be sent to a worker process."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = [Paragraph(f"Order #{order['id']}", _STYLES["Heading1"]),
+                Paragraph(f"Status: {order['status']}", _STYLES["Normal"]),
+                Paragraph(f"Shipping address: {order['shipping_address']}", _STYLES["Normal"]),
+                Paragraph(f"Total: {order['total_amount']} AMD", _STYLES["Normal"]),
+                Spacer(1, 12)]
+
+    data = [["Part ID", "Part Name", "Qty", "Unit Price", "Total"]]
+    for part_id, part_name, quantity, unit_price in order["items"]:
+        data.append([part_id, part_name, quantity, f"{unit_price} AMD", f"{unit_price * quantity} AMD"])
+
+    table = Table(data, hAlign="LEFT")
+    table.setStyle(_TABLE_STYLE)
+    elements.append(table)
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def merge_invoices(paths: list, target: str):
+    """Concatenate invoice files into one PDF at ``target``; runs in a worker process."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(target, "wb") as file:
+        writer.write(file)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.INVOICE_RENDER_WORKERS)
+    return _executor
+
+
+def shutdown_invoice_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+def invoice_path(order_id: int, version: int) -> Path:
+    return Path(settings.INVOICE_CACHE_DIR) / f"order_{order_id}_v{version}.pdf"
+
+
+def _write_invoice(path: Path, pdf: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as file:
+        file.write(pdf)
+    os.replace(tmp, path)
+    order_prefix = path.name.rsplit("_v", 1)[0]
+    for stale in path.parent.glob(f"{order_prefix}_v*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+async def _render_to_disk(path: Path, load: Callable[[], Awaitable[dict]]):
+    order = await load()
+    pdf = await run_in_pool(render_invoice, order)
+    _write_invoice(path, pdf)
+
+
+async def invoice_file(order_id: int, version: int, load: Callable[[], Awaitable[dict]]) -> Path:
+    """Return the cached PDF for this order version, rendering it in the process pool on a miss.
+
+    ``load`` is only awaited on a miss and must return the dict ``render_invoice`` expects. Concurrent misses
+    for the same file share one render; a new order version replaces the files of older ones.
+    """
+    path = invoice_path(order_id, version)
+    if path.exists():
+        return path
+
+    task = _rendering.get(path)
+    if task is None:
+        task = _rendering[path] = asyncio.ensure_future(_render_to_disk(path, load))
+        task.add_done_callback(lambda _: _rendering.pop(path, None))
+    await asyncio.shield(task)
+    return path
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import traceback
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, update, case, literal, String
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.session import async_session
+from app.models.job import JobModel, JobStatus
+
+logger = logging.getLogger(__name__)
+
+_handlers: dict = {}
+
+
+def job_handler(kind: str):
+    """Register ``func(context, **payload)`` for jobs of ``kind``; its JSON-serializable return value is the result."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+async def enqueue_job(kind: str, payload: dict, db: AsyncSession, priority: int = 0, max_attempts: int = 3,
+                      created_by: Optional[int] = None) -> JobModel:
+    """Add a job in the caller's transaction, so workers only see it once that transaction commits."""
+    job = JobModel(kind=kind, payload=payload, priority=priority, max_attempts=max_attempts, created_by=created_by)
+    db.add(job)
+    await db.flush()
+    return job
+
+
+async def _update_running(job_id: int, attempt: int, **values) -> bool:
+    # a worker whose lease ran out and was replaced no longer matches on attempts, so its writes are dropped
+    async with async_session() as db:
+        result = await db.execute(update(JobModel).
+                                  where(JobModel.id == job_id, JobModel.attempts == attempt,
+                                        JobModel.status == JobStatus.RUNNING).
+                                  values(**values))
+        await db.commit()
+    return result.rowcount > 0
+
+
+class JobContext:
+    """What a handler sees of its job: ids for logging, and progress reporting that also renews the lease."""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.attempt = job.attempts
+
+    async def progress(self, fraction: float):
+        await _update_running(self.job_id, self.attempt, progress=min(max(fraction, 0.0), 1.0),
+                              locked_until=datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+
+    async def keep_lease(self):
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            await _update_running(self.job_id, self.attempt,
+                                  locked_until=datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+
+
+async def _dequeue():
+    """Take the next due job, highest priority first, and mark it running under a lease, in one statement."""
+    now = datetime.utcnow()
+    next_job = (select(JobModel.id).
+                where(JobModel.status == JobStatus.QUEUED, JobModel.run_at <= now).
+                order_by(JobModel.priority.desc(), JobModel.run_at, JobModel.id).
+                limit(1).with_for_update(skip_locked=True).scalar_subquery())
+    async with async_session() as db:
+        job = (await db.execute(update(JobModel).where(JobModel.id == next_job).
+                                values(status=JobStatus.RUNNING, attempts=JobModel.attempts + 1, started_at=now,
+                                       locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS)).
+                                returning(JobModel.id, JobModel.kind, JobModel.payload, JobModel.attempts,
+                                          JobModel.max_attempts))).first()
+        await db.commit()
+    return job
+
+
+def retry_delay(attempt: int) -> float:
+    return min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.JOB_RETRY_MAX_SECONDS)
+
+
+async def _retry_or_fail(job, error: str):
+    now = datetime.utcnow()
+    if job.attempts < job.max_attempts:
+        await _update_running(job.id, job.attempts, status=JobStatus.QUEUED, error=error, locked_until=None,
+                              run_at=now + timedelta(seconds=retry_delay(job.attempts)))
+    else:
+        await _update_running(job.id, job.attempts, status=JobStatus.FAILED, error=error, locked_until=None,
+                              finished_at=now)
+
+
+async def requeue_expired_jobs() -> int:
+    """Give jobs whose worker stopped renewing the lease back to the queue, or fail them if out of attempts."""
+    async with async_session() as db:
+        result = await db.execute(update(JobModel).
+                                  where(JobModel.status == JobStatus.RUNNING,
+                                        JobModel.locked_until < datetime.utcnow()).
+                                  values(status=case((JobModel.attempts >= JobModel.max_attempts,
+                                                      literal(JobStatus.FAILED.value, String)),
+                                                     else_=literal(JobStatus.QUEUED.value, String)),
+                                         error="Worker lease expired", locked_until=None))
+        await db.commit()
+    return result.rowcount
+
+
+class JobWorker:
+    """Runs one job at a time; several workers per process give concurrency for I/O-bound handlers."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def run_once(self) -> bool:
+        job = await _dequeue()
+        if job is None:
+            return False
+
+        context = JobContext(job)
+        lease = asyncio.create_task(context.keep_lease(), name=f"{self.name}-lease")
+        try:
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{job.kind}'")
+            result = await handler(context, **job.payload)
+        except asyncio.CancelledError:
+            # shutting down: hand the job back right away instead of waiting for the lease to expire
+            await _update_running(job.id, job.attempts, status=JobStatus.QUEUED, attempts=job.attempts - 1,
+                                  locked_until=None)
+            raise
+        except Exception:
+            logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+            await _retry_or_fail(job, traceback.format_exc(limit=5))
+        else:
+            await _update_running(job.id, job.attempts, status=JobStatus.COMPLETED, progress=1.0, result=result,
+                                  error=None, locked_until=None, finished_at=datetime.utcnow())
+        finally:
+            lease.cancel()
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Job worker %s failed", self.name)
+            await asyncio.sleep(settings.JOB_POLL_SECONDS)
+
+
+@asynccontextmanager
+async def job_workers(count: int):
+    tasks = [asyncio.create_task(JobWorker(f"job-worker-{index}").run(), name=f"job-worker-{index}")
+             for index in range(count)]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,50 @@
+import bisect
+import time
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = (time.perf_counter() - started) * 1000
+            self.checkouts += 1
+            self.wait_total_ms += waited
+            self.wait_max_ms = max(self.wait_max_ms, waited)
+            self.wait_histogram[bisect.bisect_left(WAIT_BUCKETS_MS, waited)] += 1
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {"size": pool.size(),
+             "checked_in": pool.checkedin(),
+             "checked_out": pool.checkedout(),
+             "overflow": pool.overflow(),
+             "timeout": pool.timeout(), }
+    if isinstance(pool, InstrumentedQueuePool):
+        labels = [f"<={bucket}ms" for bucket in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        stats.update(checkouts=pool.checkouts,
+                     timeouts=pool.timeouts,
+                     wait_avg_ms=pool.wait_total_ms / pool.checkouts if pool.checkouts else 0.0,
+                     wait_max_ms=pool.wait_max_ms,
+                     wait_histogram=dict(zip(labels, pool.wait_histogram)))
+    return stats
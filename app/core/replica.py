@@ -0,0 +1,21 @@
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.core.config import settings
+
+PRIMARY_PIN_COOKIE = "db_primary_pin"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """Pins a client to the primary for ``READ_YOUR_WRITES_SECONDS`` after a successful write request.
+
+    ``get_read_db`` honours the cookie, so a client never reads its own change back from a lagging replica.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PRIMARY_PIN_COOKIE, "1", max_age=settings.READ_YOUR_WRITES_SECONDS,
+                                httponly=True, samesite="lax")
+        return response
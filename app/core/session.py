@@ -1,6 +1,27 @@
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
+from app.core.pool import InstrumentedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+def _create_engine(url: str):
+    engine = create_async_engine(url,
+                                 echo=settings.SQL_ECHO,
+                                 poolclass=InstrumentedQueuePool,
+                                 pool_size=settings.DB_POOL_SIZE,
+                                 max_overflow=settings.DB_MAX_OVERFLOW,
+                                 pool_timeout=settings.DB_POOL_TIMEOUT,
+                                 pool_recycle=settings.DB_POOL_RECYCLE,
+                                 pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                 connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                                               "server_settings": {
+                                                   "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}, })
+    instrument_engine(engine)
+    return engine
+
+
+engine = _create_engine(settings.DATABASE_URL)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+read_engine = _create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else engine
+async_read_session = async_sessionmaker(read_engine, expire_on_commit=False)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs ``func`` every ``interval`` seconds on the event loop; a failing run is logged and retried next tick."""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable]):
+        self.name = name
+        self.interval = interval
+        self._func = func
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._func()
+            except Exception:
+                logger.exception("Periodic task %s failed", self.name)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+@asynccontextmanager
+async def periodic_tasks(*tasks: PeriodicTask):
+    for task in tasks:
+        task.start()
+    try:
+        yield
+    finally:
+        for task in tasks:
+            await task.stop()
@@ -0,0 +1,118 @@
+from collections import Counter
+from typing import NamedTuple, Optional
+from sqlalchemy import select, update, func, literal, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PartModel, WarehousePartModel, StockMovementModel
+from app.models.stock_movement import MovementKind
+
+
+class Allocation(NamedTuple):
+    warehouse_id: int
+    part_id: int
+    quantity: int
+
+
+async def load_stock(part_ids, db: AsyncSession) -> list:
+    result = await db.execute(select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id,
+                                     WarehousePartModel.quantity).
+                              where(WarehousePartModel.part_id.in_(part_ids), WarehousePartModel.quantity > 0))
+    return [Allocation(*row) for row in result]
+
+
+def plan_allocation(lines: dict, stock: list) -> tuple[list, dict]:
+    """Split ``{part_id: quantity}`` over warehouses; returns the allocations and ``{part_id: available}`` shortages.
+
+    A line goes to one warehouse whenever any can cover it, preferring warehouses the order already ships from
+    and then those able to cover the most lines. Lines no single warehouse can cover are split over the fullest
+    warehouses first, which keeps the number of splits minimal.
+    """
+    by_part: dict = {}
+    for row in stock:
+        by_part.setdefault(row.part_id, []).append(row)
+    coverage = Counter(row.warehouse_id for row in stock if row.quantity >= lines.get(row.part_id, 0))
+
+    used: Counter = Counter()
+    allocations, shortages = [], {}
+    for part_id, requested in sorted(lines.items()):
+        options = by_part.get(part_id, [])
+        available = sum(row.quantity for row in options)
+        if available < requested:
+            shortages[part_id] = available
+            continue
+
+        whole = [row for row in options if row.quantity >= requested]
+        if whole:
+            best = max(whole, key=lambda row: (used[row.warehouse_id], coverage[row.warehouse_id], row.quantity,
+                                               -row.warehouse_id))
+            allocations.append(Allocation(best.warehouse_id, part_id, requested))
+            used[best.warehouse_id] += 1
+            continue
+
+        remaining = requested
+        for row in sorted(options, key=lambda row: (-row.quantity, row.warehouse_id)):
+            taken = min(row.quantity, remaining)
+            allocations.append(Allocation(row.warehouse_id, part_id, taken))
+            used[row.warehouse_id] += 1
+            remaining -= taken
+            if not remaining:
+                break
+
+    return allocations, shortages
+
+
+def _int_arrays(*columns):
+    return [literal(list(column), ARRAY(Integer)) for column in columns]
+
+
+async def take_allocated_stock(allocations: list, db: AsyncSession, order_id: Optional[int] = None,
+                               kind: MovementKind = MovementKind.SALE, released: Optional[dict] = None) -> bool:
+    """Decrement every allocated warehouse row, the part totals and the ledger in one statement.
+
+    Each row is only decremented if it still holds the allocated quantity, and each part only if what is left
+    still covers other carts' reservations once ``released`` (``{part_id: quantity}`` of the buyer's own holds)
+    is taken off ``qty_reserved``. Returns ``False`` if anything came up short; the caller must then roll back.
+    Warehouse rows and then parts are locked in key order, matching the other stock writers.
+    """
+    allocations = sorted(allocations)
+    released = released or {}
+    lines = func.unnest(*_int_arrays((row.warehouse_id for row in allocations), (row.part_id for row in allocations),
+                                     (row.quantity for row in allocations)))
+    lines = lines.table_valued("warehouse_id", "part_id", "quantity").render_derived()
+    holds = func.unnest(*_int_arrays(released.keys(), released.values()))
+    holds = holds.table_valued("part_id", "quantity").render_derived()
+
+    locked = (select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id, lines.c.quantity).
+              join(lines, (lines.c.warehouse_id == WarehousePartModel.warehouse_id) &
+                   (lines.c.part_id == WarehousePartModel.part_id)).
+              order_by(WarehousePartModel.warehouse_id, WarehousePartModel.part_id).
+              with_for_update(of=WarehousePartModel).cte("locked"))
+    taken = (update(WarehousePartModel).
+             where(WarehousePartModel.warehouse_id == locked.c.warehouse_id,
+                   WarehousePartModel.part_id == locked.c.part_id,
+                   WarehousePartModel.quantity >= locked.c.quantity).
+             values(quantity=WarehousePartModel.quantity - locked.c.quantity).
+             returning(WarehousePartModel.warehouse_id, WarehousePartModel.part_id,
+                       (-locked.c.quantity).label("delta")).cte("taken"))
+
+    totals = (select(taken.c.part_id, func.sum(taken.c.delta).label("delta")).
+              group_by(taken.c.part_id).cte("totals"))
+    parts_locked = (select(PartModel.id).where(PartModel.id.in_(select(totals.c.part_id))).
+                    order_by(PartModel.id).with_for_update(key_share=True).cte("parts_locked"))
+    reserved = PartModel.qty_reserved - func.coalesce(select(holds.c.quantity).
+                                                      where(holds.c.part_id == PartModel.id).scalar_subquery(), 0)
+    part_totals = (update(PartModel).
+                   where(PartModel.id == parts_locked.c.id, PartModel.id == totals.c.part_id,
+                         PartModel.qty_in_stock + totals.c.delta >= reserved).
+                   values(qty_in_stock=PartModel.qty_in_stock + totals.c.delta, qty_reserved=reserved).
+                   returning(PartModel.id).cte("part_totals"))
+    movements = insert(StockMovementModel).from_select(
+        ["warehouse_id", "part_id", "delta", "kind", "order_id"],
+        select(taken.c.warehouse_id, taken.c.part_id, taken.c.delta, literal(kind.value, String),
+               literal(order_id, Integer))).cte("movements")
+
+    counts = (await db.execute(select(select(func.count()).select_from(taken).scalar_subquery(),
+                                      select(func.count()).select_from(part_totals).scalar_subquery()).
+                               add_cte(movements))).one()
+    return counts == (len(allocations), len({row.part_id for row in allocations}))
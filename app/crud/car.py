@@ -1,36 +1,101 @@
-from typing import Annotated
+from datetime import date
+from types import MappingProxyType
+from typing import Annotated, Mapping, NamedTuple
 from fastapi import Depends, HTTPException, Response, status
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.api.deps import get_async_db, get_current_active_admin
-from app.models import CarModel, UserModel
-from app.schemas.car import CarCreate, CarUpdate
-from app.schemas.pagination import Paginate, pagination_param, object_as_dict
+from app.core.cache import VersionedCache, response_cache
+from app.crud.search import contains_pattern
+from app.models import CarModel, PartModel, UserModel
+from app.models.car import car_display_name
+from app.schemas.car import CarCreate, CarUpdate, CarEngineOption
+from app.schemas.pagination import Paginate, pagination_param, object_as_dict, paginate_query, next_cursor
+from app.crud.loaders import LoadProfile, loader_options
 
 paginate_dep = Annotated[Paginate, Depends(pagination_param)]
 
+CAR_SORT_KEYS = (CarModel.brand, CarModel.model, CarModel.id)
+
+
+class CarSelector(NamedTuple):
+    brands: tuple
+    models: Mapping[str, tuple]
+    years: Mapping[tuple, tuple]
+    engines: Mapping[tuple, tuple]
+
+
+async def _load_car_selector(db: AsyncSession) -> CarSelector:
+    result = await db.execute(select(CarModel.id, CarModel.brand, CarModel.model, CarModel.year_start,
+                                     CarModel.year_end, CarModel.engine_volume, CarModel.engine_type,
+                                     CarModel.engine_model, CarModel.body_type).
+                              order_by(*CAR_SORT_KEYS))
+    current_year = date.today().year
+    models, years, engines = {}, {}, {}
+    for row in result.all():
+        models.setdefault(row.brand, set()).add(row.model)
+        option = CarEngineOption(car_id=row.id, engine_volume=row.engine_volume, engine_type=row.engine_type,
+                                 engine_model=row.engine_model, body_type=row.body_type,
+                                 year_start=row.year_start, year_end=row.year_end)
+        for year in range(row.year_start, (row.year_end or current_year) + 1):
+            years.setdefault((row.brand, row.model), set()).add(year)
+            engines.setdefault((row.brand, row.model, year), []).append(option)
+
+    return CarSelector(brands=tuple(sorted(models)),
+                       models=MappingProxyType({brand: tuple(sorted(names)) for brand, names in models.items()}),
+                       years=MappingProxyType({key: tuple(sorted(values, reverse=True))
+                                               for key, values in years.items()}),
+                       engines=MappingProxyType({key: tuple(values) for key, values in engines.items()}))
+
+
+car_selector_cache = VersionedCache("cars", _load_car_selector)
+
+
+async def get_selector_brands(db: AsyncSession = Depends(get_async_db),):
+    selector = await car_selector_cache.get(db)
+    return selector.brands
+
+
+async def get_selector_models(brand: str, db: AsyncSession = Depends(get_async_db),):
+    selector = await car_selector_cache.get(db)
+    return selector.models.get(brand, ())
+
+
+async def get_selector_years(brand: str, model: str, db: AsyncSession = Depends(get_async_db),):
+    selector = await car_selector_cache.get(db)
+    return selector.years.get((brand, model), ())
+
+
+async def get_selector_engines(brand: str, model: str, year: int, db: AsyncSession = Depends(get_async_db),):
+    selector = await car_selector_cache.get(db)
+    return selector.engines.get((brand, model, year), ())
+
 
 async def get_cars(paginate: paginate_dep, db: AsyncSession = Depends(get_async_db),):
-    offset = (paginate.page - 1) * paginate.per_page
     total_result = await db.execute(select(func.count()).select_from(CarModel))
     total = total_result.scalar()
-    result = await db.execute(select(CarModel).limit(paginate.per_page).offset(offset))
+    stmt = select(CarModel).options(*loader_options(CarModel, LoadProfile.LIST_ROW))
+    result = await db.execute(paginate_query(stmt, paginate, *CAR_SORT_KEYS))
     cars = result.unique().scalars().all()
     dict_car = [await object_as_dict(car) for car in cars]
 
     return {"cars": dict_car,
             "total": total,
             "page": paginate.page,
-            "per_page": paginate.per_page}
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(cars, paginate, *CAR_SORT_KEYS)}
 
 
 async def get_all_cars(db: AsyncSession = Depends(get_async_db),):
-    result = await db.execute(select(CarModel))
+    result = await db.execute(select(CarModel).options(*loader_options(CarModel, LoadProfile.DROPDOWN)).
+                              order_by(*CAR_SORT_KEYS))
     return result.unique().scalars().all()
 
 
 async def get_car_by_id(car_id: int, db: AsyncSession = Depends(get_async_db),):
-    result = await db.execute(select(CarModel).where(CarModel.id == car_id))
+    result = await db.execute(select(CarModel).options(*loader_options(CarModel, LoadProfile.LIST_ROW)).
+                              where(CarModel.id == car_id))
     car = result.scalars().first()
     if not car:
         return None
@@ -38,13 +103,13 @@ async def get_car_by_id(car_id: int, db: AsyncSession = Depends(get_async_db),):
 
 
 async def get_car_by_name(name: str, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db),):
-    offset = (paginate.page - 1) * paginate.per_page
-    query = select(CarModel).filter((CarModel.brand + CarModel.model).ilike(f"%{name}%"))
+    query = (select(CarModel).options(*loader_options(CarModel, LoadProfile.LIST_ROW)).
+             filter(car_display_name().ilike(contains_pattern(name), escape="/")))
 
     total_result = await db.execute(select(func.count()).select_from(query.subquery()))
     total = total_result.scalar()
 
-    result = await db.execute(query.limit(paginate.per_page).offset(offset))
+    result = await db.execute(paginate_query(query, paginate, *CAR_SORT_KEYS))
     cars = result.unique().scalars().all()
     dict_cars = [await object_as_dict(car) for car in cars]
 
@@ -52,7 +117,8 @@ async def get_car_by_name(name: str, paginate: paginate_dep, db: AsyncSession =
         "cars": dict_cars,
         "total": total,
         "page": paginate.page,
-        "per_page": paginate.per_page
+        "per_page": paginate.per_page,
+        "next_cursor": next_cursor(cars, paginate, *CAR_SORT_KEYS)
     }
 
 
@@ -86,8 +152,11 @@ async def create_car(car_in: CarCreate, db: AsyncSession = Depends(get_async_db)
     )
 
     db.add(car)
+    await db.flush()
+    version = await car_selector_cache.bump(db)
     await db.commit()
     await db.refresh(car)
+    await car_selector_cache.reload(db, version=version)
     return car
 
 
@@ -105,19 +174,26 @@ async def update_car(car_id: int, car_in: CarUpdate, db: AsyncSession = Depends(
         car_data.engine_model = car_in.engine_model
         car_data.engine_type = car_in.engine_type
         car_data.body_type = car_in.body_type
+        version = await car_selector_cache.bump(db)
         await db.commit()
+        await car_selector_cache.reload(db, version=version)
+        await response_cache.invalidate(f"car:{car_id}")
     await db.refresh(car_data)
     return car_data
 
 
 async def delete_car(car_id: int, db: AsyncSession = Depends(get_async_db),
                      current_user: UserModel = Depends(get_current_active_admin),):
-    result = await db.execute(select(CarModel).where(CarModel.id == car_id))
+    result = await db.execute(select(CarModel).options(selectinload(CarModel.parts).load_only(PartModel.id)).
+                              where(CarModel.id == car_id))
     car_data = result.scalars().first()
     if not car_data:
         raise HTTPException(status_code=404, detail="Car not found")
 
     await db.delete(car_data)
+    version = await car_selector_cache.bump(db)
     await db.commit()
+    await car_selector_cache.reload(db, version=version)
+    await response_cache.invalidate(f"car:{car_id}")
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
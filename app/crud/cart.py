@@ -1,41 +1,41 @@
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple
 from fastapi import Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_async_db, get_current_user
 from app.models import UserModel, PartModel, OrderItemModel, OrderModel
 from app.schemas.order_item import OrderItemCreate
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-import io
+from app.core.cache import response_cache
+from app.core.invoices import invoice_file
+from app.core.jobs import enqueue_job
+from app.crud.cart_store import cart_store
+from app.crud.allocation import load_stock, plan_allocation, take_allocated_stock
+from app.crud.loaders import LoadProfile, loader_options
+from app.crud.reservations import set_reservation, claim_reservations
 
+CHECKOUT_ATTEMPTS = 3
 
-async def add_to_cart(item: OrderItemCreate, db: AsyncSession = Depends(get_async_db),
-                      current_user: UserModel = Depends(get_current_user), ):
-    part = await db.scalar(select(PartModel).filter_by(id=item.part_id))
-    if not part:
-        raise HTTPException(status_code=404, detail="Part not found")
 
-    cart_item = await db.scalar(
-        select(OrderItemModel).filter_by(user_id=current_user.id, part_id=item.part_id)
-    )
+class CheckoutLine(NamedTuple):
+    part_id: int
+    quantity: int
+    unit_price: float
+    name: str
 
-    current_qty = cart_item.quantity if cart_item else 0
-    if part.qty_in_stock < current_qty + item.quantity:
-        raise HTTPException(status_code=400, detail=f"Not enough stock. Available: {part.qty_in_stock}",)
 
-    if cart_item:
-        cart_item.quantity += item.quantity
-    else:
-        cart_item = OrderItemModel(user_id=current_user.id,
-                                   part_id=item.part_id,
-                                   quantity=item.quantity,
-                                   unit_price=part.price, )
-        db.add(cart_item)
+async def add_to_cart(item: OrderItemCreate, db: AsyncSession = Depends(get_async_db),
+                      current_user: UserModel = Depends(get_current_user), ):
+    price = await db.scalar(select(PartModel.price).where(PartModel.id == item.part_id))
+    if price is None:
+        raise HTTPException(status_code=404, detail="Part not found")
 
+    current_qty = await cart_store.quantity(current_user.id, item.part_id, db)
+    await set_reservation(current_user.id, item.part_id, current_qty + item.quantity, db)
+    cart_item = await cart_store.add(current_user.id, item.part_id, item.quantity, price, db)
     await db.commit()
-    await db.refresh(cart_item)
+    await response_cache.invalidate(f"part:{item.part_id}")
 
     return {"message": "Added to cart",
             "part_id": cart_item.part_id,
@@ -44,26 +44,34 @@ async def add_to_cart(item: OrderItemCreate, db: AsyncSession = Depends(get_asyn
             "total_price": cart_item.unit_price * cart_item.quantity, }
 
 
+async def _cart_lines(user_id: int, db: AsyncSession) -> list:
+    lines = await cart_store.lines(user_id, db)
+    if not lines:
+        return []
+    names = dict((await db.execute(select(PartModel.id, PartModel.name).
+                                   where(PartModel.id.in_([line.part_id for line in lines])))).all())
+    return [(line, names[line.part_id]) for line in lines if line.part_id in names]
+
+
 async def view_cart(db: AsyncSession = Depends(get_async_db),
                     current_user: UserModel = Depends(get_current_user),):
-    cart_items = (await db.execute(select(OrderItemModel).
-                                   filter_by(user_id=current_user.id))).scalars().unique().all()
+    cart_items = await _cart_lines(current_user.id, db)
 
     if not cart_items:
         return {"cart": [], "total": 0}
 
-    total = sum(item.quantity * item.unit_price for item in cart_items)
+    total = sum(item.quantity * item.unit_price for item, _ in cart_items)
 
     return {
         "cart": [
             {
                 "part_id": item.part_id,
-                "part_name": item.part.name,
+                "part_name": part_name,
                 "quantity": item.quantity,
                 "unit_price": item.unit_price,
                 "total_price": item.unit_price * item.quantity,
             }
-            for item in cart_items
+            for item, part_name in cart_items
         ],
         "total": total,
     }
@@ -71,55 +79,78 @@ async def view_cart(db: AsyncSession = Depends(get_async_db),
 
 async def del_from_cart(part_id: int, db: AsyncSession = Depends(get_async_db),
                         current_user: UserModel = Depends(get_current_user),):
-    cart_item = await db.scalar(
-        select(OrderItemModel).filter_by(user_id=current_user.id, part_id=part_id))
-    if not cart_item:
+    if not await cart_store.remove(current_user.id, part_id, db):
         raise HTTPException(status_code=404, detail="Item not found in cart")
 
-    await db.delete(cart_item)
+    await set_reservation(current_user.id, part_id, 0, db)
     await db.commit()
+    await response_cache.invalidate(f"part:{part_id}")
     return {"message": f"Item {part_id} removed from cart"}
 
 
 async def checkout_order(shipping_address: str, db: AsyncSession = Depends(get_async_db),
                          current_user: UserModel = Depends(get_current_user),):
-    cart_items = (await db.execute(select(OrderItemModel).
-                                   filter_by(user_id=current_user.id))).scalars().unique().all()
-
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-
-    order = OrderModel(user_id=current_user.id,
-                       status="pending",
-                       shipping_address=shipping_address,
-                       total_amount=0.0,)
-    db.add(order)
-    await db.flush()
+    """Turn the cart into an order, taking stock from specific warehouses in one guarded statement.
 
-    total = 0.0
-    for cart_item in cart_items:
-        part = await db.get(PartModel, cart_item.part_id)
+    Allocation is planned from an unlocked read; if another checkout takes the stock first the guarded update
+    comes up short, everything is rolled back and the plan is retried against fresh quantities. The buyer's
+    cart reservations are converted into the sale in the same transaction.
+    """
+    # rollback expires current_user, and reloading it lazily is not possible under asyncio
+    user_id = current_user.id
+    cart_lines = [CheckoutLine(*line, name) for line, name in await _cart_lines(user_id, db)]
 
-        if not part or part.qty_in_stock < cart_item.quantity:
-            raise HTTPException(status_code=400,
-                                detail=f"Not enough stock for {cart_item.part.name if part else 'Unknown'}")
-
-        part.qty_in_stock -= cart_item.quantity
-
-        order_item = OrderItemModel(order_id=order.id,
-                                    part_id=cart_item.part_id,
-                                    quantity=cart_item.quantity,
-                                    unit_price=cart_item.unit_price,)
-        db.add(order_item)
-        total += cart_item.quantity * cart_item.unit_price
-
-    order.total_amount = total
-
-    for item in cart_items:
-        await db.delete(item)
+    if not cart_lines:
+        raise HTTPException(status_code=400, detail="Cart is empty")
 
+    requested = Counter()
+    for line in cart_lines:
+        requested[line.part_id] += line.quantity
+    for attempt in range(CHECKOUT_ATTEMPTS):
+        released = await claim_reservations(user_id, list(requested), db)
+        free = dict((await db.execute(select(PartModel.id, PartModel.qty_in_stock - PartModel.qty_reserved).
+                                      where(PartModel.id.in_(list(requested))))).all())
+        allocations, shortages = plan_allocation(requested, await load_stock(list(requested), db))
+        for part_id, quantity in requested.items():
+            # other carts' holds count against stock; the buyer's own holds were just released for this order
+            available = free.get(part_id, 0) + released.get(part_id, 0)
+            if available < quantity:
+                shortages[part_id] = min(shortages.get(part_id, available), available)
+        if shortages:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail={
+                "message": "Not enough stock",
+                "shortages": [{"part_id": line.part_id,
+                               "part_name": line.name,
+                               "requested": requested[line.part_id],
+                               "available": shortages[line.part_id]}
+                              for line in cart_lines if line.part_id in shortages], })
+
+        order = OrderModel(user_id=user_id,
+                           status="pending",
+                           shipping_address=shipping_address,
+                           total_amount=sum(line.quantity * line.unit_price for line in cart_lines),)
+        db.add(order)
+        await db.flush()
+
+        if await take_allocated_stock(allocations, db, order_id=order.id, released=released):
+            break
+        await db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Stock changed during checkout, please try again")
+
+    db.add_all([OrderItemModel(order_id=order.id,
+                               part_id=line.part_id,
+                               quantity=line.quantity,
+                               unit_price=line.unit_price,) for line in cart_lines])
+    # render the invoice ahead of the first download, behind any user-facing jobs
+    await enqueue_job("render_invoice", {"order_id": order.id}, db, priority=-10, created_by=user_id)
+    if cart_store.transactional:
+        await cart_store.clear(user_id, db)
     await db.commit()
-    await db.refresh(order)
+    if not cart_store.transactional:
+        await cart_store.clear(user_id, db)
+    await response_cache.invalidate(*{f"part:{line.part_id}" for line in cart_lines})
 
     return {
         "message": "Order created",
@@ -128,19 +159,20 @@ async def checkout_order(shipping_address: str, db: AsyncSession = Depends(get_a
         "total_amount": order.total_amount,
         "items": [
             {
-                "part_id": i.part_id,
-                "quantity": i.quantity,
-                "unit_price": i.unit_price,
-                "total_price": i.unit_price * i.quantity,
+                "part_id": line.part_id,
+                "quantity": line.quantity,
+                "unit_price": line.unit_price,
+                "total_price": line.unit_price * line.quantity,
             }
-            for i in order.items
+            for line in cart_lines
         ],
+        "allocations": [allocation._asdict() for allocation in allocations],
     }
 
 
 async def print_order(order_id: int, db: AsyncSession = Depends(get_async_db),
                       current_user: UserModel = Depends(get_current_user),):
-    order = await db.get(OrderModel, order_id)
+    order = await db.get(OrderModel, order_id, options=loader_options(OrderModel, LoadProfile.DETAIL))
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -162,46 +194,22 @@ async def print_order(order_id: int, db: AsyncSession = Depends(get_async_db),
             }
 
 
-async def print_to_pdf(order_id: int, db: AsyncSession = Depends(get_async_db),
-                       current_user: UserModel = Depends(get_current_user)):
+async def load_invoice(order_id: int, db: AsyncSession) -> dict:
+    """Order data in the plain form ``render_invoice`` takes."""
+    order = await db.get(OrderModel, order_id, options=loader_options(OrderModel, LoadProfile.DETAIL))
+    return {"id": order.id,
+            "status": order.status,
+            "shipping_address": order.shipping_address,
+            "total_amount": order.total_amount,
+            "items": [(i.part_id, i.part.name, i.quantity, i.unit_price) for i in order.items], }
+
 
-    order = await db.get(OrderModel, order_id)
+async def print_to_pdf(order_id: int, db: AsyncSession = Depends(get_async_db),
+                       current_user: UserModel = Depends(get_current_user)) -> Path:
+    """Path of the order's invoice PDF, cached on disk per order version and rendered off the event loop."""
+    order = (await db.execute(select(OrderModel.user_id, OrderModel.version).
+                              where(OrderModel.id == order_id))).first()
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    elements.append(Paragraph(f"Order #{order.id}", styles["Heading1"]))
-    elements.append(Paragraph(f"Status: {order.status}", styles["Normal"]))
-    elements.append(Paragraph(f"Shipping address: {order.shipping_address}", styles["Normal"]))
-    elements.append(Paragraph(f"Total: {order.total_amount} AMD", styles["Normal"]))
-    elements.append(Spacer(1, 12))
-
-    # Таблица
-    data = [["Part ID", "Part Name", "Qty", "Unit Price", "Total"]]
-    for i in order.items:
-        data.append([
-            i.part_id,
-            i.part.name,
-            i.quantity,
-            f"{i.unit_price} AMD",
-            f"{i.unit_price * i.quantity} AMD"
-        ])
-
-    table = Table(data, hAlign="LEFT")
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    buffer.seek(0)
-    return buffer
+    return await invoice_file(order_id, order.version, lambda: load_invoice(order_id, db))
@@ -0,0 +1,132 @@
+from typing import NamedTuple
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import CartItemModel, OrderItemModel
+
+
+class CartLine(NamedTuple):
+    part_id: int
+    quantity: int
+    unit_price: float
+
+
+class SqlCartStore:
+    """Cart lines in ``cart_items``, keyed by (user_id, part_id); writes join the caller's transaction."""
+
+    transactional = True
+
+    async def lines(self, user_id: int, db: AsyncSession) -> list:
+        result = await db.execute(select(CartItemModel.part_id, CartItemModel.quantity, CartItemModel.unit_price).
+                                  where(CartItemModel.user_id == user_id).order_by(CartItemModel.part_id))
+        return [CartLine(*row) for row in result]
+
+    async def quantity(self, user_id: int, part_id: int, db: AsyncSession) -> int:
+        return await db.scalar(select(CartItemModel.quantity).
+                               where(CartItemModel.user_id == user_id, CartItemModel.part_id == part_id)) or 0
+
+    async def add(self, user_id: int, part_id: int, quantity: int, unit_price: float, db: AsyncSession) -> CartLine:
+        stmt = insert(CartItemModel).values(user_id=user_id, part_id=part_id, quantity=quantity, unit_price=unit_price)
+        stmt = stmt.on_conflict_do_update(index_elements=[CartItemModel.user_id, CartItemModel.part_id],
+                                          set_={"quantity": CartItemModel.quantity + stmt.excluded.quantity})
+        row = (await db.execute(stmt.returning(CartItemModel.part_id, CartItemModel.quantity,
+                                               CartItemModel.unit_price))).one()
+        return CartLine(*row)
+
+    async def remove(self, user_id: int, part_id: int, db: AsyncSession) -> bool:
+        result = await db.execute(delete(CartItemModel).where(CartItemModel.user_id == user_id,
+                                                              CartItemModel.part_id == part_id))
+        return result.rowcount > 0
+
+    async def clear(self, user_id: int, db: AsyncSession):
+        await db.execute(delete(CartItemModel).where(CartItemModel.user_id == user_id))
+
+
+class RedisCartStore:
+    """Cart lines as two Redis hashes per user, quantities and prices, expiring after ``CART_REDIS_TTL_SECONDS``.
+
+    Writes apply immediately and are not part of the database transaction.
+    """
+
+    transactional = False
+
+    def __init__(self, url: str, prefix: str = "cart:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CART_BACKEND=redis requires the 'redis' package")
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    def _keys(self, user_id: int) -> tuple:
+        return f"{self._prefix}{user_id}:qty", f"{self._prefix}{user_id}:price"
+
+    async def lines(self, user_id: int, db: AsyncSession) -> list:
+        qty_key, price_key = self._keys(user_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(qty_key)
+            pipe.hgetall(price_key)
+            quantities, prices = await pipe.execute()
+        return sorted(CartLine(int(part_id), int(quantity), float(prices.get(part_id, 0)))
+                      for part_id, quantity in quantities.items())
+
+    async def quantity(self, user_id: int, part_id: int, db: AsyncSession) -> int:
+        qty_key, _ = self._keys(user_id)
+        return int(await self._redis.hget(qty_key, part_id) or 0)
+
+    async def add(self, user_id: int, part_id: int, quantity: int, unit_price: float, db: AsyncSession) -> CartLine:
+        qty_key, price_key = self._keys(user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(qty_key, part_id, quantity)
+            pipe.hsetnx(price_key, part_id, unit_price)
+            pipe.hget(price_key, part_id)
+            pipe.expire(qty_key, settings.CART_REDIS_TTL_SECONDS)
+            pipe.expire(price_key, settings.CART_REDIS_TTL_SECONDS)
+            new_quantity, _, price, *_ = await pipe.execute()
+        return CartLine(part_id, int(new_quantity), float(price))
+
+    async def remove(self, user_id: int, part_id: int, db: AsyncSession) -> bool:
+        qty_key, price_key = self._keys(user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(qty_key, part_id)
+            pipe.hdel(price_key, part_id)
+            removed, _ = await pipe.execute()
+        return removed > 0
+
+    async def clear(self, user_id: int, db: AsyncSession):
+        await self._redis.delete(*self._keys(user_id))
+
+
+def _create_store():
+    if settings.CART_BACKEND == "redis":
+        return RedisCartStore(settings.REDIS_URL)
+    return SqlCartStore()
+
+
+cart_store = _create_store()
+
+
+async def move_open_carts(db: AsyncSession) -> int:
+    """Move legacy carts, ``order_items`` rows with a user but no order, into the configured cart store."""
+    legacy = (OrderItemModel.order_id.is_(None), OrderItemModel.user_id.is_not(None))
+    quantity = func.sum(OrderItemModel.quantity)
+    rows = (select(OrderItemModel.user_id, OrderItemModel.part_id, quantity.label("quantity"),
+                   func.max(OrderItemModel.unit_price).label("unit_price")).
+            where(*legacy).group_by(OrderItemModel.user_id, OrderItemModel.part_id).having(quantity > 0))
+
+    if cart_store.transactional:
+        stmt = insert(CartItemModel).from_select(["user_id", "part_id", "quantity", "unit_price"], rows)
+        stmt = stmt.on_conflict_do_update(index_elements=[CartItemModel.user_id, CartItemModel.part_id],
+                                          set_={"quantity": CartItemModel.quantity + stmt.excluded.quantity})
+        moved = (await db.execute(stmt)).rowcount
+    else:
+        moved = 0
+        for row in (await db.execute(rows)).all():
+            await cart_store.add(row.user_id, row.part_id, row.quantity, row.unit_price, db)
+            moved += 1
+
+    await db.execute(delete(OrderItemModel).where(*legacy))
+    await db.commit()
+    return moved
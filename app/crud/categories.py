@@ -1,24 +1,49 @@
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
 from fastapi import Depends, HTTPException, Response, status
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, literal, exists
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased
 from app.api.deps import get_async_db, get_current_active_admin
+from app.core.cache import VersionedCache, response_cache
+from app.crud.loaders import LoadProfile, loader_options
 from app.models.category import CategoryModel
+from app.models.category_closure import CategoryClosureModel
+from app.models.part import PartModel
 from app.models.user import UserModel
-from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryWithChildren
+
+
+class CategoryTree(NamedTuple):
+    roots: tuple
+    ids_by_name: Mapping[str, int]
+
+
+async def _load_category_tree(db: AsyncSession) -> CategoryTree:
+    result = await db.execute(select(CategoryModel.id, CategoryModel.name, CategoryModel.parent_id).
+                              order_by(CategoryModel.name, CategoryModel.id))
+    rows = result.all()
+
+    nodes = {row.id: CategoryWithChildren(id=row.id, name=row.name, parent_id=row.parent_id) for row in rows}
+    for row in rows:
+        if row.parent_id is not None and row.parent_id in nodes:
+            nodes[row.parent_id].subcategories.append(nodes[row.id])
+
+    roots = tuple(node for node in nodes.values() if node.parent_id is None)
+    ids_by_name = MappingProxyType({row.name: row.id for row in reversed(rows)})
+    return CategoryTree(roots=roots, ids_by_name=ids_by_name)
+
+
+category_cache = VersionedCache("categories", _load_category_tree)
 
 
 async def get_categories_by_name(category_name: str, db: AsyncSession = Depends(get_async_db),):
-    result = await db.execute(select(CategoryModel).options(selectinload(CategoryModel.subcategories)).
-                              filter(CategoryModel.name == category_name))
-    categories = result.scalars().first()
-    if not categories:
-        return None
-    return categories.id
+    tree = await category_cache.get(db)
+    return tree.ids_by_name.get(category_name)
 
 
 async def get_category_by_id(category_id: int, db: AsyncSession = Depends(get_async_db), ):
-    result = await db.execute(select(CategoryModel).options(selectinload(CategoryModel.subcategories)).
+    result = await db.execute(select(CategoryModel).options(*loader_options(CategoryModel, LoadProfile.DETAIL)).
                               filter(CategoryModel.id == category_id))
     category = result.scalars().first()
 
@@ -28,10 +53,12 @@ async def get_category_by_id(category_id: int, db: AsyncSession = Depends(get_as
 
 
 async def get_category_tree(db: AsyncSession = Depends(get_async_db),):
-    result = await db.execute(select(CategoryModel).options(selectinload(CategoryModel.subcategories)))
-    all_categories = result.scalars().unique().all()
-    tree = [cat for cat in all_categories if cat.parent_id is None]
-    return tree
+    tree = await category_cache.get(db)
+    return list(tree.roots)
+
+
+def get_category_cache_stats(current_user: UserModel = Depends(get_current_active_admin), ):
+    return category_cache.stats()
 
 
 async def create_category(category_in: CategoryCreate, db: AsyncSession = Depends(get_async_db),
@@ -51,8 +78,12 @@ async def create_category(category_in: CategoryCreate, db: AsyncSession = Depend
 
     category = CategoryModel(name=category_in.name, parent_id=category_in.parent_id, )
     db.add(category)
+    await db.flush()
+    await _insert_closure_paths(category_id=category.id, parent_id=category.parent_id, db=db)
+    version = await category_cache.bump(db)
     await db.commit()
     await db.refresh(category)
+    await category_cache.reload(db, version=version)
     return category
 
 
@@ -77,45 +108,99 @@ async def update_category(category_id: int, category_in: CategoryUpdate, db: Asy
         if category_in.parent_id == category_id:
             raise HTTPException(status_code=400, detail="Category cannot be its own parent")
 
-        parent = await get_category_by_id(category_id=category_in.parent_id, db=db)
+        if not await db.scalar(select(exists().where(CategoryModel.id == category_in.parent_id))):
+            raise HTTPException(status_code=404, detail="Category not found", )
 
-        current_parent_id = parent.id
-        while current_parent_id is not None:
-            result = await db.execute(select(CategoryModel.id, CategoryModel.parent_id).
-                                      filter(CategoryModel.id == current_parent_id))
-            parent_data = result.first()
-            if not parent_data:
-                break
-            if parent_data.parent_id == category_id:
-                raise HTTPException(status_code=400, detail="Creating a cycle is not allowed")
-            current_parent_id = parent_data.parent_id
+        if await is_descendant(category_id=category_in.parent_id, ancestor_id=category_id, db=db):
+            raise HTTPException(status_code=400, detail="Creating a cycle is not allowed")
 
+        if category.parent_id != category_in.parent_id:
+            await _move_closure_subtree(category_id=category_id, parent_id=category_in.parent_id, db=db)
         category.parent_id = category_in.parent_id
 
     db.add(category)
+    version = await category_cache.bump(db)
     await db.commit()
     await db.refresh(category)
+    await category_cache.reload(db, version=version)
+    await response_cache.invalidate(f"category:{category_id}")
     return category
 
 
 async def delete_category(category_id: int, db: AsyncSession = Depends(get_async_db),
                           current_user: UserModel = Depends(get_current_active_admin), ):
-    result = await db.execute(select(CategoryModel).options(selectinload(CategoryModel.subcategories),
-                                                            selectinload(CategoryModel.parts)).
-                              filter(CategoryModel.id == category_id))
-    category = result.scalars().first()
-
-    if not category:
+    if not await db.scalar(select(exists().where(CategoryModel.id == category_id))):
         raise HTTPException(status_code=404, detail="Category not found", )
 
-    if category.subcategories:
+    if await db.scalar(select(exists().where(CategoryModel.parent_id == category_id))):
         raise HTTPException(status_code=400,
                             detail="Cannot delete category with subcategories. Delete subcategories first.", )
 
-    if category.parts:
+    if await db.scalar(select(exists().where(PartModel.category_id == category_id))):
         raise HTTPException(status_code=400,
                             detail="Cannot delete category with associated parts. Remove parts first.", )
 
-    await db.delete(category)
+    await db.execute(delete(CategoryModel).where(CategoryModel.id == category_id))
+    version = await category_cache.bump(db)
     await db.commit()
+    await category_cache.reload(db, version=version)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+async def get_category_ancestors(category_id: int, db: AsyncSession = Depends(get_async_db), ):
+    result = await db.execute(select(CategoryModel).
+                              join(CategoryClosureModel, CategoryClosureModel.ancestor_id == CategoryModel.id).
+                              filter(CategoryClosureModel.descendant_id == category_id).
+                              order_by(CategoryClosureModel.depth.desc()))
+    ancestors = result.unique().scalars().all()
+
+    if not ancestors:
+        raise HTTPException(status_code=404, detail="Category not found", )
+    return ancestors
+
+
+def subtree_ids(category_id: int):
+    return select(CategoryClosureModel.descendant_id).filter(CategoryClosureModel.ancestor_id == category_id)
+
+
+async def is_descendant(category_id: int, ancestor_id: int, db: AsyncSession):
+    return await db.scalar(select(exists().where(CategoryClosureModel.ancestor_id == ancestor_id,
+                                                 CategoryClosureModel.descendant_id == category_id)))
+
+
+async def _insert_closure_paths(category_id: int, parent_id: int | None, db: AsyncSession):
+    paths = select(literal(category_id), literal(category_id), literal(0))
+    if parent_id is not None:
+        paths = paths.union_all(select(CategoryClosureModel.ancestor_id, literal(category_id),
+                                       CategoryClosureModel.depth + 1).
+                                filter(CategoryClosureModel.descendant_id == parent_id))
+    await db.execute(insert(CategoryClosureModel).from_select(["ancestor_id", "descendant_id", "depth"], paths))
+
+
+async def _move_closure_subtree(category_id: int, parent_id: int, db: AsyncSession):
+    subtree = subtree_ids(category_id)
+    await db.execute(delete(CategoryClosureModel).
+                     where(CategoryClosureModel.descendant_id.in_(subtree),
+                           CategoryClosureModel.ancestor_id.not_in(subtree)))
+
+    above = aliased(CategoryClosureModel)
+    below = aliased(CategoryClosureModel)
+    paths = (select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1).
+             filter(above.descendant_id == parent_id, below.ancestor_id == category_id))
+    await db.execute(insert(CategoryClosureModel).from_select(["ancestor_id", "descendant_id", "depth"], paths))
+
+
+async def rebuild_category_closure(db: AsyncSession = Depends(get_async_db),
+                                   current_user: UserModel = Depends(get_current_active_admin), ):
+    tree = (select(CategoryModel.id.label("ancestor_id"), CategoryModel.id.label("descendant_id"),
+                   literal(0).label("depth")).
+            cte("tree", recursive=True))
+    tree = tree.union_all(select(tree.c.ancestor_id, CategoryModel.id, tree.c.depth + 1).
+                          join(CategoryModel, CategoryModel.parent_id == tree.c.descendant_id))
+
+    await db.execute(delete(CategoryClosureModel))
+    await db.execute(insert(CategoryClosureModel).
+                     from_select(["ancestor_id", "descendant_id", "depth"],
+                                 select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)))
+    await db.commit()
+    return {"message": "Category closure rebuilt"}
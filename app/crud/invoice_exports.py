@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.invoices import invoice_file, merge_invoices, run_in_pool
+from app.core.session import async_read_session
+from app.crud.part_exports import ChunkSink
+from app.models import OrderModel, OrderItemModel, PartModel
+
+_COPY_CHUNK_SIZE = 64 * 1024
+
+
+class InvoiceExportFormat(str, Enum):
+    ZIP = "zip"
+    PDF = "pdf"
+
+
+INVOICE_EXPORT_MEDIA_TYPES = {InvoiceExportFormat.ZIP: "application/zip",
+                              InvoiceExportFormat.PDF: "application/pdf", }
+
+
+def invoice_export_filters(start: Optional[date] = None, end: Optional[date] = None,
+                           order_ids: Optional[list] = None) -> list:
+    # validated before the response starts, since a generator can no longer turn into an error response
+    if start is None and end is None and not order_ids:
+        raise HTTPException(status_code=400, detail="Give a date range or a list of order ids")
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    filters = []
+    if start is not None:
+        filters.append(OrderModel.created_at >= datetime.combine(start, time.min))
+    if end is not None:
+        filters.append(OrderModel.created_at < datetime.combine(end + timedelta(days=1), time.min))
+    if order_ids:
+        filters.append(OrderModel.id.in_(order_ids))
+    return filters
+
+
+def ensure_invoice_export_supported(export_format: InvoiceExportFormat):
+    if export_format == InvoiceExportFormat.PDF:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Merged PDF export requires the 'pypdf' package")
+
+
+async def _order_batches(filters: list) -> AsyncIterator[list]:
+    """Yield orders as ``render_invoice`` dicts (plus ``version``), two queries per keyset batch."""
+    last_id = 0
+    async with async_read_session() as db:
+        while True:
+            orders = (await db.execute(select(OrderModel.id, OrderModel.version, OrderModel.status,
+                                              OrderModel.shipping_address, OrderModel.total_amount).
+                                       where(*filters, OrderModel.id > last_id).
+                                       order_by(OrderModel.id).limit(settings.INVOICE_EXPORT_BATCH_SIZE))).all()
+            if not orders:
+                return
+
+            items: dict = {}
+            lines = await db.execute(select(OrderItemModel.order_id, OrderItemModel.part_id, PartModel.name,
+                                            OrderItemModel.quantity, OrderItemModel.unit_price).
+                                     join(PartModel, PartModel.id == OrderItemModel.part_id).
+                                     where(OrderItemModel.order_id.in_([order.id for order in orders])).
+                                     order_by(OrderItemModel.order_id, OrderItemModel.id))
+            for order_id, *line in lines:
+                items.setdefault(order_id, []).append(tuple(line))
+
+            yield [{**order._asdict(), "items": items.get(order.id, [])} for order in orders]
+            last_id = orders[-1].id
+
+
+async def _loaded(order: dict):
+    return order
+
+
+async def _invoice_batches(filters: list) -> AsyncIterator[list]:
+    """Yield ``(order_id, path)`` per batch; misses of a batch are rendered in parallel by the process pool."""
+    async for orders in _order_batches(filters):
+        paths = await asyncio.gather(*[invoice_file(order["id"], order["version"], lambda order=order: _loaded(order))
+                                       for order in orders])
+        yield [(order["id"], path) for order, path in zip(orders, paths)]
+
+
+def _add_to_zip(archive: zipfile.ZipFile, name: str, path):
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    with open(path, "rb") as source, archive.open(info, mode="w") as target:
+        shutil.copyfileobj(source, target, _COPY_CHUNK_SIZE)
+
+
+async def _iter_zip(filters: list) -> AsyncIterator[bytes]:
+    # PDFs are compressed already, so entries are stored as is; the file copy still runs off the event loop
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for invoices in _invoice_batches(filters):
+            for order_id, path in invoices:
+                await asyncio.to_thread(_add_to_zip, archive, f"order_{order_id}.pdf", path)
+                yield sink.drain()
+    yield sink.drain()
+
+
+async def _iter_merged(filters: list) -> AsyncIterator[bytes]:
+    paths = []
+    async for invoices in _invoice_batches(filters):
+        paths.extend(str(path) for _, path in invoices)
+
+    fd, target = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        await run_in_pool(merge_invoices, paths, target)
+        with open(target, "rb") as merged:
+            while chunk := merged.read(_COPY_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.unlink(target)
+
+
+def iter_invoice_export(export_format: InvoiceExportFormat, filters: list) -> AsyncIterator[bytes]:
+    """Stream the invoices of all matching orders, in id order, as a ZIP of PDFs or as one merged PDF.
+
+    The ZIP is written entry by entry, so memory stays bounded by one batch. Merging has to see every page
+    first, so the merged PDF is built from the cached files in a worker process and streamed from a temp file.
+    """
+    if export_format == InvoiceExportFormat.PDF:
+        return _iter_merged(filters)
+    return _iter_zip(filters)
@@ -0,0 +1,66 @@
+import asyncio
+from pathlib import Path
+from fastapi import Depends, HTTPException
+from PIL import Image
+from PIL.Image import Resampling
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_db, get_current_user
+from app.core.invoices import invoice_file
+from app.core.jobs import JobContext, enqueue_job, job_handler
+from app.core.session import async_session
+from app.crud import cart, warehouses
+from app.models import JobModel, OrderModel, UserModel
+
+CAR_IMAGE_SIZE = (600, 400)
+
+
+async def submit_job(kind: str, payload: dict, db: AsyncSession, current_user: UserModel,
+                     priority: int = 0) -> JobModel:
+    job = await enqueue_job(kind, payload, db, priority=priority, created_by=current_user.id)
+    await db.commit()
+    return job
+
+
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db),
+                  current_user: UserModel = Depends(get_current_user),):
+    job = await db.get(JobModel, job_id)
+    if not job or (job.created_by != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@job_handler("reconcile_stock")
+async def reconcile_stock_job(context: JobContext, user_id: int, batch_size: int = 1000, fix: bool = False):
+    async with async_session() as db:
+        user = await db.get(UserModel, user_id)
+        return await warehouses.reconcile_stock(batch_size=batch_size, fix=fix, db=db, current_user=user,
+                                                progress=context.progress)
+
+
+def _resize_car_image(source: Path, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+        img = img.resize(CAR_IMAGE_SIZE, Resampling.LANCZOS)
+        img.save(target, format="JPEG", quality=85)
+    source.unlink(missing_ok=True)
+
+
+@job_handler("resize_car_image")
+async def resize_car_image_job(context: JobContext, car_id: int, source: str):
+    # the staged upload has to be on storage the worker shares with the web process
+    target = Path(f"static/cars/{car_id}.jpg")
+    await asyncio.to_thread(_resize_car_image, Path(source), target)
+    return {"path": str(target)}
+
+
+@job_handler("render_invoice")
+async def render_invoice_job(context: JobContext, order_id: int):
+    async with async_session() as db:
+        version = await db.scalar(select(OrderModel.version).where(OrderModel.id == order_id))
+        if version is None:
+            return None
+        path = await invoice_file(order_id, version, lambda: cart.load_invoice(order_id, db))
+    return {"path": str(path)}
@@ -0,0 +1,65 @@
+from enum import Enum
+from sqlalchemy.orm import selectinload, joinedload, load_only, raiseload
+
+from app.models import (PartModel, CarModel, ManufacturerModel, CategoryModel, WarehouseModel, WarehousePartModel,
+                        OrderModel, OrderItemModel)
+
+
+class LoadProfile(str, Enum):
+    LIST_ROW = "list_row"
+    DETAIL = "detail"
+    DROPDOWN = "dropdown"
+
+
+# Relationships are lazy="select" on the models, so nothing is eager-loaded unless a CRUD function asks for it
+# through one of these profiles. LIST_ROW and DROPDOWN also raise on any relationship access, which keeps
+# row-per-relationship explosions from sneaking back into list pages.
+_PROFILES = {
+    PartModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (joinedload(PartModel.category),
+                             selectinload(PartModel.manufacturers),
+                             selectinload(PartModel.cars),
+                             selectinload(PartModel.warehouse_parts).joinedload(WarehousePartModel.warehouse)),
+        LoadProfile.DROPDOWN: (load_only(PartModel.id, PartModel.name, PartModel.part_number), raiseload("*")),
+    },
+    CarModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (selectinload(CarModel.parts).load_only(PartModel.id, PartModel.name,
+                                                                    PartModel.part_number),),
+        LoadProfile.DROPDOWN: (load_only(CarModel.id, CarModel.brand, CarModel.model, CarModel.year_start,
+                                         CarModel.year_end, CarModel.engine_model), raiseload("*")),
+    },
+    ManufacturerModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (selectinload(ManufacturerModel.parts),),
+        LoadProfile.DROPDOWN: (load_only(ManufacturerModel.id, ManufacturerModel.name), raiseload("*")),
+    },
+    CategoryModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (selectinload(CategoryModel.subcategories, recursion_depth=-1),),
+        LoadProfile.DROPDOWN: (load_only(CategoryModel.id, CategoryModel.name), raiseload("*")),
+    },
+    WarehouseModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (selectinload(WarehouseModel.warehouse_parts),),
+        LoadProfile.DROPDOWN: (load_only(WarehouseModel.id, WarehouseModel.name, WarehouseModel.location),
+                               raiseload("*")),
+    },
+    OrderModel: {
+        LoadProfile.LIST_ROW: (raiseload("*"),),
+        LoadProfile.DETAIL: (selectinload(OrderModel.items).joinedload(OrderItemModel.part).
+                             load_only(PartModel.id, PartModel.name),),
+        LoadProfile.DROPDOWN: (load_only(OrderModel.id, OrderModel.status, OrderModel.created_at), raiseload("*")),
+    },
+    OrderItemModel: {
+        LoadProfile.LIST_ROW: (joinedload(OrderItemModel.part).load_only(PartModel.id, PartModel.name),),
+        LoadProfile.DETAIL: (joinedload(OrderItemModel.part).load_only(PartModel.id, PartModel.name, PartModel.price,
+                                                                        PartModel.qty_in_stock),),
+        LoadProfile.DROPDOWN: (raiseload("*"),),
+    },
+}
+
+
+def loader_options(model, profile: LoadProfile) -> tuple:
+    return _PROFILES[model][profile]
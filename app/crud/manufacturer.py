@@ -1,39 +1,44 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, Response, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, exists, delete
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from app.api.deps import get_async_db, get_current_active_admin
+from app.core.cache import response_cache
 from app.models import ManufacturerModel, UserModel
+from app.models.part import part_manufacturer
 from app.schemas.manufacturer import ManufacturerCreate, ManufacturerUpdate
-from app.schemas.pagination import Paginate, pagination_param, object_as_dict
+from app.schemas.pagination import Paginate, pagination_param, object_as_dict, paginate_query, next_cursor
+from app.crud.loaders import LoadProfile, loader_options
 
 paginate_dep = Annotated[Paginate, Depends(pagination_param)]
 
 
 async def get_all_manufacturers(db: AsyncSession):
-    result = await db.execute(select(ManufacturerModel))
+    result = await db.execute(select(ManufacturerModel).
+                              options(*loader_options(ManufacturerModel, LoadProfile.DROPDOWN)).
+                              order_by(ManufacturerModel.name, ManufacturerModel.id))
     return result.unique().scalars().all()
 
 
 async def get_manufacturers(paginate: paginate_dep, db: AsyncSession = Depends(get_async_db),):
-    offset = (paginate.page - 1) * paginate.per_page
     total_result = await db.execute(select(func.count()).select_from(ManufacturerModel))
     total = total_result.scalar()
-    result = await db.execute(select(ManufacturerModel).limit(paginate.per_page).offset(offset))
+    stmt = select(ManufacturerModel).options(*loader_options(ManufacturerModel, LoadProfile.LIST_ROW))
+    result = await db.execute(paginate_query(stmt, paginate, ManufacturerModel.name, ManufacturerModel.id))
     manufacturers = result.unique().scalars().all()
     dict_manufacturers = [await object_as_dict(manufacturer) for manufacturer in manufacturers]
 
     return {"manufacturers": dict_manufacturers,
             "total": total,
             "page": paginate.page,
-            "per_page": paginate.per_page}
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(manufacturers, paginate, ManufacturerModel.name, ManufacturerModel.id)}
 
 
 async def get_manufacturer_by_name(name: str, db: AsyncSession = Depends(get_async_db),):
 
     result = await db.execute(select(ManufacturerModel).
-                              options(selectinload(ManufacturerModel.parts)).
+                              options(*loader_options(ManufacturerModel, LoadProfile.DETAIL)).
                               filter(ManufacturerModel.name == name))
     manufacturer = result.scalars().first()
 
@@ -45,7 +50,7 @@ async def get_manufacturer_by_name(name: str, db: AsyncSession = Depends(get_asy
 async def get_manufacturer_by_id(manufacturer_id: int, db: AsyncSession = Depends(get_async_db),):
 
     result = await db.execute(select(ManufacturerModel).
-                              options(selectinload(ManufacturerModel.parts)).
+                              options(*loader_options(ManufacturerModel, LoadProfile.DETAIL)).
                               filter(ManufacturerModel.id == manufacturer_id))
     manufacturer = result.scalars().first()
 
@@ -98,24 +103,20 @@ async def update_manufacturer(manufacturer_id: int, manufacturer_in: Manufacture
     db.add(manufacturer)
     await db.commit()
     await db.refresh(manufacturer)
+    await response_cache.invalidate(f"manufacturer:{manufacturer_id}")
     return manufacturer
 
 
 async def delete_manufacturer(manufacturer_id: int, db: AsyncSession = Depends(get_async_db),
                               current_user: UserModel = Depends(get_current_active_admin),):
 
-    result = await db.execute(select(ManufacturerModel).
-                              options(selectinload(ManufacturerModel.parts)).
-                              filter(ManufacturerModel.id == manufacturer_id))
-    manufacturer = result.scalars().first()
-
-    if not manufacturer:
+    if not await db.scalar(select(exists().where(ManufacturerModel.id == manufacturer_id))):
         raise HTTPException(status_code=404, detail="Manufacturer not found",)
 
-    if manufacturer.parts:
+    if await db.scalar(select(exists().where(part_manufacturer.c.manufacturer_id == manufacturer_id))):
         raise HTTPException(status_code=400,
                             detail="Cannot delete manufacturer with associated parts. Remove parts first.",)
 
-    await db.delete(manufacturer)
+    await db.execute(delete(ManufacturerModel).where(ManufacturerModel.id == manufacturer_id))
     await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
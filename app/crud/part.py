@@ -1,35 +1,162 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, Response, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_, literal, tuple_, exists, Integer
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.pagination import Paginate, pagination_param, object_as_dict
+from app.schemas.pagination import Paginate, pagination_param, object_as_dict, paginate_query, next_cursor
 from app.api.deps import get_async_db, get_current_active_admin
+from app.core.cache import response_cache
+from app.core.etag import make_etag
+from app.core.session import async_session
 from app.models.manufacturer import ManufacturerModel
-from app.models.car import CarModel
-from app.models import PartModel, UserModel, WarehousePartModel
-from app.schemas.part import PartCreate, PartUpdate, PartWithRelations
+from app.models.car import CarModel, car_year_range
+from app.models import PartModel, UserModel, WarehousePartModel, CategoryModel, WarehouseModel
+from app.models.part import part_manufacturer, part_car
+from app.schemas.part import PartPage, PartCreate, PartUpdate, PartWithRelations, PartFilter, part_filter_param
 from app.crud import categories, warehouses
+from app.crud.loaders import LoadProfile, loader_options
+from app.crud.search import contains_pattern
 from app.schemas.warehouse import WarehousePartCreate
+from app.schemas.car import FitmentQuery
 
 paginate_dep = Annotated[Paginate, Depends(pagination_param)]
+filter_dep = Annotated[PartFilter, Depends(part_filter_param)]
 
 
-async def get_part_by_name(name: str, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
+def _search_condition(query: str):
+    pattern = contains_pattern(query)
+    return or_(PartModel.name.op("%")(query),
+               PartModel.name.ilike(pattern, escape="/"),
+               PartModel.part_number.ilike(pattern, escape="/"),
+               PartModel.manufacturer_part_number.ilike(pattern, escape="/"),
+               literal(query).op("<%")(PartModel.description))
+
+
+def _search_rank(query: str):
+    return func.greatest(func.similarity(PartModel.name, query),
+                         func.similarity(PartModel.part_number, query),
+                         func.similarity(PartModel.manufacturer_part_number, query),
+                         func.word_similarity(query, PartModel.description))
+
+
+async def search_parts(query: str, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
     offset = (paginate.page - 1) * paginate.per_page
-    result = await db.execute(select(PartModel).filter(PartModel.name.ilike(f"%{name}%")).
+    condition = _search_condition(query)
+    score = _search_rank(query).label("score")
+
+    total = await db.scalar(select(func.count()).select_from(PartModel).filter(condition))
+    result = await db.execute(select(PartModel, score).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+                              filter(condition).
+                              order_by(score.desc(), PartModel.id).
                               limit(int(paginate.per_page)).offset(offset))
 
+    items = [{**await object_as_dict(part), "score": part_score or 0.0}
+             for part, part_score in result.unique().all()]
+
+    return {"items": items,
+            "total": total,
+            "page": paginate.page,
+            "per_page": paginate.per_page}
+
+
+def _filter_conditions(filters: PartFilter) -> list:
+    conditions = []
+    if filters.q:
+        conditions.append(_search_condition(filters.q))
+    if filters.name:
+        conditions.append(PartModel.name.ilike(contains_pattern(filters.name), escape="/"))
+    if filters.part_number:
+        conditions.append(PartModel.part_number == filters.part_number)
+    if filters.manufacturer_part_number:
+        conditions.append(PartModel.manufacturer_part_number == filters.manufacturer_part_number)
+    if filters.category_id is not None:
+        conditions.append(PartModel.category_id.in_(categories.subtree_ids(filters.category_id)))
+    if filters.manufacturer_id is not None:
+        conditions.append(PartModel.id.in_(select(part_manufacturer.c.part_id).
+                                           where(part_manufacturer.c.manufacturer_id == filters.manufacturer_id)))
+    if filters.car_id is not None:
+        conditions.append(PartModel.id.in_(select(part_car.c.part_id).where(part_car.c.car_id == filters.car_id)))
+    if filters.price_min is not None:
+        conditions.append(PartModel.price >= filters.price_min)
+    if filters.price_max is not None:
+        conditions.append(PartModel.price <= filters.price_max)
+    if filters.in_stock:
+        conditions.append(PartModel.qty_in_stock - PartModel.qty_reserved > 0)
+    return conditions
+
+
+async def filter_parts(filters: filter_dep, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
+    stmt = (select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+            filter(*_filter_conditions(filters)))
+    if filters.q:
+        # results are ranked by relevance, which has no stable cursor; fail loudly instead of restarting at page 1
+        if paginate.after:
+            raise HTTPException(status_code=400, detail="Search results are paged with page, not after")
+        stmt = (stmt.order_by(_search_rank(filters.q).desc(), PartModel.id).
+                limit(paginate.per_page).offset((paginate.page - 1) * paginate.per_page))
+        cursor_keys = ()
+    else:
+        stmt = paginate_query(stmt, paginate, PartModel.name, PartModel.id)
+        cursor_keys = (PartModel.name, PartModel.id)
+
+    result = await db.execute(stmt)
     parts = result.unique().scalars().all()
     dict_part = [await object_as_dict(part) for part in parts]
 
-    return dict_part
+    return {"items": dict_part,
+            "page": paginate.page,
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, *cursor_keys) if cursor_keys else None}
+
+
+async def get_part_facets(filters: filter_dep, db: AsyncSession = Depends(get_async_db), ):
+    category_key = tuple_(PartModel.category_id, CategoryModel.name)
+    manufacturer_key = tuple_(part_manufacturer.c.manufacturer_id, ManufacturerModel.name)
+    stmt = (select(PartModel.category_id, CategoryModel.name.label("category_name"),
+                   part_manufacturer.c.manufacturer_id, ManufacturerModel.name.label("manufacturer_name"),
+                   func.grouping(PartModel.category_id).label("by_manufacturer"),
+                   func.grouping(part_manufacturer.c.manufacturer_id).label("by_category"),
+                   func.count(PartModel.id.distinct()).label("count"),
+                   func.count(PartModel.id.distinct()).filter(PartModel.qty_in_stock - PartModel.qty_reserved > 0).
+                   label("in_stock"),
+                   func.min(PartModel.price).label("price_min"),
+                   func.max(PartModel.price).label("price_max")).
+            select_from(PartModel).
+            outerjoin(CategoryModel, CategoryModel.id == PartModel.category_id).
+            outerjoin(part_manufacturer, part_manufacturer.c.part_id == PartModel.id).
+            outerjoin(ManufacturerModel, ManufacturerModel.id == part_manufacturer.c.manufacturer_id).
+            filter(*_filter_conditions(filters)).
+            group_by(func.grouping_sets(category_key, manufacturer_key, tuple_())))
+
+    facets = {"total": 0, "in_stock": 0, "price_min": None, "price_max": None,
+              "categories": [], "manufacturers": []}
+    for row in (await db.execute(stmt)).all():
+        if row.by_manufacturer and row.by_category:
+            facets.update(total=row.count, in_stock=row.in_stock,
+                          price_min=row.price_min, price_max=row.price_max)
+        elif row.by_manufacturer:
+            if row.manufacturer_id is not None:
+                facets["manufacturers"].append({"id": row.manufacturer_id, "name": row.manufacturer_name,
+                                                "count": row.count})
+        elif row.category_id is not None:
+            facets["categories"].append({"id": row.category_id, "name": row.category_name, "count": row.count})
+
+    facets["categories"].sort(key=lambda facet: -facet["count"])
+    facets["manufacturers"].sort(key=lambda facet: -facet["count"])
+    return facets
+
+
+async def get_part_by_name(name: str, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
+    result = await search_parts(query=name, paginate=paginate, db=db)
+
+    return result["items"]
 
 
 async def get_part_by_pn(part_pn: str, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
-    offset = (paginate.page - 1) * paginate.per_page
-    result = await db.execute(select(PartModel).filter(PartModel.part_number == part_pn).
-                              limit(int(paginate.per_page)).offset(offset))
+    stmt = (select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+            filter(PartModel.part_number == part_pn))
+    result = await db.execute(paginate_query(stmt, paginate, PartModel.id))
 
     parts = result.unique().scalars().all()
     dict_part = [await object_as_dict(part) for part in parts]
@@ -38,28 +165,33 @@ async def get_part_by_pn(part_pn: str, paginate: paginate_dep, db: AsyncSession
 
 
 async def get_part_by_m_pn(m_part_n: str, db: AsyncSession = Depends(get_async_db), ):
-    result = await db.execute(select(PartModel).filter(PartModel.manufacturer_part_number == m_part_n))
+    result = await db.execute(select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+                              filter(PartModel.manufacturer_part_number == m_part_n))
 
     parts = result.unique().scalars().all()
 
     return parts
 
 
-async def get_part_by_category(category_id: int, db: AsyncSession = Depends(get_async_db),):
-    result = await db.execute(select(PartModel).filter(PartModel.category_id == category_id))
+async def get_part_by_category(category_id: int, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db),):
+    stmt = (select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+            filter(PartModel.category_id.in_(categories.subtree_ids(category_id))))
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+    result = await db.execute(paginate_query(stmt, paginate, PartModel.name, PartModel.id))
 
     parts = result.unique().scalars().all()
+    dict_part = [await object_as_dict(part) for part in parts]
 
-    return parts
+    return {"items": dict_part,
+            "total": total,
+            "page": paginate.page,
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, PartModel.name, PartModel.id)}
 
 
 async def get_part_by_id(part_id: int, db: AsyncSession = Depends(get_async_db), ):
-    result = await db.execute(select(PartModel).options(
-        selectinload(PartModel.manufacturers),
-        selectinload(PartModel.cars),
-        selectinload(PartModel.category),
-        selectinload(PartModel.warehouse_parts).selectinload(WarehousePartModel.warehouse)
-        ).filter(PartModel.id == part_id))
+    result = await db.execute(select(PartModel).options(*loader_options(PartModel, LoadProfile.DETAIL)).
+                              filter(PartModel.id == part_id))
     part = result.scalar_one_or_none()
     if not part:
         raise HTTPException(status_code=404, detail="Part not found", )
@@ -68,12 +200,53 @@ async def get_part_by_id(part_id: int, db: AsyncSession = Depends(get_async_db),
     return part_dict
 
 
+async def get_part_etag(part_id: int, db: AsyncSession = Depends(get_async_db), ) -> str:
+    """ETag of the part detail payload, computed from the versions of the part and everything embedded in it."""
+    def related_versions(model, link_column, part_column):
+        return (select(func.array_agg(aggregate_order_by(model.version, model.id))).
+                join(link_column.table, link_column == model.id).
+                where(part_column == PartModel.id).scalar_subquery())
+
+    stmt = (select(PartModel.version, CategoryModel.version,
+                   related_versions(CarModel, part_car.c.car_id, part_car.c.part_id),
+                   related_versions(ManufacturerModel, part_manufacturer.c.manufacturer_id,
+                                    part_manufacturer.c.part_id),
+                   related_versions(WarehouseModel, WarehousePartModel.warehouse_id, WarehousePartModel.part_id)).
+            outerjoin(CategoryModel, CategoryModel.id == PartModel.category_id).
+            where(PartModel.id == part_id))
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Part not found", )
+
+    return make_etag("part", part_id, *row)
+
+
+async def get_part_json(part_id: int, etag: str) -> bytes:
+    """Part detail payload cached under its ETag, so the body always matches the ETag sent with it.
+
+    Misses load from the primary: a lagging replica read right after an invalidation would put pre-write data
+    back into the shared cache for the whole TTL.
+    """
+    async def load():
+        async with async_session() as db:
+            part = await get_part_by_id(part_id=part_id, db=db)
+        tags = [f"part:{part.id}",
+                *(f"manufacturer:{manufacturer.id}" for manufacturer in part.manufacturers),
+                *(f"car:{car.id}" for car in part.cars),
+                *(f"warehouse:{warehouse_part.warehouse_id}" for warehouse_part in part.warehouse_parts)]
+        if part.category:
+            tags.append(f"category:{part.category.id}")
+        return part.model_dump_json().encode(), tags
+
+    return await response_cache.get_or_set(f"part:{part_id}:{etag}", load)
+
+
 async def get_all_parts(paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
-    offset = (paginate.page - 1) * paginate.per_page
     total_result = await db.execute(select(func.count()).select_from(PartModel))
     total = total_result.scalar()
 
-    result = await db.execute(select(PartModel).limit(int(paginate.per_page)).offset(offset))
+    stmt = select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW))
+    result = await db.execute(paginate_query(stmt, paginate, PartModel.name, PartModel.id))
 
     parts = result.unique().scalars().all()
     dict_part = [await object_as_dict(part) for part in parts]
@@ -81,7 +254,8 @@ async def get_all_parts(paginate: paginate_dep, db: AsyncSession = Depends(get_a
     return {"items": dict_part,
             "total": total,
             "page": paginate.page,
-            "per_page": paginate.per_page}
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, PartModel.name, PartModel.id)}
 
 
 async def create_part(part_in: PartCreate, db: AsyncSession = Depends(get_async_db),
@@ -124,6 +298,7 @@ async def create_part(part_in: PartCreate, db: AsyncSession = Depends(get_async_
         await warehouses.add_part_to_warehouse(warehouse_id=part_in.warehouse_id, part_data=part_d,
                                                db=db, current_user=current_user)
         await db.refresh(part)
+    await response_cache.invalidate(*(f"car:{car_id}" for car_id in part_in.car_id or ()))
     return part
 
 
@@ -170,15 +345,21 @@ async def update_part(part_id: int, part_in: PartUpdate, db: AsyncSession = Depe
         result = await db.execute(select(CarModel).filter(CarModel.id.in_(part_in.cars_id)))
         part.cars = result.unique().scalars().all()
 
+    # relationship-only edits don't touch the parts row, so bump the version explicitly
+    part.version = PartModel.version + 1
+
     # db.add(part)
     await db.commit()
     await db.refresh(part)
+    await response_cache.invalidate(f"part:{part_id}", *(f"car:{car_id}" for car_id in part_in.cars_id or ()))
     return part
 
 
 async def delete_part(part_id: int, db: AsyncSession = Depends(get_async_db),
                       current_user: UserModel = Depends(get_current_active_admin), ):
-    result = await db.execute(select(PartModel).filter(PartModel.id == part_id))
+    result = await db.execute(select(PartModel)
+                              .options(selectinload(PartModel.manufacturers), selectinload(PartModel.cars))
+                              .filter(PartModel.id == part_id))
     part = result.scalars().first()
 
     if not part:
@@ -186,20 +367,62 @@ async def delete_part(part_id: int, db: AsyncSession = Depends(get_async_db),
 
     await db.delete(part)
     await db.commit()
+    await response_cache.invalidate(f"part:{part_id}")
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-async def get_compatible_parts(car_id: int, db: AsyncSession = Depends(get_async_db), ):
-    result = await db.execute(select(CarModel).filter(CarModel.id == car_id))
-    car = result.scalars().first()
+def _parts_for_cars(car_ids):
+    return PartModel.id.in_(select(part_car.c.part_id).where(part_car.c.car_id.in_(car_ids)))
 
-    if not car:
+
+async def get_compatible_parts(car_id: int, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
+    if not await db.scalar(select(exists().where(CarModel.id == car_id))):
         raise HTTPException(status_code=404, detail="Car not found", )
 
-    # offset = (paginate.page - 1) * paginate.per_page
-    result = await db.execute(select(PartModel).filter(PartModel.cars.any(id=car_id)))
+    stmt = (select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+            where(_parts_for_cars([car_id])))
+    result = await db.execute(paginate_query(stmt, paginate, PartModel.name, PartModel.id))
 
     parts = result.unique().scalars().all()
     dict_part = [await object_as_dict(part) for part in parts]
-    return dict_part
+    return {"items": dict_part,
+            "page": paginate.page,
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, PartModel.name, PartModel.id)}
+
+
+async def get_compatible_parts_json(car_id: int, paginate: paginate_dep, ) -> bytes:
+    # filled from the primary for the same reason as get_part_json
+    async def load():
+        async with async_session() as db:
+            page = await get_compatible_parts(car_id=car_id, paginate=paginate, db=db)
+        tags = [f"car:{car_id}", *(f"part:{part['id']}" for part in page["items"])]
+        return PartPage.model_validate(page).model_dump_json().encode(), tags
+
+    key = f"compatible:{car_id}:{paginate.per_page}:{paginate.after or paginate.page}"
+    return await response_cache.get_or_set(key, load)
+
+
+async def get_fitment_parts(fitment: FitmentQuery, paginate: paginate_dep, db: AsyncSession = Depends(get_async_db), ):
+    """Parts that fit any car matching brand/model, whose production years cover ``fitment.year``."""
+    car_ids = select(CarModel.id).where(CarModel.brand == fitment.brand,
+                                        CarModel.model == fitment.model,
+                                        car_year_range().op("@>")(literal(fitment.year, Integer)))
+    if fitment.engine_volume is not None:
+        car_ids = car_ids.where(CarModel.engine_volume == fitment.engine_volume)
+    if fitment.engine_type is not None:
+        car_ids = car_ids.where(CarModel.engine_type == fitment.engine_type)
+    if fitment.engine_model is not None:
+        car_ids = car_ids.where(CarModel.engine_model == fitment.engine_model)
+
+    stmt = (select(PartModel).options(*loader_options(PartModel, LoadProfile.LIST_ROW)).
+            where(_parts_for_cars(car_ids)))
+    result = await db.execute(paginate_query(stmt, paginate, PartModel.name, PartModel.id))
+
+    parts = result.unique().scalars().all()
+    dict_part = [await object_as_dict(part) for part in parts]
+    return {"items": dict_part,
+            "page": paginate.page,
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, PartModel.name, PartModel.id)}
@@ -0,0 +1,152 @@
+import csv
+import gzip
+import io
+import json
+from enum import Enum
+from typing import AsyncIterator
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from app.core.session import async_read_session
+from app.models import PartModel, CategoryModel, WarehousePartModel
+from app.models.part import part_car
+
+EXPORT_BATCH_SIZE = 2000
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+EXPORT_MEDIA_TYPES = {ExportFormat.CSV: "text/csv",
+                      ExportFormat.NDJSON: "application/x-ndjson",
+                      ExportFormat.PARQUET: "application/vnd.apache.parquet", }
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back via ``drain`` but keeps counting positions.
+
+    Parquet footers store absolute offsets, so ``tell`` has to keep growing even though nothing is retained.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _export_query(include_stock: bool, include_fitments: bool):
+    columns = [PartModel.id, PartModel.name, PartModel.part_number, PartModel.manufacturer_part_number,
+               PartModel.price, PartModel.qty_in_stock, PartModel.description, PartModel.category_id,
+               CategoryModel.name.label("category_name")]
+    if include_stock:
+        columns.append(select(func.jsonb_object_agg(WarehousePartModel.warehouse_id, WarehousePartModel.quantity,
+                                                    type_=JSONB)).
+                       where(WarehousePartModel.part_id == PartModel.id).scalar_subquery().label("stock"))
+    if include_fitments:
+        columns.append(select(func.array_agg(aggregate_order_by(part_car.c.car_id, part_car.c.car_id))).
+                       where(part_car.c.part_id == PartModel.id).scalar_subquery().label("car_ids"))
+
+    return (select(*columns).outerjoin(CategoryModel, CategoryModel.id == PartModel.category_id).
+            order_by(PartModel.id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def _csv_value(value):
+    if isinstance(value, dict):
+        return "|".join(f"{key}:{quantity}" for key, quantity in value.items())
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    return value
+
+
+def ensure_export_supported(export_format: ExportFormat):
+    # checked before the response starts, since a generator can no longer turn into an error response
+    if export_format == ExportFormat.PARQUET:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires the 'pyarrow' package")
+
+
+def _parquet_writer(sink, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"id": pa.int64(), "name": pa.string(), "part_number": pa.string(),
+             "manufacturer_part_number": pa.string(), "price": pa.float64(), "qty_in_stock": pa.int64(),
+             "description": pa.string(), "category_id": pa.int64(), "category_name": pa.string(),
+             "stock": pa.string(), "car_ids": pa.list_(pa.int64()), }
+    schema = pa.schema([(column, types[column]) for column in columns])
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write(rows):
+        data = {column: [row[index] for row in rows] for index, column in enumerate(columns)}
+        if "stock" in data:
+            data["stock"] = [json.dumps(stock) if stock is not None else None for stock in data["stock"]]
+        writer.write_batch(pa.record_batch(data, schema=schema))
+
+    return write, writer.close
+
+
+async def iter_part_export(export_format: ExportFormat, include_stock: bool = False, include_fitments: bool = False,
+                           compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream the whole catalog from a server-side cursor, one encoded (and optionally gzipped) batch at a time.
+
+    Opens its own read session because the generator runs after the request's dependencies are closed.
+    """
+    stmt = _export_query(include_stock, include_fitments)
+    columns = [column.name for column in stmt.selected_columns]
+
+    sink = ChunkSink()
+    target = gzip.GzipFile(fileobj=sink, mode="wb") if compress else sink
+    close = None
+
+    if export_format == ExportFormat.PARQUET:
+        write, close = _parquet_writer(target, columns)
+    elif export_format == ExportFormat.NDJSON:
+        def write(rows):
+            target.write("".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows).encode())
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        def write(rows):
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            target.write(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+
+    async with async_read_session() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            write(rows)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+    if export_format == ExportFormat.CSV:
+        write(())
+    if close is not None:
+        close()
+    if compress:
+        target.close()
+    yield sink.drain()
@@ -0,0 +1,304 @@
+import csv
+import io
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, Optional
+from fastapi import Depends, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete, func, exists, literal, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_current_active_admin
+from app.core.cache import response_cache
+from app.core.session import async_session
+from app.models import (PartModel, CarModel, CategoryModel, ManufacturerModel, WarehouseModel, WarehousePartModel,
+                        PartImportModel, PartImportRowModel, StockMovementModel, UserModel)
+from app.models.part import part_manufacturer, part_car
+from app.models.part_import import ImportStatus
+from app.models.stock_movement import MovementKind
+
+COPY_BATCH_SIZE = 5000
+UPSERT_BATCH_SIZE = 5000
+
+STAGING_COLUMNS = ("import_id", "row_number", "name", "part_number", "manufacturer_part_number", "price",
+                   "quantity", "description", "category_name", "warehouse_id", "manufacturer_names", "car_ids",
+                   "error")
+
+
+def _iter_csv(file) -> Iterator[dict]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(file) -> Iterator[dict]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(status_code=400, detail="XLSX import requires the 'openpyxl' package")
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def _iter_upload(upload: UploadFile) -> Iterator[dict]:
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".xlsx"):
+        return _iter_xlsx(upload.file)
+    if filename.endswith(".csv"):
+        return _iter_csv(upload.file)
+    raise HTTPException(status_code=400, detail="Only .csv and .xlsx files can be imported")
+
+
+def _staging_record(import_id: int, row_number: int, raw: dict) -> tuple:
+    row = {str(key).strip().lower(): value for key, value in raw.items() if key is not None}
+    errors = []
+
+    def text(key: str, limit: int) -> Optional[str]:
+        value = row.get(key)
+        value = str(value).strip() if value is not None else ""
+        if len(value) > limit:
+            errors.append(f"{key} is longer than {limit} characters")
+            return value[:limit]
+        return value or None
+
+    def number(key: str, cast) -> Optional[float]:
+        value = row.get(key)
+        if value is None or str(value).strip() == "":
+            return None
+        try:
+            return cast(str(value).strip().replace(",", "."))
+        except ValueError:
+            errors.append(f"{key} is not a valid number")
+            return None
+
+    name = text("name", 50)
+    manufacturer_part_number = text("manufacturer_part_number", 20)
+    category_name = text("category", 50)
+    price = number("price", float)
+    quantity = number("quantity", int) or 0
+    warehouse_id = number("warehouse_id", int)
+
+    if not name:
+        errors.append("name is required")
+    if not manufacturer_part_number:
+        errors.append("manufacturer_part_number is required")
+    if not category_name:
+        errors.append("category is required")
+    if price is None and not str(row.get("price") or "").strip():
+        errors.append("price is required")
+    elif price is not None and price < 0:
+        errors.append("price must not be negative")
+    if quantity < 0:
+        errors.append("quantity must not be negative")
+
+    manufacturer_names = [value.strip()[:50] for value in str(row.get("manufacturers") or "").split("|")
+                          if value.strip()]
+    try:
+        car_ids = [int(car_id) for car_id in str(row.get("cars") or "").split("|") if car_id.strip()]
+    except ValueError:
+        errors.append("cars must be '|'-separated car ids")
+        car_ids = []
+
+    return (import_id, row_number, name, text("part_number", 20), manufacturer_part_number, price, quantity,
+            text("description", 10000), category_name, warehouse_id, manufacturer_names or None, car_ids or None,
+            "; ".join(errors) or None)
+
+
+async def _copy_to_staging(records: list, db: AsyncSession):
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(PartImportRowModel.__tablename__,
+                                                                 records=records, columns=STAGING_COLUMNS)
+
+
+async def stage_part_import(upload: UploadFile, db: AsyncSession = Depends(get_async_db),
+                            current_user: UserModel = Depends(get_current_active_admin), ):
+    """Stream the uploaded file into the staging table in COPY batches; nothing is resolved yet."""
+    rows = _iter_upload(upload)
+    part_import = PartImportModel(filename=upload.filename, created_by=current_user.id)
+    db.add(part_import)
+    await db.flush()
+
+    started = time.perf_counter()
+    total = 0
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(rows, COPY_BATCH_SIZE)))
+        if not batch:
+            break
+        records = [_staging_record(part_import.id, total + offset + 2, raw) for offset, raw in enumerate(batch)]
+        await _copy_to_staging(records, db)
+        total += len(batch)
+
+    part_import.total_rows = total
+    part_import.staging_seconds = time.perf_counter() - started
+    await db.commit()
+    await db.refresh(part_import)
+    return part_import
+
+
+def _staged(import_id: int):
+    return (PartImportRowModel.import_id == import_id) & PartImportRowModel.error.is_(None)
+
+
+async def _resolve_rows(import_id: int, db: AsyncSession):
+    row = PartImportRowModel
+
+    await db.execute(update(row).where(_staged(import_id), row.category_name == CategoryModel.name).
+                     values(category_id=CategoryModel.id))
+    await db.execute(update(row).where(_staged(import_id), row.category_id.is_(None)).
+                     values(error="Unknown category"))
+
+    await db.execute(update(row).where(_staged(import_id), row.warehouse_id.is_not(None),
+                                       ~exists().where(WarehouseModel.id == row.warehouse_id)).
+                     values(error="Unknown warehouse"))
+
+    names = func.unnest(row.manufacturer_names).table_valued("name").render_derived()
+    await db.execute(update(row).where(_staged(import_id), exists(
+        select(names.c.name).where(~exists().where(ManufacturerModel.name == names.c.name)))).
+                     values(error="Unknown manufacturer"))
+
+    car_ids = func.unnest(row.car_ids).table_valued("id").render_derived()
+    await db.execute(update(row).where(_staged(import_id), exists(
+        select(car_ids.c.id).where(~exists().where(CarModel.id == car_ids.c.id)))).
+                     values(error="Unknown car id"))
+
+    ranked = (select(row.row_number,
+                     func.row_number().over(partition_by=row.manufacturer_part_number,
+                                            order_by=row.row_number.desc()).label("rank")).
+              where(_staged(import_id)).subquery())
+    await db.execute(update(row).where(row.import_id == import_id, row.row_number == ranked.c.row_number,
+                                       ranked.c.rank > 1).
+                     values(error="Duplicate manufacturer_part_number; a later row replaces it"))
+
+
+async def _upsert_batch(import_id: int, first_row: int, last_row: int, db: AsyncSession):
+    row = PartImportRowModel
+    in_batch = _staged(import_id) & row.row_number.between(first_row, last_row)
+
+    parts = insert(PartModel).from_select(
+        ["name", "part_number", "manufacturer_part_number", "price", "qty_in_stock", "description", "category_id"],
+        select(row.name, row.part_number, row.manufacturer_part_number, row.price, literal(0), row.description,
+               row.category_id).where(in_batch))
+    await db.execute(parts.on_conflict_do_update(
+        index_elements=[PartModel.manufacturer_part_number],
+        set_={"name": parts.excluded.name,
+              "part_number": parts.excluded.part_number,
+              "price": parts.excluded.price,
+              "description": func.coalesce(parts.excluded.description, PartModel.description),
+              "category_id": parts.excluded.category_id,
+              "version": PartModel.version + 1, }))
+
+    await db.execute(update(row).where(in_batch, PartModel.manufacturer_part_number == row.manufacturer_part_number).
+                     values(part_id=PartModel.id))
+
+    names = func.unnest(row.manufacturer_names).table_valued("name").render_derived()
+    await db.execute(insert(part_manufacturer).from_select(
+        ["part_id", "manufacturer_id"],
+        select(row.part_id, ManufacturerModel.id).select_from(row).join(names, true()).
+        join(ManufacturerModel, ManufacturerModel.name == names.c.name).where(in_batch)).on_conflict_do_nothing())
+
+    car_ids = func.unnest(row.car_ids).table_valued("id").render_derived()
+    await db.execute(insert(part_car).from_select(
+        ["part_id", "car_id"],
+        select(row.part_id, car_ids.c.id).select_from(row).join(car_ids, true()).where(in_batch)).
+                     on_conflict_do_nothing())
+
+    # the file states the stock level per warehouse, so an existing quantity is replaced rather than added to;
+    # the ledger gets the difference so it keeps summing to the on-hand quantity
+    current = (select(WarehousePartModel.quantity).
+               where(WarehousePartModel.warehouse_id == row.warehouse_id,
+                     WarehousePartModel.part_id == row.part_id).scalar_subquery())
+    delta = (row.quantity - func.coalesce(current, 0)).label("delta")
+    changes = (select(row.warehouse_id, row.part_id, delta, literal(MovementKind.ADJUSTMENT.value),
+                      literal(f"import:{import_id}"), PartImportModel.created_by).
+               join(PartImportModel, PartImportModel.id == row.import_id).
+               where(in_batch, row.warehouse_id.is_not(None)).subquery())
+    await db.execute(insert(StockMovementModel).from_select(
+        ["warehouse_id", "part_id", "delta", "kind", "reference", "created_by"],
+        select(changes).where(changes.c.delta != 0)))
+
+    stock = insert(WarehousePartModel).from_select(
+        ["warehouse_id", "part_id", "quantity"],
+        select(row.warehouse_id, row.part_id, row.quantity).where(in_batch, row.warehouse_id.is_not(None)))
+    await db.execute(stock.on_conflict_do_update(index_elements=[WarehousePartModel.warehouse_id,
+                                                                 WarehousePartModel.part_id],
+                                                 set_={"quantity": stock.excluded.quantity}))
+
+    totals = (select(WarehousePartModel.part_id, func.sum(WarehousePartModel.quantity).label("total")).
+              where(WarehousePartModel.part_id.in_(select(row.part_id).where(in_batch))).
+              group_by(WarehousePartModel.part_id).subquery())
+    await db.execute(update(PartModel).where(PartModel.id == totals.c.part_id).values(qty_in_stock=totals.c.total))
+
+
+async def process_part_import(import_id: int):
+    """Resolve and upsert a staged import; runs after the upload request, on its own session."""
+    async with async_session() as db:
+        part_import = await db.get(PartImportModel, import_id)
+        part_import.status = ImportStatus.RUNNING
+        part_import.started_at = datetime.utcnow()
+        await db.commit()
+
+        started = time.perf_counter()
+        try:
+            await _resolve_rows(import_id, db)
+            await db.commit()
+
+            last_row = part_import.total_rows + 1
+            for first_row in range(2, last_row + 1, UPSERT_BATCH_SIZE):
+                await _upsert_batch(import_id, first_row, first_row + UPSERT_BATCH_SIZE - 1, db)
+                await db.commit()
+
+            row = PartImportRowModel
+            counts = (await db.execute(select(func.count(row.part_id), func.count(row.error)).
+                                       where(row.import_id == import_id))).one()
+            part_import.imported_rows, part_import.failed_rows = counts
+            await db.execute(delete(row).where(row.import_id == import_id, row.error.is_(None)))
+            part_import.status = ImportStatus.COMPLETED
+        except Exception as e:
+            await db.rollback()
+            part_import = await db.get(PartImportModel, import_id)
+            part_import.status = ImportStatus.FAILED
+            part_import.error = str(e)
+        finally:
+            part_import.processing_seconds = time.perf_counter() - started
+            part_import.finished_at = datetime.utcnow()
+            await db.commit()
+            await response_cache.clear()
+
+
+async def get_part_import(import_id: int, db: AsyncSession = Depends(get_async_db),
+                          current_user: UserModel = Depends(get_current_active_admin), ):
+    part_import = await db.get(PartImportModel, import_id)
+    if not part_import:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return part_import
+
+
+async def iter_import_errors(import_id: int):
+    """Yield the error report as CSV chunks; opens its own session because it outlives the request's."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["row_number", "manufacturer_part_number", "error"])
+
+    row = PartImportRowModel
+    async with async_session() as db:
+        result = await db.stream(select(row.row_number, row.manufacturer_part_number, row.error).
+                                 where(row.import_id == import_id, row.error.is_not(None)).
+                                 order_by(row.row_number).
+                                 execution_options(yield_per=COPY_BATCH_SIZE))
+        async for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
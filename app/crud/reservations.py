@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, update, delete, func, exists, literal, or_, Integer, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.session import async_session
+from app.models import PartModel, StockReservationModel
+
+# Lock order for reservations is the (user, part) advisory lock, then hold row, then part row; checkout takes
+# hold rows before any stock rows.
+
+
+async def set_reservation(user_id: int, part_id: int, quantity: int, db: AsyncSession):
+    """Set the user's hold on a part to ``quantity`` (0 releases it) and restart its TTL, in one statement.
+
+    Only the difference to the current hold is charged against ``qty_in_stock - qty_reserved``, so re-adding
+    a part does not count its earlier units twice. Raises 404/400 if the part is missing or too little is free.
+    """
+    reservation = StockReservationModel
+    # FOR UPDATE below cannot lock a hold that does not exist yet, so serialize changes to this hold explicitly;
+    # otherwise two first adds both read "no hold" and both charge qty_reserved
+    await db.execute(select(func.pg_advisory_xact_lock(user_id, part_id)))
+    current = (select(reservation.quantity).
+               where(reservation.user_id == user_id, reservation.part_id == part_id).
+               with_for_update().cte("current"))
+    change = quantity - func.coalesce(select(current.c.quantity).scalar_subquery(), 0)
+    # holds change qty_available, so the part version is bumped like for any other stock change
+    part = (update(PartModel).
+            # only growing a hold needs free stock; shrinking one must work even after stock fell below the holds
+            where(PartModel.id == part_id,
+                  or_(change <= 0, PartModel.qty_in_stock - PartModel.qty_reserved >= change)).
+            values(qty_reserved=PartModel.qty_reserved + change).
+            returning(PartModel.id).cte("part"))
+
+    if quantity:
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+        hold = insert(reservation).from_select(
+            ["user_id", "part_id", "quantity", "expires_at"],
+            select(literal(user_id, Integer), literal(part_id, Integer), literal(quantity, Integer),
+                   literal(expires_at, DateTime)).where(exists(select(part.c.id))))
+        hold = hold.on_conflict_do_update(index_elements=[reservation.user_id, reservation.part_id],
+                                          set_={"quantity": hold.excluded.quantity,
+                                                "expires_at": hold.excluded.expires_at})
+    else:
+        hold = delete(reservation).where(reservation.user_id == user_id, reservation.part_id == part_id,
+                                         exists(select(part.c.id)))
+
+    if await db.scalar(select(func.count()).select_from(part).add_cte(hold.cte("hold"))):
+        return
+
+    available = await db.scalar(select(PartModel.qty_in_stock - PartModel.qty_reserved).
+                                where(PartModel.id == part_id))
+    if available is None:
+        raise HTTPException(status_code=404, detail="Part not found")
+    raise HTTPException(status_code=400, detail=f"Not enough stock. Available: {available}")
+
+
+async def claim_reservations(user_id: int, part_ids, db: AsyncSession) -> dict:
+    """Delete the user's holds on ``part_ids`` and return ``{part_id: quantity}``.
+
+    ``parts.qty_reserved`` is left alone: the caller must subtract the returned quantities in the same
+    transaction, which checkout does together with the stock decrement.
+    """
+    result = await db.execute(delete(StockReservationModel).
+                              where(StockReservationModel.user_id == user_id,
+                                    StockReservationModel.part_id.in_(part_ids)).
+                              returning(StockReservationModel.part_id, StockReservationModel.quantity))
+    return {part_id: quantity for part_id, quantity in result}
+
+
+async def expire_reservations(batch_size: Optional[int] = None) -> int:
+    """Release holds past their TTL in batches along the ``expires_at`` index; each batch commits on its own.
+
+    Rows locked by a concurrent cart update are skipped and picked up by the next sweep.
+    """
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    reservation = StockReservationModel
+    released = 0
+    async with async_session() as db:
+        while True:
+            expired = (select(reservation.id).where(reservation.expires_at < datetime.utcnow()).
+                       order_by(reservation.expires_at).limit(batch_size).
+                       with_for_update(skip_locked=True).cte("expired"))
+            deleted = (delete(reservation).where(reservation.id == expired.c.id).
+                       returning(reservation.part_id, reservation.quantity).cte("deleted"))
+            totals = (select(deleted.c.part_id, func.sum(deleted.c.quantity).label("quantity")).
+                      group_by(deleted.c.part_id).cte("totals"))
+            parts_locked = (select(PartModel.id).where(PartModel.id.in_(select(totals.c.part_id))).
+                            order_by(PartModel.id).with_for_update(key_share=True).cte("parts_locked"))
+            parts = (update(PartModel).where(PartModel.id == parts_locked.c.id, PartModel.id == totals.c.part_id).
+                     values(qty_reserved=PartModel.qty_reserved - totals.c.quantity).cte("parts"))
+
+            count, part_ids = (await db.execute(select(func.count(), func.array_agg(deleted.c.part_id.distinct())).
+                                                select_from(deleted).add_cte(parts))).one()
+            await db.commit()
+            if part_ids:
+                await response_cache.invalidate(*(f"part:{part_id}" for part_id in part_ids))
+            released += count
+            if count < batch_size:
+                return released
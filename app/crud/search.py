@@ -0,0 +1,3 @@
+def contains_pattern(value: str) -> str:
+    # the pattern is bound as a plain literal so the planner can match it against the trigram indexes
+    return "%{}%".format(value.replace("/", "//").replace("%", "/%").replace("_", "/_"))
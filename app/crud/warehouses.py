@@ -1,28 +1,38 @@
-from typing import Annotated
+from typing import Annotated, Awaitable, Callable, Optional
 from fastapi import Depends, HTTPException, Response, status
-from sqlalchemy import select, update, insert, delete, func
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update, delete, func, tuple_, case, exists, literal, union_all, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm import selectinload
 
 from app.api.deps import get_async_db, get_current_active_admin
-from app.models import WarehouseModel, UserModel, PartModel, WarehousePartModel
-from app.schemas.pagination import Paginate, pagination_param, object_as_dict
-from app.schemas.warehouse import WarehouseCreate, WarehouseUpdate, WarehousePartCreate
+from app.core.cache import response_cache
+from app.models import (WarehouseModel, UserModel, PartModel, WarehousePartModel, StockMovementModel,
+                        StockReservationModel)
+from app.models.stock_movement import MovementKind
+from app.schemas.pagination import Paginate, pagination_param, object_as_dict, paginate_query, next_cursor
+from app.schemas.warehouse import (WarehouseCreate, WarehouseUpdate, WarehousePartCreate, StockTransfer,
+                                   StockBatch)
+from app.crud.loaders import LoadProfile, loader_options
 
 paginate_dep = Annotated[Paginate, Depends(pagination_param)]
 
 
 async def get_warehouses(paginate: paginate_dep, db: AsyncSession = Depends(get_async_db),):
-    offset = (paginate.page - 1) * paginate.per_page
-    result = await db.execute(select(WarehouseModel).limit(paginate.per_page).offset(offset))
+    stmt = select(WarehouseModel).options(*loader_options(WarehouseModel, LoadProfile.LIST_ROW))
+    result = await db.execute(paginate_query(stmt, paginate, WarehouseModel.name, WarehouseModel.id))
     warehouses = result.scalars().all()
     dict_ware = [await object_as_dict(part) for part in warehouses]
-    return dict_ware
+    return {"items": dict_ware,
+            "page": paginate.page,
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(warehouses, paginate, WarehouseModel.name, WarehouseModel.id)}
 
 
 async def get_all_warehouses(db: AsyncSession):
-    result = await db.execute(select(WarehouseModel))
+    result = await db.execute(select(WarehouseModel).options(*loader_options(WarehouseModel, LoadProfile.DROPDOWN)).
+                              order_by(WarehouseModel.name, WarehouseModel.id))
     return result.scalars().all()
 
 
@@ -45,11 +55,10 @@ async def create_warehouse(warehouse_in: WarehouseCreate, db: AsyncSession = Dep
 
 
 async def get_warehouse_parts(warehouse_id: int, paginate: paginate_dep, db: AsyncSession):
-    offset = (paginate.page - 1) * paginate.per_page
     stmt = (select(WarehousePartModel).options(
-        selectinload(WarehousePartModel.part)).where(WarehousePartModel.warehouse_id == warehouse_id)
-            .limit(paginate.per_page).offset(offset))
-    result = await db.execute(stmt)
+        selectinload(WarehousePartModel.part).load_only(PartModel.id, PartModel.name, PartModel.part_number))
+            .where(WarehousePartModel.warehouse_id == warehouse_id))
+    result = await db.execute(paginate_query(stmt, paginate, WarehousePartModel.part_id))
     parts = result.scalars().all()
 
     dict_parts = []
@@ -69,7 +78,8 @@ async def get_warehouse_parts(warehouse_id: int, paginate: paginate_dep, db: Asy
     return {"items": dict_parts,
             "total": total,
             "page": paginate.page,
-            "per_page": paginate.per_page, }
+            "per_page": paginate.per_page,
+            "next_cursor": next_cursor(parts, paginate, WarehousePartModel.part_id), }
 
 
 async def update_warehouse(warehouse_id: int, warehouse_in: WarehouseUpdate,
@@ -90,6 +100,7 @@ async def update_warehouse(warehouse_id: int, warehouse_in: WarehouseUpdate,
     db.add(warehouse)
     await db.commit()
     await db.refresh(warehouse)
+    await response_cache.invalidate(f"warehouse:{warehouse_id}")
     return warehouse
 
 
@@ -106,151 +117,375 @@ async def delete_warehouse(warehouse_id: int, db: AsyncSession = Depends(get_asy
         raise HTTPException(status_code=400,
                             detail="Cannot delete warehouse with associated parts. Remove parts first.", )
 
+    # the stock ledger is append-only, so a warehouse stock has ever moved through stays
+    history_error = HTTPException(status_code=409, detail="Cannot delete warehouse with stock movement history.")
+    if await db.scalar(select(exists().where(StockMovementModel.warehouse_id == warehouse_id))):
+        raise history_error
+
     await db.delete(warehouse)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # a movement recorded after the check above
+        await db.rollback()
+        raise history_error
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+def _stock_change(warehouse_id: int, part_id: int, delta: int, *conditions):
+    """Statement applying ``delta`` to one warehouse row: an upsert for increases, a guarded update for decreases.
+
+    A decrease matches nothing when the row is missing or holds less than ``-delta``, so stock cannot go negative.
+    """
+    columns = (WarehousePartModel.warehouse_id, WarehousePartModel.part_id, WarehousePartModel.quantity,
+               literal(delta, Integer).label("delta"))
+    if delta >= 0:
+        stmt = insert(WarehousePartModel).from_select(
+            ["warehouse_id", "part_id", "quantity"],
+            select(literal(warehouse_id, Integer), literal(part_id, Integer), literal(delta, Integer)).
+            where(*conditions))
+        return stmt.on_conflict_do_update(index_elements=[WarehousePartModel.warehouse_id,
+                                                          WarehousePartModel.part_id],
+                                          set_={"quantity": WarehousePartModel.quantity + delta}).returning(*columns)
+
+    return (update(WarehousePartModel).
+            where(WarehousePartModel.warehouse_id == warehouse_id, WarehousePartModel.part_id == part_id,
+                  WarehousePartModel.quantity >= -delta, *conditions).
+            values(quantity=WarehousePartModel.quantity + delta).returning(*columns))
+
+
+def _movement(stock, kind: MovementKind, order_id: Optional[int] = None, reference: Optional[str] = None,
+              user_id: Optional[int] = None):
+    return insert(StockMovementModel).from_select(
+        ["warehouse_id", "part_id", "delta", "kind", "order_id", "reference", "created_by"],
+        select(stock.c.warehouse_id, stock.c.part_id, stock.c.delta, literal(kind.value, String),
+               literal(order_id, Integer), literal(reference, String), literal(user_id, Integer)).
+        where(stock.c.delta != 0))
+
+
+async def _apply_stock(stock, kind: MovementKind, db: AsyncSession, order_id: Optional[int] = None,
+                       reference: Optional[str] = None, user_id: Optional[int] = None) -> Optional[tuple[int, int]]:
+    stock = stock.cte("stock")
+    total = (update(PartModel).where(PartModel.id == stock.c.part_id).
+             values(qty_in_stock=PartModel.qty_in_stock + stock.c.delta).
+             returning(PartModel.qty_in_stock).cte("total"))
+    movement = _movement(stock, kind, order_id, reference, user_id).cte("movement")
+    row = (await db.execute(select(stock.c.quantity, total.c.qty_in_stock).add_cte(movement))).first()
+    return tuple(row) if row else None
+
+
+async def apply_stock_movement(warehouse_id: int, part_id: int, delta: int, kind: MovementKind, db: AsyncSession,
+                               order_id: Optional[int] = None, reference: Optional[str] = None,
+                               user_id: Optional[int] = None) -> Optional[tuple[int, int]]:
+    """Change a warehouse row, the part total and the ledger in one statement, relying on row locks taken by it.
+
+    Returns the new (warehouse quantity, part total), or ``None`` if a decrease found too little stock, in
+    which case nothing was written. Does not commit, so it joins the caller's transaction.
+    """
+    return await _apply_stock(_stock_change(warehouse_id, part_id, delta), kind, db, order_id, reference, user_id)
+
+
+async def _stock_error(warehouse_id: int, part_id: int, db: AsyncSession) -> HTTPException:
+    # only reached after a guarded statement matched nothing, so the happy path never pays for this query
+    row = (await db.execute(select(exists().where(WarehouseModel.id == warehouse_id),
+                                   exists().where(PartModel.id == part_id),
+                                   select(WarehousePartModel.quantity).
+                                   where(WarehousePartModel.warehouse_id == warehouse_id,
+                                         WarehousePartModel.part_id == part_id).scalar_subquery()))).one()
+    warehouse_exists, part_exists, available = row
+    if not warehouse_exists:
+        return HTTPException(status_code=404, detail="Warehouse not found")
+    if not part_exists:
+        return HTTPException(status_code=404, detail="Part not found")
+    if available is None:
+        return HTTPException(status_code=404, detail="Part not found in warehouse")
+    return HTTPException(status_code=400, detail=f"Not enough stock. Available: {available}")
+
+
 async def add_part_to_warehouse(warehouse_id: int, part_data: WarehousePartCreate,
                                 db: AsyncSession = Depends(get_async_db),
                                 current_user: UserModel = Depends(get_current_active_admin),):
 
     try:
-        warehouse = await db.get(WarehouseModel, warehouse_id)
-        if not warehouse:
-            raise HTTPException(status_code=404, detail="Warehouse not found")
-
-        part = await db.scalar(select(PartModel).options(noload(PartModel.category),
-                                                         noload(PartModel.manufacturers),
-                                                         noload(PartModel.cars))
-                               .where(PartModel.id == part_data.part_id)
-                               .with_for_update(nowait=True))
-        if not part:
-            raise HTTPException(status_code=404, detail="Part not found")
-
-        existing_association = await db.scalar(select(WarehousePartModel).where(
-                WarehousePartModel.warehouse_id == warehouse_id,
-                WarehousePartModel.part_id == part_data.part_id))
-
-        if existing_association:
-            await db.execute(update(WarehousePartModel).
-                             where(WarehousePartModel.warehouse_id == warehouse_id,
-                                   WarehousePartModel.part_id == part_data.part_id,).
-                             values(quantity=WarehousePartModel.quantity + part_data.quantity))
-        else:
-            await db.execute(insert(WarehousePartModel).values(warehouse_id=warehouse_id,
-                                                               part_id=part_data.part_id,
-                                                               quantity=part_data.quantity,))
-
-        total_quantity = await recalculate_part_stock(part_id=part_data.part_id, db=db)
-        await db.execute(update(PartModel).where(PartModel.id == part_data.part_id).values(qty_in_stock=total_quantity))
-
+        current_quantity, total_quantity = await apply_stock_movement(
+            warehouse_id=warehouse_id, part_id=part_data.part_id, delta=part_data.quantity, kind=MovementKind.RECEIPT,
+            db=db, user_id=current_user.id)
         await db.commit()
-
-        return {
-            "message": "Part quantity updated in warehouse" if existing_association
-            else "Part added to warehouse successfully",
-            "part_id": part_data.part_id,
-            "warehouse_id": warehouse_id,
-            "current_quantity": part_data.quantity,
-            "total_in_stock": total_quantity
-        }
-
+    except IntegrityError:
+        await db.rollback()
+        raise await _stock_error(warehouse_id, part_data.part_id, db)
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
+    await response_cache.invalidate(f"part:{part_data.part_id}")
+    return {
+        "message": "Part added to warehouse successfully" if current_quantity == part_data.quantity
+        else "Part quantity updated in warehouse",
+        "part_id": part_data.part_id,
+        "warehouse_id": warehouse_id,
+        "current_quantity": current_quantity,
+        "total_in_stock": total_quantity
+    }
+
 
 async def decrease_part_quantity_in_warehouse(warehouse_id: int, part_data: WarehousePartCreate,
                                               db: AsyncSession = Depends(get_async_db),
                                               current_user: UserModel = Depends(get_current_active_admin),):
     try:
-        warehouse = await db.get(WarehouseModel, warehouse_id)
-        if not warehouse:
-            raise HTTPException(status_code=404, detail="Warehouse not found")
+        result = await apply_stock_movement(warehouse_id=warehouse_id, part_id=part_data.part_id,
+                                            delta=-part_data.quantity, kind=MovementKind.ADJUSTMENT,
+                                            db=db, user_id=current_user.id)
+        if result is None:
+            await db.rollback()
+            raise await _stock_error(warehouse_id, part_data.part_id, db)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
-        part = await db.scalar(
-            select(PartModel).filter(PartModel.id == part_data.part_id).with_for_update()
-        )
-        if not part:
-            raise HTTPException(status_code=404, detail="Part not found")
+    await response_cache.invalidate(f"part:{part_data.part_id}")
+    return {"message": f"Decreased part quantity by {part_data.quantity}",
+            "remaining_in_warehouse": result[0],
+            "part_id": part_data.part_id,
+            "warehouse_id": warehouse_id, }
 
-        existing_association = await db.scalar(select(WarehousePartModel).
-                                               where(WarehousePartModel.warehouse_id == warehouse_id,
-                                                     WarehousePartModel.part_id == part_data.part_id,))
 
-        if not existing_association:
-            raise HTTPException(status_code=404, detail="Part not found in warehouse")
+async def delete_part_from_warehouse(warehouse_id: int, part_id: int, db: AsyncSession = Depends(get_async_db),
+                                     current_user: UserModel = Depends(get_current_active_admin),):
+    stock = (delete(WarehousePartModel).
+             where(WarehousePartModel.warehouse_id == warehouse_id, WarehousePartModel.part_id == part_id).
+             returning(WarehousePartModel.warehouse_id, WarehousePartModel.part_id, WarehousePartModel.quantity,
+                       (-WarehousePartModel.quantity).label("delta")))
+    try:
+        result = await _apply_stock(stock, MovementKind.ADJUSTMENT, db, user_id=current_user.id)
+        if result is None:
+            await db.rollback()
+            raise await _stock_error(warehouse_id, part_id, db)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
-        current_qty = existing_association.quantity
-        if part_data.quantity > current_qty:
-            raise HTTPException(status_code=400, detail="Cannot decrease below zero")
+    await response_cache.invalidate(f"part:{part_id}")
+    return {"message": "Part removed from warehouse",
+            "removed_quantity": result[0],
+            "part_id": part_id,
+            "warehouse_id": warehouse_id, }
 
-        await db.execute(update(WarehousePartModel).
-                         where(WarehousePartModel.warehouse_id == warehouse_id,
-                               WarehousePartModel.part_id == part_data.part_id,).
-                         values(quantity=current_qty - part_data.quantity))
 
-        total_quantity = await recalculate_part_stock(part_id=part_data.part_id, db=db)
-        await db.execute(update(PartModel).where(PartModel.id == part_data.part_id).values(qty_in_stock=total_quantity))
+async def transfer_stock(transfer: StockTransfer, db: AsyncSession = Depends(get_async_db),
+                         current_user: UserModel = Depends(get_current_active_admin),):
+    if transfer.from_warehouse_id == transfer.to_warehouse_id:
+        raise HTTPException(status_code=400, detail="Source and destination warehouses must differ")
 
+    reference = f"transfer {transfer.from_warehouse_id}->{transfer.to_warehouse_id}"
+    try:
+        # two warehouse rows change, so take them in key order first; opposite transfers would deadlock otherwise
+        await db.execute(select(WarehousePartModel.warehouse_id).
+                         where(WarehousePartModel.part_id == transfer.part_id,
+                               WarehousePartModel.warehouse_id.in_([transfer.from_warehouse_id,
+                                                                    transfer.to_warehouse_id])).
+                         order_by(WarehousePartModel.warehouse_id).with_for_update())
+
+        source = _stock_change(transfer.from_warehouse_id, transfer.part_id, -transfer.quantity).cte("source")
+        target = _stock_change(transfer.to_warehouse_id, transfer.part_id, transfer.quantity,
+                               exists(select(source.c.quantity))).cte("target")
+        touch = (update(PartModel).where(PartModel.id == transfer.part_id, exists(select(target.c.quantity))).
+                 values(version=PartModel.version + 1).cte("touch"))
+        legs = union_all(select(source.c.warehouse_id, source.c.part_id, source.c.delta),
+                         select(target.c.warehouse_id, target.c.part_id, target.c.delta)).subquery("legs")
+        movement = _movement(legs, MovementKind.TRANSFER, reference=reference, user_id=current_user.id)
+        moved = select(source.c.quantity, target.c.quantity).add_cte(touch, movement.cte("movement"))
+        row = (await db.execute(moved)).first()
+        if row is None:
+            await db.rollback()
+            raise await _stock_error(transfer.from_warehouse_id, transfer.part_id, db)
         await db.commit()
-
-        return {"message": f"Decreased part quantity by {part_data.quantity}",
-                "remaining_in_warehouse": current_qty - part_data.quantity,
-                "part_id": part_data.part_id,
-                "warehouse_id": warehouse_id, }
-
+    except IntegrityError:
+        await db.rollback()
+        raise await _stock_error(transfer.to_warehouse_id, transfer.part_id, db)
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
+    await response_cache.invalidate(f"part:{transfer.part_id}")
+    return {"message": f"Transferred {transfer.quantity} units",
+            "part_id": transfer.part_id,
+            "from_warehouse_id": transfer.from_warehouse_id,
+            "remaining_in_source": row[0],
+            "to_warehouse_id": transfer.to_warehouse_id,
+            "quantity_in_destination": row[1], }
 
-async def delete_part_from_warehouse(warehouse_id: int, part_id: int, db: AsyncSession = Depends(get_async_db),
-                                     current_user: UserModel = Depends(get_current_active_admin),):
-    try:
-        warehouse = await db.get(WarehouseModel, warehouse_id)
-        if not warehouse:
-            raise HTTPException(status_code=404, detail="Warehouse not found")
-
-        part = await db.scalar(
-            select(PartModel).filter(PartModel.id == part_id).with_for_update()
-        )
-        if not part:
-            raise HTTPException(status_code=404, detail="Part not found")
 
-        existing_association = await db.scalar(
-            select(WarehousePartModel).where(WarehousePartModel.warehouse_id == warehouse_id,
-                                             WarehousePartModel.part_id == part_id,))
+def _stock_lines(keys: list, deltas: list):
+    lines = func.unnest(literal([warehouse_id for warehouse_id, _ in keys], ARRAY(Integer)),
+                        literal([part_id for _, part_id in keys], ARRAY(Integer)),
+                        literal(deltas, ARRAY(Integer)))
+    return lines.table_valued("warehouse_id", "part_id", "delta").render_derived()
 
-        if not existing_association:
-            raise HTTPException(status_code=404, detail="Part not found in warehouse")
 
-        quantity_to_remove = existing_association.quantity
+async def apply_stock_batch(batch: StockBatch, db: AsyncSession = Depends(get_async_db),
+                            current_user: UserModel = Depends(get_current_active_admin),):
+    """Apply many stock deltas in one transaction with a fixed number of statements.
 
-        await db.execute(
-            delete(WarehousePartModel).where(WarehousePartModel.warehouse_id == warehouse_id,
-                                             WarehousePartModel.part_id == part_id))
+    Lines for the same warehouse and part are summed. Warehouse rows and then their parts are locked in key
+    order, the order every stock write takes them in, so overlapping writers wait for each other instead of
+    deadlocking. Lines that would leave a warehouse negative are reported and skipped; the rest are applied.
+    """
+    deltas: dict = {}
+    for line in batch.lines:
+        key = (line.warehouse_id, line.part_id)
+        deltas[key] = deltas.get(key, 0) + line.delta
+    keys = sorted(deltas)
 
-        total_quantity = await recalculate_part_stock(part_id=part_id, db=db)
-        await db.execute(update(PartModel).where(PartModel.id == part_id).values(qty_in_stock=total_quantity))
+    try:
+        warehouse_ids = set(await db.scalars(select(WarehouseModel.id).
+                                             where(WarehouseModel.id.in_({key[0] for key in keys}))))
+        part_ids = set(await db.scalars(select(PartModel.id).where(PartModel.id.in_({key[1] for key in keys}))))
+
+        lines = _stock_lines(keys, [deltas[key] for key in keys])
+        locked = await db.execute(select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id,
+                                         WarehousePartModel.quantity).
+                                  join(lines, (lines.c.warehouse_id == WarehousePartModel.warehouse_id) &
+                                       (lines.c.part_id == WarehousePartModel.part_id)).
+                                  order_by(WarehousePartModel.warehouse_id, WarehousePartModel.part_id).
+                                  with_for_update(of=WarehousePartModel))
+        quantities = {(row.warehouse_id, row.part_id): row.quantity for row in locked}
+
+        rejected = {}
+        for key in keys:
+            available = quantities.get(key, 0)
+            if key[0] not in warehouse_ids:
+                rejected[key] = "Warehouse not found"
+            elif key[1] not in part_ids:
+                rejected[key] = "Part not found"
+            elif available + deltas[key] < 0:
+                rejected[key] = f"Not enough stock. Available: {available}"
+        accepted = [key for key in keys if key not in rejected]
+
+        if accepted:
+            lines = _stock_lines(accepted, [deltas[key] for key in accepted])
+            stock = insert(WarehousePartModel).from_select(
+                ["warehouse_id", "part_id", "quantity"],
+                select(lines.c.warehouse_id, lines.c.part_id, lines.c.delta).
+                order_by(lines.c.warehouse_id, lines.c.part_id))
+            stock = stock.on_conflict_do_update(
+                index_elements=[WarehousePartModel.warehouse_id, WarehousePartModel.part_id],
+                set_={"quantity": WarehousePartModel.quantity + stock.excluded.quantity}).returning(
+                WarehousePartModel.warehouse_id, WarehousePartModel.part_id, WarehousePartModel.quantity)
+            quantities.update({(row.warehouse_id, row.part_id): row.quantity for row in await db.execute(stock)})
+
+            kind = case((lines.c.delta > 0, MovementKind.RECEIPT.value), else_=MovementKind.ADJUSTMENT.value)
+            await db.execute(insert(StockMovementModel).from_select(
+                ["warehouse_id", "part_id", "delta", "kind", "reference", "created_by"],
+                select(lines.c.warehouse_id, lines.c.part_id, lines.c.delta, kind,
+                       literal(batch.reference, String), literal(current_user.id, Integer))))
+
+            affected = sorted({key[1] for key in accepted})
+            # FOR NO KEY UPDATE, like a plain UPDATE: the ledger and warehouse foreign keys above already hold
+            # KEY SHARE on these parts, and a FOR UPDATE would deadlock against another batch holding the same
+            await db.execute(select(PartModel.id).where(PartModel.id.in_(affected)).order_by(PartModel.id).
+                             with_for_update(key_share=True))
+            totals = (select(WarehousePartModel.part_id, func.sum(WarehousePartModel.quantity).label("total")).
+                      where(WarehousePartModel.part_id.in_(affected)).
+                      group_by(WarehousePartModel.part_id).subquery())
+            await db.execute(update(PartModel).where(PartModel.id == totals.c.part_id).
+                             values(qty_in_stock=totals.c.total))
 
         await db.commit()
-
-        return {"message": "Part removed from warehouse",
-                "removed_quantity": quantity_to_remove,
-                "part_id": part_id,
-                "warehouse_id": warehouse_id, }
+        if accepted:
+            await response_cache.invalidate(*{f"part:{key[1]}" for key in accepted})
 
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database operation failed: {str(e)}")
 
-
-async def recalculate_part_stock(part_id: int, db: AsyncSession):
-    total_quantity_stmt = (select(func.coalesce(func.sum(WarehousePartModel.quantity), 0)).
-                           where(WarehousePartModel.part_id == part_id))
-
-    total_quantity = await db.scalar(total_quantity_stmt)
-
-    return total_quantity
+    return [{**line.model_dump(),
+             "applied": (line.warehouse_id, line.part_id) not in rejected,
+             "quantity": quantities.get((line.warehouse_id, line.part_id)),
+             "detail": rejected.get((line.warehouse_id, line.part_id))} for line in batch.lines]
+
+
+async def reconcile_stock(batch_size: int = 1000, fix: bool = False, db: AsyncSession = Depends(get_async_db),
+                          current_user: UserModel = Depends(get_current_active_admin),
+                          progress: Optional[Callable[[float], Awaitable]] = None,):
+    """Check warehouse quantities against the ledger, and part totals and reservations against warehouse quantities
+    and holds, in keyset batches.
+
+    With ``fix`` the ledger gets an adjustment for each difference (e.g. opening balances that predate it), part
+    totals are reset to the warehouse sum and ``qty_reserved`` to the sum of the part's holds. Each batch commits
+    on its own so the job holds no long locks.
+    ``progress`` is awaited with the finished fraction after each of the two passes.
+    """
+    ledger_mismatches, total_mismatches, reserved_mismatches = [], [], []
+    checked_rows = checked_parts = 0
+
+    ledger_sum = (select(func.coalesce(func.sum(StockMovementModel.delta), 0)).
+                  where(StockMovementModel.warehouse_id == WarehousePartModel.warehouse_id,
+                        StockMovementModel.part_id == WarehousePartModel.part_id).scalar_subquery())
+    last_key = (0, 0)
+    while True:
+        rows = (await db.execute(select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id,
+                                        WarehousePartModel.quantity, ledger_sum.label("ledger")).
+                                 where(tuple_(WarehousePartModel.warehouse_id, WarehousePartModel.part_id) >
+                                       tuple_(*last_key)).
+                                 order_by(WarehousePartModel.warehouse_id, WarehousePartModel.part_id).
+                                 limit(batch_size))).all()
+        if not rows:
+            break
+        checked_rows += len(rows)
+        last_key = (rows[-1].warehouse_id, rows[-1].part_id)
+
+        drift = [row for row in rows if row.quantity != row.ledger]
+        ledger_mismatches.extend({"warehouse_id": row.warehouse_id, "part_id": row.part_id,
+                                  "quantity": row.quantity, "ledger": row.ledger} for row in drift)
+        if fix and drift:
+            await db.execute(insert(StockMovementModel),
+                             [{"warehouse_id": row.warehouse_id, "part_id": row.part_id,
+                               "delta": row.quantity - row.ledger, "kind": MovementKind.ADJUSTMENT,
+                               "reference": "reconciliation", "created_by": current_user.id} for row in drift])
+            await db.commit()
+
+    if progress is not None:
+        await progress(0.5)
+
+    warehouse_sum = (select(func.coalesce(func.sum(WarehousePartModel.quantity), 0)).
+                     where(WarehousePartModel.part_id == PartModel.id).scalar_subquery())
+    reserved_sum = (select(func.coalesce(func.sum(StockReservationModel.quantity), 0)).
+                    where(StockReservationModel.part_id == PartModel.id).scalar_subquery())
+    last_id = 0
+    while True:
+        rows = (await db.execute(select(PartModel.id, PartModel.qty_in_stock, warehouse_sum.label("warehouses"),
+                                        PartModel.qty_reserved, reserved_sum.label("holds")).
+                                 where(PartModel.id > last_id).order_by(PartModel.id).limit(batch_size))).all()
+        if not rows:
+            break
+        checked_parts += len(rows)
+        last_id = rows[-1].id
+
+        drift = [row for row in rows if row.qty_in_stock != row.warehouses]
+        total_mismatches.extend({"part_id": row.id, "qty_in_stock": row.qty_in_stock,
+                                 "warehouses": row.warehouses} for row in drift)
+        held = [row for row in rows if row.qty_reserved != row.holds]
+        reserved_mismatches.extend({"part_id": row.id, "qty_reserved": row.qty_reserved,
+                                    "holds": row.holds} for row in held)
+        if fix and (drift or held):
+            # every stock and hold change also writes the part row, so once it is locked the sums are stable;
+            # they are taken again in the update, since the values read above may already be out of date
+            await db.execute(select(PartModel.id).where(PartModel.id.in_({row.id for row in drift + held})).
+                             order_by(PartModel.id).with_for_update(key_share=True))
+            if drift:
+                await db.execute(update(PartModel).where(PartModel.id.in_([row.id for row in drift])).
+                                 values(qty_in_stock=warehouse_sum))
+            if held:
+                await db.execute(update(PartModel).where(PartModel.id.in_([row.id for row in held])).
+                                 values(qty_reserved=reserved_sum))
+            await db.commit()
+
+    return {"checked_warehouse_rows": checked_rows,
+            "checked_parts": checked_parts,
+            "ledger_mismatches": ledger_mismatches,
+            "total_mismatches": total_mismatches,
+            "reserved_mismatches": reserved_mismatches,
+            "fixed": fix, }
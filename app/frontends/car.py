@@ -1,13 +1,15 @@
-from PIL import Image
-from PIL.Image import Resampling
+import asyncio
+import shutil
 from pathlib import Path
 from typing import Optional
+from uuid import uuid4
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin, get_current_user
-from app.crud import car
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
+from app.core.config import settings
+from app.crud import car, jobs
 from app.models.user import UserModel
 from app.schemas.car import CarCreate, CarUpdate
 from app.schemas.pagination import Paginate, pagination_param
@@ -16,9 +18,29 @@ html_router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 
+def _stage_upload(upload, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with target.open("wb") as staged:
+        shutil.copyfileobj(upload, staged)
+
+
+async def _queue_image_resize(car_id: int, image: Optional[UploadFile], db: AsyncSession, current_user: UserModel):
+    """Stage the upload and leave resizing to a background job."""
+    if not image or not image.filename:
+        return
+    ext = Path(image.filename).suffix.lower()
+    if ext not in [".jpeg", ".jpg", ".png"]:
+        return
+
+    source = Path(settings.UPLOAD_STAGING_DIR) / f"car_{car_id}_{uuid4().hex}{ext}"
+    await asyncio.to_thread(_stage_upload, image.file, source)
+    await jobs.submit_job("resize_car_image", {"car_id": car_id, "source": str(source)}, db=db,
+                          current_user=current_user)
+
+
 @html_router.get("/list", response_class=HTMLResponse)
 async def get_car_list(request: Request, paginate: Paginate = Depends(pagination_param),
-                       db: AsyncSession = Depends(get_async_db),
+                       db: AsyncSession = Depends(get_read_db),
                        current_user: UserModel = Depends(get_current_user),
                        name: Optional[str] = None,):
     if name:
@@ -67,26 +89,14 @@ async def car_add_page(request: Request, db: AsyncSession = Depends(get_async_db
 
     new_car = await car.create_car(car_in=car_in, db=db, current_user=current_user)
 
-    target_width = 600
-    target_height = 400
-
-    if image and image.filename:
-        ext = Path(image.filename).suffix.lower()
-        if ext in [".jpeg", ".jpg", ".png"]:
-            img_path = Path(f"static/cars/{new_car.id}.jpg")
-            img_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with Image.open(image.file) as img:
-                img = img.convert("RGB")
-                img = img.resize((target_width, target_height), Resampling.LANCZOS)
-                img.save(img_path, format="JPEG", quality=85)
+    await _queue_image_resize(new_car.id, image, db, current_user)
 
     return RedirectResponse(url="/list", status_code=302)
 
 
 @html_router.get("/{car_id}", response_class=HTMLResponse)
 async def car_detail_page(request: Request, car_id: int,
-                          db: AsyncSession = Depends(get_async_db),
+                          db: AsyncSession = Depends(get_read_db),
                           current_user: UserModel = Depends(get_current_user)):
     car_model = await car.get_car_by_id(car_id=car_id, db=db)
     if not car_model:
@@ -135,19 +145,7 @@ async def update_part_from_form(request: Request, car_id: int,
                        body_type=body_type)
 
     await car.update_car(car_id=car_id, car_in=car_in, db=db, current_user=current_user)
-    target_width = 600
-    target_height = 400
-
-    if image and image.filename:
-        ext = Path(image.filename).suffix.lower()
-        if ext in [".jpeg", ".jpg", ".png"]:
-            img_path = Path(f"static/cars/{car_id}.jpg")
-            img_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with Image.open(image.file) as img:
-                img = img.convert("RGB")
-                img = img.resize((target_width, target_height), Resampling.LANCZOS)
-                img.save(img_path, format="JPEG", quality=85)
+    await _queue_image_resize(car_id, image, db, current_user)
 
     return RedirectResponse(url=f"/cars/{car_id}", status_code=302)
 
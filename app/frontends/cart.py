@@ -1,7 +1,8 @@
+from uuid import uuid4
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse
 
 from app.api.deps import get_async_db, get_current_user
 from app.models import UserModel
@@ -19,13 +20,14 @@ async def view_cart_page(request: Request, db: AsyncSession = Depends(get_async_
     cart = await cart_crud.view_cart(db=db, current_user=current_user)
     return templates.TemplateResponse("cart/view.html", {"request": request,
                                                          "cart": cart,
+                                                         "idempotency_key": uuid4().hex,
                                                          "current_user": current_user})
 
 
 @html_router.post("/add", response_class=HTMLResponse)
 async def add_to_cart_page(request: Request,
                            part_id: int = Form(...),
-                           quantity: int = Form(...),
+                           quantity: int = Form(..., gt=0),
                            db: AsyncSession = Depends(get_async_db),
                            current_user: UserModel = Depends(get_current_user),):
     item = OrderItemCreate(part_id=part_id, quantity=quantity)
@@ -62,5 +64,5 @@ async def print_order_page(request: Request,
 
 @html_router.get("/order/{order_id}/print-pdf")
 async def print_order_pdf_endpoint(order_id: int, pdf=Depends(cart_crud.print_to_pdf)):
-    return StreamingResponse(pdf, media_type="application/pdf",
-                             headers={"Content-Disposition": f"inline; filename=order_{order_id}.pdf"})
+    return FileResponse(pdf, media_type="application/pdf", filename=f"order_{order_id}.pdf",
+                        content_disposition_type="inline")
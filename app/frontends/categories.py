@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin, get_current_user
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
 from app.crud import categories
 from app.schemas.category import CategoryCreate
 from app.models.user import UserModel
@@ -16,7 +16,7 @@ templates = Jinja2Templates(directory="app/templates")
 
 
 @html_router.get("/list", response_class=HTMLResponse)
-async def get_all_category(request: Request, db: AsyncSession = Depends(get_async_db),
+async def get_all_category(request: Request, db: AsyncSession = Depends(get_read_db),
                            current_user: UserModel = Depends(get_current_user),):
     items = await categories.get_category_tree(db=db)
     return templates.TemplateResponse("categories/list.html", {"request": request,
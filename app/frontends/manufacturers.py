@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin, get_current_user
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
 from app.crud import manufacturer
 from app.models.user import UserModel
 from app.schemas.manufacturer import ManufacturerCreate, ManufacturerUpdate
@@ -18,7 +18,7 @@ templates = Jinja2Templates(directory="app/templates")
 
 @html_router.get("/list", response_class=HTMLResponse)
 async def get_manufacture_list(request: Request, paginate: Paginate = Depends(pagination_param),
-                               db: AsyncSession = Depends(get_async_db),
+                               db: AsyncSession = Depends(get_read_db),
                                current_user: UserModel = Depends(get_current_user),
                                name: Optional[str] = None, ):
     if name:
@@ -74,7 +74,7 @@ async def manufacturer_add_page(request: Request, db: AsyncSession = Depends(get
 
 @html_router.get("/{manufacturer_id}", response_class=HTMLResponse)
 async def manufacturer_detail_page(request: Request, manufacturer_id: int,
-                                   db: AsyncSession = Depends(get_async_db),
+                                   db: AsyncSession = Depends(get_read_db),
                                    current_user: UserModel = Depends(get_current_user)):
     manufacturer_model = await manufacturer.get_manufacturer_by_id(manufacturer_id=manufacturer_id, db=db)
     if not manufacturer_model:
@@ -1,11 +1,12 @@
 from typing import List, Optional
+from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, status, Request, Form, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin, get_current_user
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
 from app.models.user import UserModel
-from app.schemas.part import Part, PartCreate, PartUpdate
+from app.schemas.part import Part, PartCreate, PartUpdate, PartFilter, part_filter_param
 from app.schemas.pagination import Paginate, pagination_param
 from app.crud import part, manufacturer, car, warehouses
 
@@ -16,41 +17,23 @@ templates = Jinja2Templates(directory="app/templates")
 
 @html_router.get("/", response_class=HTMLResponse)
 async def list_parts_page(request: Request, paginate: Paginate = Depends(pagination_param),
-                          db: AsyncSession = Depends(get_async_db),
-                          current_user: UserModel = Depends(get_current_user),
-                          name: Optional[str] = None, part_number: Optional[str] = None,
-                          manufacturer_part_number: Optional[str] = None,
-                          category_id: Optional[int] = None,):
-    parts = []
-    if category_id is not None:
-        parts = await part.get_part_by_category(category_id=category_id, db=db)
-        return templates.TemplateResponse("parts/list.html", {"request": request,
-                                                              "parts": parts,
-                                                              "current_user": current_user, })
-    if name:
-        parts = await part.get_part_by_name(paginate=paginate, name=name, db=db)
-        return templates.TemplateResponse("parts/list.html", {"request": request,
-                                                              "parts": parts,
-                                                              "current_user": current_user, })
-    elif part_number:
-        parts = await part.get_part_by_pn(paginate=paginate, part_pn=part_number, db=db)
-        return templates.TemplateResponse("parts/list.html", {"request": request,
-                                                              "parts": parts,
-                                                              "current_user": current_user, })
-    elif manufacturer_part_number:
-        parts = await part.get_part_by_m_pn(m_part_n=manufacturer_part_number, db=db)
-        return templates.TemplateResponse("parts/list.html", {"request": request,
-                                                              "parts": parts,
-                                                              "current_user": current_user, })
-    else:
-        result = await part.get_all_parts(paginate=paginate, db=db)
-
-        return templates.TemplateResponse("parts/list.html", {"request": request,
-                                                              "parts": result["items"],
-                                                              "page": result["page"],
-                                                              "limit": result["per_page"],
-                                                              "total": result["total"],
-                                                              "current_user": current_user, })
+                          filters: PartFilter = Depends(part_filter_param),
+                          db: AsyncSession = Depends(get_read_db),
+                          current_user: UserModel = Depends(get_current_user),):
+    result = await part.filter_parts(filters=filters, paginate=paginate, db=db)
+    facets = await part.get_part_facets(filters=filters, db=db)
+
+    return templates.TemplateResponse("parts/list.html", {"request": request,
+                                                          "parts": result["items"],
+                                                          "page": result["page"],
+                                                          "limit": result["per_page"],
+                                                          "total": facets["total"],
+                                                          "next_cursor": result["next_cursor"],
+                                                          "facets": facets,
+                                                          "filters": filters,
+                                                          "filter_query": urlencode(filters.model_dump(
+                                                              exclude_none=True, exclude_defaults=True)),
+                                                          "current_user": current_user, })
 
 
 @html_router.get("/add_new", response_class=HTMLResponse)
@@ -165,7 +148,7 @@ async def delete_part_from_form(request: Request, part_id: int,
 
 @html_router.get("/{part_id}", response_class=HTMLResponse)
 async def part_detail_page(request: Request, part_id: int,
-                           db: AsyncSession = Depends(get_async_db),
+                           db: AsyncSession = Depends(get_read_db),
                            current_user: UserModel = Depends(get_current_user)):
     part_model = await part.get_part_by_id(part_id=part_id, db=db)
 
@@ -3,7 +3,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.deps import get_async_db, get_current_active_admin, get_current_user
+from app.api.deps import get_async_db, get_read_db, get_current_active_admin, get_current_user
 from app.crud.car import get_all_cars
 from app.crud.manufacturer import get_all_manufacturers
 from app.crud.part import get_part_by_id
@@ -20,12 +20,13 @@ templates = Jinja2Templates(directory="app/templates")
 
 @html_router.get("/list", response_class=HTMLResponse)
 async def warehouse_list(request: Request, paginate: Paginate = Depends(pagination_param),
-                         db: AsyncSession = Depends(get_async_db),
+                         db: AsyncSession = Depends(get_read_db),
                          current_user: UserModel = Depends(get_current_user),):
     items = await warehouses.get_warehouses(paginate, db)
     return templates.TemplateResponse("warehouses/list.html", {"request": request,
                                                                "current_user": current_user,
-                                                               "warehouses": items,
+                                                               "warehouses": items["items"],
+                                                               "next_cursor": items["next_cursor"],
                                                                "pagination": paginate, })
 
 
@@ -5,11 +5,22 @@ from .order_item import OrderItemModel
 from .car import CarModel
 from .part import PartModel
 from .category import CategoryModel
+from .category_closure import CategoryClosureModel
 from .warehouse import WarehouseModel
 from .warehouse_part import WarehousePartModel
 from .manufacturer import ManufacturerModel
+from .cache_version import CacheVersionModel
+from .part_import import PartImportModel
+from .part_import_row import PartImportRowModel
+from .stock_movement import StockMovementModel
+from .stock_reservation import StockReservationModel
+from .idempotency_key import IdempotencyKeyModel
+from .cart_item import CartItemModel
+from .job import JobModel
 
 __all__ = [
     "UserModel", "OrderModel", "OrderItemModel", "CarModel", "PartModel",
-    "CategoryModel", "WarehouseModel", "WarehousePartModel", "ManufacturerModel", "BaseModel"
+    "CategoryModel", "CategoryClosureModel", "WarehouseModel", "WarehousePartModel", "ManufacturerModel",
+    "CacheVersionModel", "PartImportModel", "PartImportRowModel", "StockMovementModel", "StockReservationModel",
+    "IdempotencyKeyModel", "CartItemModel", "JobModel", "BaseModel"
 ]
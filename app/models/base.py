@@ -1,5 +1,17 @@
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import literal_column
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
 
 
 class BaseModel(DeclarativeBase):
     pass
+
+
+class VersionMixin:
+    """Row version bumped by every ORM or Core UPDATE of the row; used for ETags."""
+
+    __mapper_args__ = {"eager_defaults": True}
+
+    @declared_attr
+    def version(cls) -> Mapped[int]:
+        return mapped_column(nullable=False, default=1, server_default="1",
+                             onupdate=literal_column(f"{cls.__tablename__}.version") + 1)
@@ -1,8 +1,8 @@
 from enum import Enum
 from typing import Optional
-from sqlalchemy import String, Integer, Float, UniqueConstraint, Index, CheckConstraint
+from sqlalchemy import String, Integer, Float, UniqueConstraint, Index, CheckConstraint, func, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
 class EngineType(str, Enum):
@@ -14,11 +14,14 @@ class EngineType(str, Enum):
     HYBRID = "hybrid"
 
 
-class CarModel(BaseModel):
+OPEN_END_YEAR = 9999
+
+
+class CarModel(VersionMixin, BaseModel):
     __tablename__ = 'cars'
     __table_args__ = (
         UniqueConstraint('brand', 'model', 'year_start', 'engine_type', 'engine_model', name='uix_car_definition'),
-        Index('idx_cars_brand_model', 'brand', 'model'),
+        Index('idx_cars_brand_model', 'brand', 'model', 'id'),
         CheckConstraint('year_end IS NULL OR year_end >= year_start', name='check_year_range'),
     )
 
@@ -32,7 +35,22 @@ class CarModel(BaseModel):
     engine_volume: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     body_type: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
 
-    parts: Mapped[list["PartModel"]] = relationship(secondary="part_car", back_populates="cars", lazy="joined")
+    parts: Mapped[list["PartModel"]] = relationship(secondary="part_car", back_populates="cars", lazy="select")
 
     def __repr__(self):
         return f"CarModel({self.brand}, {self.model}, {self.year_start}-{self.year_end})"
+
+
+def car_year_range():
+    # constants are rendered inline so queries match the expression index below
+    return func.int4range(CarModel.year_start, func.coalesce(CarModel.year_end, literal_column(str(OPEN_END_YEAR))),
+                          literal_column("'[]'"))
+
+
+def car_display_name():
+    return CarModel.brand.concat(literal_column("' '")).concat(CarModel.model)
+
+
+Index('idx_cars_year_range', car_year_range(), postgresql_using='gist')
+Index('idx_cars_display_name_trgm', car_display_name().label('display_name'),
+      postgresql_using='gin', postgresql_ops={'display_name': 'gin_trgm_ops'})
@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import Integer, ForeignKey, Float, DateTime, CheckConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.models.base import BaseModel
+
+
+class CartItemModel(BaseModel):
+    """Open cart line; one row per (user, part), separate from the ever-growing ``order_items`` history."""
+    __tablename__ = "cart_items"
+    __table_args__ = (
+        CheckConstraint('quantity > 0', name='check_cart_quantity_positive'),
+        CheckConstraint('unit_price >= 0', name='check_cart_price_positive'),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    part_id: Mapped[int] = mapped_column(ForeignKey("parts.id", ondelete="CASCADE"), primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    unit_price: Mapped[float] = mapped_column(Float, nullable=False)
+    added_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    user = relationship("UserModel", back_populates="cart_items", lazy="select")
+
+    def __repr__(self):
+        return f"CartItemModel(user: {self.user_id}, part: {self.part_id}, {self.quantity} x {self.unit_price})"
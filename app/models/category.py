@@ -1,10 +1,10 @@
 from typing import List, Optional
 from sqlalchemy import String, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
-class CategoryModel(BaseModel):
+class CategoryModel(VersionMixin, BaseModel):
     __tablename__ = "categories"
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -13,7 +13,7 @@ class CategoryModel(BaseModel):
 
     parent: Mapped[Optional["CategoryModel"]] = relationship(
         "CategoryModel", back_populates="subcategories", remote_side=[id])
-    parts: Mapped[list["PartModel"]] = relationship(back_populates="category", lazy="joined")
+    parts: Mapped[list["PartModel"]] = relationship(back_populates="category", lazy="select")
     subcategories: Mapped[List["CategoryModel"]] = relationship(
         "CategoryModel", back_populates="parent", cascade="all, delete-orphan", lazy="select")
 
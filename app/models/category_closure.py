@@ -0,0 +1,15 @@
+from sqlalchemy import ForeignKey, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import BaseModel
+
+
+class CategoryClosureModel(BaseModel):
+    __tablename__ = "category_closure"
+    __table_args__ = (Index('idx_category_closure_descendant', 'descendant_id', 'depth'),)
+
+    ancestor_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"CategoryClosureModel({self.ancestor_id} -> {self.descendant_id}, depth: {self.depth})"
@@ -0,0 +1,38 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Integer, String, DateTime, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import BaseModel
+
+
+class IdempotencyStatus(str, Enum):
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+class IdempotencyKeyModel(BaseModel):
+    """Outcome of a mutating request, stored under the client's ``Idempotency-Key`` so retries can be replayed.
+
+    While the first request runs the row is ``in_progress`` and ``expires_at`` is a short lease; once the
+    response is stored it is extended to the replay TTL.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index('idx_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    owner: Mapped[str] = mapped_column(String(255), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[IdempotencyStatus] = mapped_column(String(20), nullable=False,
+                                                      default=IdempotencyStatus.IN_PROGRESS)
+    response_status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    response_headers: Mapped[Optional[list]] = mapped_column(JSONB, nullable=True)
+    response_body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"IdempotencyKeyModel({self.owner}, {self.key}, status: {self.status})"
@@ -0,0 +1,48 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Integer, ForeignKey, String, Float, DateTime, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import BaseModel
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobModel(BaseModel):
+    """Background job; workers take queued rows with ``FOR UPDATE SKIP LOCKED``, highest priority first.
+
+    A running job holds a lease until ``locked_until``; if its worker dies the job is picked up again once
+    the lease runs out. ``attempts`` also fences late writes from a worker that lost its lease.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index('idx_jobs_queued_priority_run_at', text('priority DESC'), 'run_at', 'id',
+              postgresql_where=text("status = 'queued'")),
+        Index('idx_jobs_running_locked_until', 'locked_until', postgresql_where=text("status = 'running'")),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    status: Mapped[JobStatus] = mapped_column(String(20), nullable=False, default=JobStatus.QUEUED)
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    progress: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_by: Mapped[Optional[int]] = mapped_column(ForeignKey('users.id', ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"JobModel({self.id}, {self.kind}, status: {self.status}, attempt {self.attempts}/{self.max_attempts})"
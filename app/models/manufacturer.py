@@ -1,18 +1,19 @@
 from typing import Optional
-from sqlalchemy import String
+from sqlalchemy import String, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
-class ManufacturerModel(BaseModel):
+class ManufacturerModel(VersionMixin, BaseModel):
     __tablename__ = "manufacturers"
+    __table_args__ = (Index('idx_manufacturers_name_id', 'name', 'id'),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
     website: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
 
     parts: Mapped[list["PartModel"]] = relationship(
-        secondary="part_manufacturer", back_populates="manufacturers", lazy="joined")
+        secondary="part_manufacturer", back_populates="manufacturers", lazy="select")
 
     def __repr__(self):
         return f"ManufacturerModel({self.name})"
@@ -3,7 +3,7 @@ from enum import Enum
 from typing import Optional
 from sqlalchemy import Integer, ForeignKey, String, Float, DateTime, CheckConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
 class OrderStatus(str, Enum):
@@ -13,7 +13,7 @@ class OrderStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-class OrderModel(BaseModel):
+class OrderModel(VersionMixin, BaseModel):
     __tablename__ = "orders"
     __table_args__ = (CheckConstraint('delivered_at IS NULL OR delivered_at >= created_at',
                                       name='check_delivery_date'),)
@@ -29,8 +29,8 @@ class OrderModel(BaseModel):
                                                  onupdate=datetime.utcnow, nullable=False)
     delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
-    users = relationship("UserModel", back_populates="orders", lazy="joined")
-    items = relationship("OrderItemModel", back_populates="orders", lazy="joined", cascade="all, delete-orphan")
+    users = relationship("UserModel", back_populates="orders", lazy="select")
+    items = relationship("OrderItemModel", back_populates="orders", lazy="select", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"OrderModel(OrderID: {self.id}, status: {self.status.value})"
@@ -16,9 +16,9 @@ class OrderItemModel(BaseModel):
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     unit_price: Mapped[float] = mapped_column(Float, nullable=False)
 
-    orders = relationship("OrderModel", back_populates="items", lazy="joined")
-    part = relationship("PartModel", back_populates="order_items", lazy="joined")
-    user = relationship("UserModel", back_populates="cart_items", lazy="joined")
+    orders = relationship("OrderModel", back_populates="items", lazy="select")
+    part = relationship("PartModel", back_populates="order_items", lazy="select")
+    user = relationship("UserModel", lazy="select")
 
     def __repr__(self):
         return f"OrderItemModel {self.order_id} - {self.part.name if self.part else 'Unknown'} ({self.quantity})"
@@ -1,13 +1,23 @@
-from sqlalchemy import String, Table, ForeignKey, Column, CheckConstraint, Text
+from sqlalchemy import String, Table, ForeignKey, Column, CheckConstraint, Text, Index, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
-class PartModel(BaseModel):
+class PartModel(VersionMixin, BaseModel):
     __tablename__ = "parts"
     __table_args__ = (
         CheckConstraint('price >= 0', name='check_price_positive'),
         CheckConstraint('qty_in_stock >= 0', name='check_stock_positive'),
+        CheckConstraint('qty_reserved >= 0', name='check_reserved_positive'),
+        Index('idx_parts_name_id', 'name', 'id'),
+        Index('uix_parts_manufacturer_part_number', 'manufacturer_part_number', unique=True),
+        Index('idx_parts_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('idx_parts_part_number_trgm', 'part_number',
+              postgresql_using='gin', postgresql_ops={'part_number': 'gin_trgm_ops'}),
+        Index('idx_parts_mpn_trgm', 'manufacturer_part_number',
+              postgresql_using='gin', postgresql_ops={'manufacturer_part_number': 'gin_trgm_ops'}),
+        Index('idx_parts_description_trgm', 'description',
+              postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
@@ -16,29 +26,41 @@ class PartModel(BaseModel):
     manufacturer_part_number: Mapped[str] = mapped_column(String(20), nullable=False)
     price: Mapped[float] = mapped_column(nullable=False)
     qty_in_stock: Mapped[int] = mapped_column(nullable=False,)
+    qty_reserved: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     description: Mapped[str] = mapped_column(Text, nullable=True)
-    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
+    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"), index=True)
 
-    category: Mapped["CategoryModel"] = relationship(back_populates="parts", lazy="joined")
-    manufacturers: Mapped[list["ManufacturerModel"]] = relationship(secondary="part_manufacturer", back_populates="parts", lazy="joined")
-    cars: Mapped[list["CarModel"]] = relationship(secondary="part_car", back_populates="parts", lazy="joined")
+    category: Mapped["CategoryModel"] = relationship(back_populates="parts", lazy="select")
+    manufacturers: Mapped[list["ManufacturerModel"]] = relationship(secondary="part_manufacturer", back_populates="parts", lazy="select")
+    cars: Mapped[list["CarModel"]] = relationship(secondary="part_car", back_populates="parts", lazy="select")
     order_items: Mapped[list["OrderItemModel"]] = relationship("OrderItemModel", back_populates="part", lazy="select")
 
     warehouse_parts: Mapped[list["WarehousePartModel"]] = relationship("WarehousePartModel", back_populates="part")
 
+    @property
+    def qty_available(self) -> int:
+        return self.qty_in_stock - self.qty_reserved
+
     def __repr__(self):
         return (f"PartModel({self.name}, {self.part_number}, Category: {self.category}, "
                 f"Manufacturer: {self.manufacturers})")
 
 
+# The trigram indexes above need pg_trgm; make sure it exists before the tables are created.
+event.listen(BaseModel.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+
 part_manufacturer = Table(
     "part_manufacturer", BaseModel.metadata,
     Column("part_id", ForeignKey("parts.id"), primary_key=True),
     Column("manufacturer_id", ForeignKey("manufacturers.id"), primary_key=True),
+    Index("idx_part_manufacturer_manufacturer_id", "manufacturer_id"),
 )
 
 part_car = Table(
     "part_car", BaseModel.metadata,
     Column("part_id", ForeignKey("parts.id"), primary_key=True),
     Column("car_id", ForeignKey("cars.id"), primary_key=True),
+    Index("idx_part_car_car_id_part_id", "car_id", "part_id"),
 )
@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Integer, ForeignKey, String, Float, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.models.base import BaseModel
+
+
+class ImportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class PartImportModel(BaseModel):
+    __tablename__ = "part_imports"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[ImportStatus] = mapped_column(String(20), nullable=False, default=ImportStatus.PENDING)
+    created_by: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    total_rows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    imported_rows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed_rows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    staging_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    processing_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    rows = relationship("PartImportRowModel", back_populates="part_import", lazy="select",
+                        cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        seconds = (self.staging_seconds or 0) + (self.processing_seconds or 0)
+        return self.total_rows / seconds if seconds else None
+
+    def __repr__(self):
+        return f"PartImportModel({self.id}, {self.filename}, status: {self.status})"
@@ -0,0 +1,32 @@
+from typing import Optional
+from sqlalchemy import Integer, ForeignKey, String, Float, Text, ARRAY
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.models.base import BaseModel
+
+
+class PartImportRowModel(BaseModel):
+    """Staging row of a bulk part import; rows are COPY'd in raw and resolved with set-based statements."""
+    __tablename__ = "part_import_rows"
+
+    import_id: Mapped[int] = mapped_column(ForeignKey("part_imports.id", ondelete="CASCADE"), primary_key=True)
+    row_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    name: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    part_number: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    manufacturer_part_number: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    quantity: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    category_name: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    warehouse_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    manufacturer_names: Mapped[Optional[list[str]]] = mapped_column(ARRAY(String(50)), nullable=True)
+    car_ids: Mapped[Optional[list[int]]] = mapped_column(ARRAY(Integer), nullable=True)
+
+    category_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    part_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    part_import = relationship("PartImportModel", back_populates="rows", lazy="select")
+
+    def __repr__(self):
+        return f"PartImportRowModel({self.import_id}, row: {self.row_number}, error: {self.error})"
@@ -0,0 +1,37 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Integer, ForeignKey, String, DateTime, Index, CheckConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import BaseModel
+
+
+class MovementKind(str, Enum):
+    RECEIPT = "receipt"
+    SALE = "sale"
+    ADJUSTMENT = "adjustment"
+    TRANSFER = "transfer"
+
+
+class StockMovementModel(BaseModel):
+    """Append-only ledger of warehouse stock changes; ``warehouse_part.quantity`` is the running sum of ``delta``."""
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        CheckConstraint('delta <> 0', name='check_movement_delta_nonzero'),
+        Index('idx_stock_movements_warehouse_part', 'warehouse_id', 'part_id', 'id'),
+        Index('idx_stock_movements_part_id', 'part_id', 'id'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # RESTRICT: warehouses with history are never deleted, so the ledger stays complete
+    warehouse_id: Mapped[int] = mapped_column(ForeignKey("warehouses.id", ondelete="RESTRICT"), nullable=False)
+    part_id: Mapped[int] = mapped_column(ForeignKey("parts.id", ondelete="CASCADE"), nullable=False)
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    kind: Mapped[MovementKind] = mapped_column(String(20), nullable=False)
+    order_id: Mapped[Optional[int]] = mapped_column(ForeignKey("orders.id"), nullable=True)
+    reference: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    created_by: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"StockMovementModel({self.kind}, part: {self.part_id}, warehouse: {self.warehouse_id}, {self.delta:+d})"
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Integer, ForeignKey, DateTime, Index, CheckConstraint, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import BaseModel
+
+
+class StockReservationModel(BaseModel):
+    """Soft hold a cart line puts on stock until ``expires_at``; ``parts.qty_reserved`` is the running sum."""
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        CheckConstraint('quantity > 0', name='check_reservation_quantity_positive'),
+        UniqueConstraint('user_id', 'part_id', name='uix_stock_reservations_user_part'),
+        Index('idx_stock_reservations_expires_at', 'expires_at'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    part_id: Mapped[int] = mapped_column(ForeignKey("parts.id", ondelete="CASCADE"), nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (f"StockReservationModel(user: {self.user_id}, part: {self.part_id}, {self.quantity} "
+                f"until {self.expires_at})")
@@ -18,7 +18,8 @@ class UserModel(BaseModel):
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
 
     orders = relationship("OrderModel", back_populates="users", lazy="select")
-    cart_items = relationship("OrderItemModel", back_populates="user", lazy="joined", cascade="all, delete-orphan")
+    cart_items = relationship("CartItemModel", back_populates="user", lazy="select", cascade="all, delete-orphan",
+                              passive_deletes=True)
 
     def __repr__(self):
         return f"UserModel({self.id}, UserName: {self.username}, active: {self.is_active}, admin : {self.is_admin})"
@@ -1,9 +1,11 @@
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from app.models.base import BaseModel
+from app.models.base import BaseModel, VersionMixin
 
 
-class WarehouseModel(BaseModel):
+class WarehouseModel(VersionMixin, BaseModel):
     __tablename__ = "warehouses"
+    __table_args__ = (Index('idx_warehouses_name_id', 'name', 'id'),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str]
@@ -1,4 +1,5 @@
 from typing import Optional
+from fastapi.params import Query
 from pydantic import BaseModel
 
 
@@ -33,3 +34,34 @@ class Car(CarBase):
 
     class Config:
         from_attributes = True
+
+
+class CarEngineOption(BaseModel):
+    car_id: int
+    engine_volume: Optional[float] = None
+    engine_type: Optional[str] = None
+    engine_model: Optional[str] = None
+    body_type: Optional[str] = None
+    year_start: int
+    year_end: Optional[int] = None
+
+
+class FitmentQuery(BaseModel):
+    brand: str
+    model: str
+    year: int
+    engine_volume: Optional[float] = None
+    engine_type: Optional[str] = None
+    engine_model: Optional[str] = None
+
+
+def fitment_param(
+    brand: str = Query(max_length=50),
+    model: str = Query(max_length=50),
+    year: int = Query(ge=1900, le=2100),
+    engine_volume: Optional[float] = Query(required=False, default=None, gt=0),
+    engine_type: Optional[str] = Query(required=False, default=None, max_length=50),
+    engine_model: Optional[str] = Query(required=False, default=None, max_length=50),
+):
+    return FitmentQuery(brand=brand, model=model, year=year, engine_volume=engine_volume,
+                        engine_type=engine_type or None, engine_model=engine_model or None)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Any, Optional
+from pydantic import BaseModel
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    run_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
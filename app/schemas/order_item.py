@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class OrderItemBase(BaseModel):
@@ -7,7 +7,7 @@ class OrderItemBase(BaseModel):
 
 
 class OrderItemCreate(OrderItemBase):
-    pass
+    quantity: int = Field(gt=0)
 
 
 class OrderItem(OrderItemBase):
@@ -1,4 +1,8 @@
-from sqlalchemy import inspect
+import base64
+import json
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import inspect, tuple_
 from fastapi.params import Query
 from pydantic import BaseModel
 
@@ -6,13 +10,67 @@ from pydantic import BaseModel
 class Paginate(BaseModel):
     page: int
     per_page: int
+    after: Optional[str] = None
 
 
 def pagination_param(
     page: int = Query(ge=1, required=False, default=1, le=5000),
     per_page: int = Query(ge=1, required=False, default=10, le=100),
+    after: Optional[str] = Query(required=False, default=None, max_length=512),
 ):
-    return Paginate(page=page, per_page=per_page)
+    return Paginate(page=page, per_page=per_page, after=after)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return values
+
+
+def _cursor_value_matches(value, key) -> bool:
+    if value is None:
+        return bool(getattr(key, "nullable", False))
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        return True
+    if isinstance(value, bool) and python_type is not bool:
+        return False
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def paginate_query(stmt, paginate: Paginate, *keys):
+    """Order ``stmt`` by ``keys`` and apply either the ``after`` cursor seek or the page offset.
+
+    The last key must be unique (normally the primary key) so the order is total.
+    """
+    stmt = stmt.order_by(*keys)
+    if paginate.after:
+        values = decode_cursor(paginate.after)
+        if len(values) != len(keys) or not all(map(_cursor_value_matches, values, keys)):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        stmt = stmt.where(tuple_(*keys) > tuple_(*values))
+    else:
+        stmt = stmt.offset((paginate.page - 1) * paginate.per_page)
+    return stmt.limit(paginate.per_page)
+
+
+def next_cursor(rows, paginate: Paginate, *keys) -> Optional[str]:
+    if len(rows) < paginate.per_page:
+        return None
+    last = rows[-1]
+    return encode_cursor([getattr(last, key.key) for key in keys])
 
 
 async def object_as_dict(obj):
@@ -1,5 +1,8 @@
+import math
 from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import HTTPException
+from fastapi.params import Query
+from pydantic import BaseModel, computed_field
 
 from app.schemas.car import Car
 from app.schemas.category import Category
@@ -40,6 +43,13 @@ class PartUpdate(BaseModel):
 
 class Part(PartBase):
     id: int
+    qty_reserved: int = 0
+
+    @computed_field
+    @property
+    def qty_available(self) -> int:
+        """Stock not held by anyone's cart, i.e. what can still be added to a cart."""
+        return self.qty_in_stock - self.qty_reserved
 
     class Config:
         from_attributes = True
@@ -50,3 +60,89 @@ class PartWithRelations(Part):
     manufacturers: List[Manufacturer] = []
     cars: List[Car] = []
     warehouse_parts: List[WarehousePartRead] = []
+
+
+class PartSearchHit(Part):
+    score: float
+
+
+class PartSearchPage(BaseModel):
+    items: List[PartSearchHit] = []
+    total: int
+    page: int
+    per_page: int
+
+
+class PartPage(BaseModel):
+    items: List[Part] = []
+    page: int
+    per_page: int
+    next_cursor: Optional[str] = None
+
+
+class PartFilter(BaseModel):
+    q: Optional[str] = None
+    name: Optional[str] = None
+    part_number: Optional[str] = None
+    manufacturer_part_number: Optional[str] = None
+    category_id: Optional[int] = None
+    manufacturer_id: Optional[int] = None
+    car_id: Optional[int] = None
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    in_stock: bool = False
+
+
+def _blank_to_none(value: Optional[str], name: str, parse=str, minimum=None):
+    """HTML forms submit empty fields as ``""``; treat those as unset and turn bad values into a 400."""
+    if value is None or not value.strip():
+        return None
+    try:
+        parsed = parse(value.strip())
+        if isinstance(parsed, float) and not math.isfinite(parsed):
+            raise ValueError(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid value for {name}")
+    if minimum is not None and parsed < minimum:
+        raise HTTPException(status_code=400, detail=f"{name} must be at least {minimum}")
+    return parsed
+
+
+def part_filter_param(
+    q: Optional[str] = Query(required=False, default=None, max_length=100),
+    name: Optional[str] = Query(required=False, default=None, max_length=50),
+    part_number: Optional[str] = Query(required=False, default=None, max_length=20),
+    manufacturer_part_number: Optional[str] = Query(required=False, default=None, max_length=20),
+    category_id: Optional[str] = Query(required=False, default=None),
+    manufacturer_id: Optional[str] = Query(required=False, default=None),
+    car_id: Optional[str] = Query(required=False, default=None),
+    price_min: Optional[str] = Query(required=False, default=None),
+    price_max: Optional[str] = Query(required=False, default=None),
+    in_stock: bool = Query(required=False, default=False),
+):
+    q = _blank_to_none(q, "q")
+    if q is not None and len(q) < 2:
+        raise HTTPException(status_code=400, detail="q must be at least 2 characters")
+    return PartFilter(q=q, name=name or None, part_number=part_number or None,
+                      manufacturer_part_number=manufacturer_part_number or None,
+                      category_id=_blank_to_none(category_id, "category_id", int),
+                      manufacturer_id=_blank_to_none(manufacturer_id, "manufacturer_id", int),
+                      car_id=_blank_to_none(car_id, "car_id", int),
+                      price_min=_blank_to_none(price_min, "price_min", float, minimum=0),
+                      price_max=_blank_to_none(price_max, "price_max", float, minimum=0),
+                      in_stock=in_stock)
+
+
+class FacetCount(BaseModel):
+    id: int
+    name: Optional[str] = None
+    count: int
+
+
+class PartFacets(BaseModel):
+    total: int = 0
+    in_stock: int = 0
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    categories: List[FacetCount] = []
+    manufacturers: List[FacetCount] = []
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class PartImport(BaseModel):
+    id: int
+    filename: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total_rows: int
+    imported_rows: int
+    failed_rows: int
+    staging_seconds: Optional[float] = None
+    processing_seconds: Optional[float] = None
+    rows_per_second: Optional[float] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, field_validator
 
@@ -41,3 +41,51 @@ class WarehousePartRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class StockTransfer(BaseModel):
+    part_id: int
+    from_warehouse_id: int
+    to_warehouse_id: int
+    quantity: int
+
+    @field_validator('quantity')
+    def quantity_must_be_positive(cls, v: int):
+        if v <= 0:
+            raise ValueError('Quantity must be positive')
+        return v
+
+
+class StockBatchLine(BaseModel):
+    warehouse_id: int
+    part_id: int
+    delta: int
+
+    @field_validator('delta')
+    def delta_must_be_nonzero(cls, v: int):
+        if v == 0:
+            raise ValueError('Delta must not be zero')
+        return v
+
+
+class StockBatch(BaseModel):
+    lines: List[StockBatchLine]
+    reference: Optional[str] = None
+
+    @field_validator('lines')
+    def lines_within_limit(cls, v: List[StockBatchLine]):
+        if not 1 <= len(v) <= 10000:
+            raise ValueError('A batch must contain between 1 and 10000 lines')
+        return v
+
+    @field_validator('reference')
+    def reference_length(cls, v: Optional[str]):
+        if v is not None and len(v) > 100:
+            raise ValueError('Reference must be at most 100 characters')
+        return v
+
+
+class StockBatchLineResult(StockBatchLine):
+    applied: bool
+    quantity: Optional[int] = None
+    detail: Optional[str] = None
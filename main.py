@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from typing import Optional
 import uvicorn
 from fastapi import FastAPI, Request, Depends, Cookie
@@ -23,14 +24,43 @@ from app.frontends.cart import html_router as html_cart_router
 from app.frontends.car import html_router as html_car_router
 from app.api.v1.endpoints.parts import router as part_router
 from app.frontends.parts import html_router as part_html_router
+from app.api.v1.endpoints.admin import router as admin_router
+from app.api.v1.endpoints.jobs import router as jobs_router
+from app.core.idempotency import IdempotencyMiddleware, purge_idempotency_keys
+from app.core.instrumentation import SQLInstrumentationMiddleware
+from app.core.invoices import shutdown_invoice_pool
+from app.core.jobs import job_workers, requeue_expired_jobs
+from app.core.replica import ReadYourWritesMiddleware
 from app.core.security import verify_access_token
+from app.core.tasks import PeriodicTask, periodic_tasks
+from app.crud.reservations import expire_reservations
 from app.models import UserModel
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with periodic_tasks(PeriodicTask("expire-reservations", settings.RESERVATION_SWEEP_SECONDS,
+                                           expire_reservations),
+                              PeriodicTask("purge-idempotency-keys", settings.IDEMPOTENCY_PURGE_SECONDS,
+                                           purge_idempotency_keys),
+                              PeriodicTask("requeue-expired-jobs", settings.JOB_LEASE_SECONDS / 3,
+                                           requeue_expired_jobs)), job_workers(settings.JOB_WORKERS):
+        try:
+            yield
+        finally:
+            shutdown_invoice_pool()
+
+
 app = FastAPI(title="Auto Parts Stock ...",
               description="An API for managing an auto parts and Stock/Warehouse ",
-              version="0.1")
+              version="0.1",
+              lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(SQLInstrumentationMiddleware)
+if settings.DATABASE_REPLICA_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
@@ -42,6 +72,8 @@ app.include_router(cat_router, prefix="/api/v1/categories", tags=["categories"])
 app.include_router(man_router, prefix="/api/v1/manufacturers", tags=["manufacturer"])
 app.include_router(ware_router, prefix="/api/v1/warehouses", tags=["warehouse"])
 app.include_router(part_router, prefix="/api/v1/parts", tags=["parts"])
+app.include_router(admin_router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(jobs_router, prefix="/api/v1/jobs", tags=["jobs"])
 
 app.include_router(auth_html_router, prefix="/auth", tags=["auth-html"])
 app.include_router(part_html_router, prefix="/parts", tags=["parts-html"])
@@ -0,0 +1,105 @@
+"""Many buyers checking out the same scarce parts at once must never oversell or desync the stock counters."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, func
+
+from app.crud import cart
+from app.core.session import async_session
+from app.models import (CategoryModel, WarehouseModel, WarehousePartModel, PartModel, UserModel, CartItemModel,
+                        OrderItemModel, StockMovementModel, StockReservationModel)
+from app.models.stock_movement import MovementKind
+from app.schemas.order_item import OrderItemCreate
+
+pytestmark = pytest.mark.anyio
+
+BUYERS = 500
+# buyers that go through add_to_cart and so hold reservations; the rest only have cart rows
+HOLDING_BUYERS = 30
+# (part, warehouse) -> initial quantity
+STOCK = {("A", 0): 40, ("A", 1): 35, ("B", 0): 60}
+
+
+def _cart(index: int) -> dict:
+    lines = {"A": 1 + index % 2}
+    if index % 3 == 0:
+        lines["B"] = 1
+    return lines
+
+
+@pytest.fixture
+async def shop(clean_database):
+    async with async_session() as db:
+        category = CategoryModel(name="Brakes")
+        stores = [WarehouseModel(name=f"Warehouse {index}", location="Yerevan") for index in range(2)]
+        db.add_all([category, *stores])
+        await db.flush()
+
+        parts = {name: PartModel(name=f"Part {name}", part_number=name, manufacturer_part_number=f"MPN-{name}",
+                                 price=1000, category_id=category.id,
+                                 qty_in_stock=sum(qty for (part, _), qty in STOCK.items() if part == name))
+                 for name in ("A", "B")}
+        users = [UserModel(username=f"buyer{index}", first_name="Test", last_name="Buyer",
+                           email=f"buyer{index}@example.com", hashed_password="x") for index in range(BUYERS)]
+        db.add_all([*parts.values(), *users])
+        await db.flush()
+
+        for (name, store), quantity in STOCK.items():
+            db.add(WarehousePartModel(warehouse_id=stores[store].id, part_id=parts[name].id, quantity=quantity))
+            db.add(StockMovementModel(warehouse_id=stores[store].id, part_id=parts[name].id, delta=quantity,
+                                      kind=MovementKind.RECEIPT))
+        db.add_all([CartItemModel(user_id=users[index].id, part_id=parts[name].id, quantity=quantity,
+                                  unit_price=parts[name].price)
+                    for index in range(HOLDING_BUYERS, BUYERS) for name, quantity in _cart(index).items()])
+        await db.commit()
+        part_ids = {name: part.id for name, part in parts.items()}
+        user_ids = [user.id for user in users]
+
+    for index in range(HOLDING_BUYERS):
+        async with async_session() as db:
+            user = await db.get(UserModel, user_ids[index])
+            for name, quantity in _cart(index).items():
+                await cart.add_to_cart(OrderItemCreate(part_id=part_ids[name], quantity=quantity), db, user)
+    return part_ids, user_ids
+
+
+async def _checkout(user_id: int):
+    async with async_session() as db:
+        user = await db.get(UserModel, user_id)
+        try:
+            return await cart.checkout_order("Yerevan", db, user)
+        except HTTPException as exc:
+            return exc
+
+
+async def test_concurrent_checkouts_do_not_oversell(shop):
+    part_ids, user_ids = shop
+    results = await asyncio.gather(*[_checkout(user_id) for user_id in user_ids])
+
+    failures = [result for result in results if isinstance(result, HTTPException)]
+    assert {failure.status_code for failure in failures} <= {400, 409}
+    assert len(failures) < BUYERS
+
+    async with async_session() as db:
+        warehouse_parts = (await db.execute(select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id,
+                                                   WarehousePartModel.quantity))).all()
+        ledger = dict(((warehouse_id, part_id), total) for warehouse_id, part_id, total in await db.execute(
+            select(StockMovementModel.warehouse_id, StockMovementModel.part_id, func.sum(StockMovementModel.delta)).
+            group_by(StockMovementModel.warehouse_id, StockMovementModel.part_id)))
+        parts = (await db.execute(select(PartModel.id, PartModel.qty_in_stock, PartModel.qty_reserved))).all()
+        reserved = dict((await db.execute(select(StockReservationModel.part_id,
+                                                 func.sum(StockReservationModel.quantity)).
+                                          group_by(StockReservationModel.part_id))).all())
+        sold = dict((await db.execute(select(OrderItemModel.part_id, func.sum(OrderItemModel.quantity)).
+                                      group_by(OrderItemModel.part_id))).all())
+
+    for warehouse_id, part_id, quantity in warehouse_parts:
+        assert quantity >= 0
+        assert quantity == ledger[warehouse_id, part_id]
+
+    initial = {part_ids[name]: sum(qty for (part, _), qty in STOCK.items() if part == name) for name in part_ids}
+    for part_id, qty_in_stock, qty_reserved in parts:
+        assert qty_in_stock == sum(quantity for _, row_part, quantity in warehouse_parts if row_part == part_id)
+        assert 0 <= qty_reserved == reserved.get(part_id, 0) <= qty_in_stock
+        assert sold.get(part_id, 0) == initial[part_id] - qty_in_stock
@@ -0,0 +1,117 @@
+"""Statement and row counts of the list and detail CRUD paths, per load profile.
+
+A change in these numbers means a loader profile changed what it fetches: a missing eager load shows up as extra
+statements, an over-eager one as extra rows.
+"""
+import pytest
+from sqlalchemy import insert
+
+from app.crud import car, categories, manufacturer, part, warehouses, cart
+from app.models import (CategoryModel, ManufacturerModel, CarModel, WarehouseModel, WarehousePartModel, PartModel,
+                        UserModel, OrderModel, OrderItemModel)
+from app.models.part import part_manufacturer, part_car
+from app.schemas.pagination import Paginate
+from app.schemas.part import PartFilter
+from app.core.session import async_session
+from tests.conftest import count_queries
+
+pytestmark = pytest.mark.anyio
+
+PARTS = 30
+CARS = 12
+MANUFACTURERS = 3
+WAREHOUSES = 2
+PER_PAGE = 10
+
+
+def _part_cars(index: int) -> set:
+    return {index % CARS, (index + 1) % CARS, (index + 2) % CARS}
+
+
+@pytest.fixture
+async def catalog(clean_database):
+    async with async_session() as db:
+        root = CategoryModel(name="Engine")
+        db.add(root)
+        await db.flush()
+        child = CategoryModel(name="Filters", parent_id=root.id)
+        db.add(child)
+
+        manufacturers = [ManufacturerModel(name=f"Maker {index}", website=f"https://maker{index}.example")
+                         for index in range(MANUFACTURERS)]
+        cars = [CarModel(brand="Brand", model=f"Model {index}", year_start=2000 + index) for index in range(CARS)]
+        stores = [WarehouseModel(name=f"Warehouse {index}", location=f"City {index}") for index in range(WAREHOUSES)]
+        db.add_all([*manufacturers, *cars, *stores])
+        await db.flush()
+
+        parts = [PartModel(name=f"Part {index:02d}", part_number=f"PN{index}", manufacturer_part_number=f"MPN{index}",
+                           price=100 + index, qty_in_stock=5 * WAREHOUSES, category_id=child.id)
+                 for index in range(PARTS)]
+        db.add_all(parts)
+        await db.flush()
+
+        await db.execute(insert(part_manufacturer), [
+            {"part_id": parts[index].id, "manufacturer_id": manufacturers[offset % MANUFACTURERS].id}
+            for index in range(PARTS) for offset in (index, index + 1)])
+        await db.execute(insert(part_car), [{"part_id": parts[index].id, "car_id": cars[car_index].id}
+                                            for index in range(PARTS) for car_index in _part_cars(index)])
+        db.add_all([WarehousePartModel(warehouse_id=store.id, part_id=item.id, quantity=5)
+                    for store in stores for item in parts])
+
+        user = UserModel(username="buyer", first_name="Test", last_name="Buyer", email="buyer@example.com",
+                         hashed_password="x")
+        db.add(user)
+        await db.flush()
+        order = OrderModel(user_id=user.id, total_amount=303, shipping_address="Yerevan")
+        db.add(order)
+        await db.flush()
+        db.add_all([OrderItemModel(order_id=order.id, user_id=user.id, part_id=parts[index].id, quantity=1,
+                                   unit_price=parts[index].price) for index in range(3)])
+        ids = {"root": root.id, "car": cars[0].id, "manufacturer": manufacturers[0].id, "part": parts[0].id,
+               "warehouse": stores[0].id, "order": order.id, "user": user}
+        await db.commit()
+    return ids
+
+
+def _page():
+    return Paginate(page=1, per_page=PER_PAGE)
+
+
+def _compatible_rows():
+    return min(sum(1 for index in range(PARTS) if 0 in _part_cars(index)), PER_PAGE)
+
+
+CASES = [
+    # name, call, queries, rows
+    ("cars list", lambda ids, db: car.get_cars(_page(), db), 2, 1 + PER_PAGE),
+    ("cars dropdown", lambda ids, db: car.get_all_cars(db), 1, CARS),
+    ("car detail", lambda ids, db: car.get_car_by_id(ids["car"], db), 1, 1),
+    ("manufacturers dropdown", lambda ids, db: manufacturer.get_all_manufacturers(db), 1, MANUFACTURERS),
+    ("manufacturers list", lambda ids, db: manufacturer.get_manufacturers(_page(), db), 2, 1 + MANUFACTURERS),
+    # each part has two of the three manufacturers, so each manufacturer has two thirds of the parts
+    ("manufacturer detail", lambda ids, db: manufacturer.get_manufacturer_by_id(ids["manufacturer"], db),
+     2, 1 + PARTS * 2 // MANUFACTURERS),
+    # root, its child, and an empty look for the child's subcategories
+    ("category detail", lambda ids, db: categories.get_category_by_id(ids["root"], db), 3, 2),
+    ("parts filter", lambda ids, db: part.filter_parts(PartFilter(), _page(), db), 1, PER_PAGE),
+    ("parts list", lambda ids, db: part.get_all_parts(_page(), db), 2, 1 + PER_PAGE),
+    # part with category, then manufacturers, cars, and warehouse rows joined to their warehouse
+    ("part detail", lambda ids, db: part.get_part_by_id(ids["part"], db), 4, 1 + 2 + 3 + WAREHOUSES),
+    ("compatible parts", lambda ids, db: part.get_compatible_parts(ids["car"], _page(), db), 2,
+     1 + _compatible_rows()),
+    ("warehouses list", lambda ids, db: warehouses.get_warehouses(_page(), db), 1, WAREHOUSES),
+    ("warehouse parts", lambda ids, db: warehouses.get_warehouse_parts(ids["warehouse"], _page(), db),
+     3, PER_PAGE + PER_PAGE + 1),
+    ("order detail", lambda ids, db: cart.print_order(ids["order"], db, ids["user"]), 2, 1 + 3),
+]
+
+
+@pytest.mark.parametrize("name, call, queries, rows", CASES, ids=[case[0] for case in CASES])
+async def test_load_profile_counts(catalog, name, call, queries, rows):
+    async with async_session() as db:
+        # check out the connection first so only the endpoint's own statements are counted
+        await db.connection()
+        with count_queries() as stats:
+            await call(catalog, db)
+
+    assert (stats.queries, stats.rows) == (queries, rows), dict(stats.statements)
@@ -0,0 +1,59 @@
+"""Concurrent changes to one cart hold must charge ``qty_reserved`` exactly once."""
+import asyncio
+
+import pytest
+from sqlalchemy import select, func, update
+
+from app.core.session import async_session
+from app.crud.reservations import set_reservation
+from app.models import CategoryModel, PartModel, UserModel, StockReservationModel
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def part_and_user(clean_database):
+    async with async_session() as db:
+        category = CategoryModel(name="Lights")
+        user = UserModel(username="buyer", first_name="Test", last_name="Buyer", email="buyer@example.com",
+                         hashed_password="x")
+        db.add_all([category, user])
+        await db.flush()
+        part = PartModel(name="Bulb", part_number="B1", manufacturer_part_number="MPN-B1", price=500,
+                         qty_in_stock=100, category_id=category.id)
+        db.add(part)
+        await db.commit()
+        return part.id, user.id
+
+
+async def _set(user_id: int, part_id: int, quantity: int):
+    async with async_session() as db:
+        await set_reservation(user_id, part_id, quantity, db)
+        await db.commit()
+
+
+async def test_concurrent_first_holds_are_charged_once(part_and_user):
+    part_id, user_id = part_and_user
+    await asyncio.gather(*[_set(user_id, part_id, 3) for _ in range(20)])
+
+    async with async_session() as db:
+        qty_reserved = await db.scalar(select(PartModel.qty_reserved).where(PartModel.id == part_id))
+        holds = await db.scalar(select(func.sum(StockReservationModel.quantity)).
+                                where(StockReservationModel.part_id == part_id))
+    assert qty_reserved == holds == 3
+
+
+async def test_hold_can_be_released_when_stock_fell_below_holds(part_and_user):
+    part_id, user_id = part_and_user
+    await _set(user_id, part_id, 5)
+    async with async_session() as db:
+        # e.g. an admin correction, which does not look at reservations
+        await db.execute(update(PartModel).where(PartModel.id == part_id).values(qty_in_stock=2))
+        await db.commit()
+
+    await _set(user_id, part_id, 1)
+    await _set(user_id, part_id, 0)
+
+    async with async_session() as db:
+        assert await db.scalar(select(PartModel.qty_reserved).where(PartModel.id == part_id)) == 0
+        assert await db.scalar(select(func.count()).select_from(StockReservationModel)) == 0
@@ -0,0 +1,65 @@
+"""Stock batches touching the same parts through different warehouses must all apply, without deadlocks."""
+import asyncio
+
+import pytest
+from sqlalchemy import select, func
+
+from app.core.session import async_session
+from app.crud.warehouses import apply_stock_batch
+from app.models import CategoryModel, WarehouseModel, WarehousePartModel, PartModel, UserModel, StockMovementModel
+from app.schemas.warehouse import StockBatch, StockBatchLine
+
+pytestmark = pytest.mark.anyio
+
+WAREHOUSES = 20
+PARTS = 3
+
+
+@pytest.fixture
+async def stockroom(clean_database):
+    async with async_session() as db:
+        category = CategoryModel(name="Suspension")
+        stores = [WarehouseModel(name=f"Warehouse {index}", location="Gyumri") for index in range(WAREHOUSES)]
+        admin = UserModel(username="admin", first_name="Test", last_name="Admin", email="admin@example.com",
+                          hashed_password="x", is_admin=True)
+        db.add_all([category, admin, *stores])
+        await db.flush()
+        parts = [PartModel(name=f"Shock {index}", part_number=f"S{index}", manufacturer_part_number=f"MPN-S{index}",
+                           price=2000, qty_in_stock=0, category_id=category.id) for index in range(PARTS)]
+        db.add_all(parts)
+        await db.commit()
+        return [store.id for store in stores], [item.id for item in parts], admin.id
+
+
+def _batch(index: int, warehouse_ids: list, part_ids: list) -> StockBatch:
+    # every batch receives every part into its own warehouse and the next one, so each part row is shared by all
+    return StockBatch(reference=f"receipt-{index}",
+                      lines=[StockBatchLine(warehouse_id=warehouse_ids[(index + offset) % WAREHOUSES],
+                                            part_id=part_id, delta=5 + offset)
+                             for part_id in part_ids for offset in (0, 1)])
+
+
+async def _apply(batch: StockBatch, admin_id: int):
+    async with async_session() as db:
+        admin = await db.get(UserModel, admin_id)
+        return await apply_stock_batch(batch, db, admin)
+
+
+async def test_overlapping_batches_all_apply(stockroom):
+    warehouse_ids, part_ids, admin_id = stockroom
+    results = await asyncio.gather(*[_apply(_batch(index, warehouse_ids, part_ids), admin_id)
+                                     for index in range(WAREHOUSES)])
+
+    assert all(line["applied"] for lines in results for line in lines)
+
+    async with async_session() as db:
+        quantities = dict(((row.warehouse_id, row.part_id), row.quantity) for row in await db.execute(
+            select(WarehousePartModel.warehouse_id, WarehousePartModel.part_id, WarehousePartModel.quantity)))
+        ledger = dict(((warehouse_id, part_id), total) for warehouse_id, part_id, total in await db.execute(
+            select(StockMovementModel.warehouse_id, StockMovementModel.part_id, func.sum(StockMovementModel.delta)).
+            group_by(StockMovementModel.warehouse_id, StockMovementModel.part_id)))
+        totals = dict((await db.execute(select(PartModel.id, PartModel.qty_in_stock))).all())
+
+    assert quantities == ledger
+    assert set(quantities.values()) == {5 + 6}
+    assert totals == {part_id: WAREHOUSES * 11 for part_id in part_ids}
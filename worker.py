@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+import logging
+from multiprocessing import Process
+
+import app.crud.jobs  # noqa: F401  registers the job handlers
+from app.core.config import settings
+from app.core.invoices import shutdown_invoice_pool
+from app.core.jobs import job_workers, requeue_expired_jobs
+from app.core.tasks import PeriodicTask, periodic_tasks
+
+
+async def run_workers(concurrency: int):
+    async with periodic_tasks(PeriodicTask("requeue-expired-jobs", settings.JOB_LEASE_SECONDS / 3,
+                                           requeue_expired_jobs)), job_workers(concurrency):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            shutdown_invoice_pool()
+
+
+def main(concurrency: int):
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_workers(concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # standalone workers for the jobs table; run the web app with JOB_WORKERS=0 to leave all jobs to them
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKERS or 1, help="workers per process")
+    args = parser.parse_args()
+
+    processes = [Process(target=main, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()